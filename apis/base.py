@@ -0,0 +1,183 @@
+"""
+Provider Engine
+===============
+Gemeenschappelijke basis voor alle upstream bronnen (CoinGecko, NewsData.io,
+Alpha Vantage, YouTube, TheSportsDB).
+
+Een Provider beschrijft één dataset: waar hij vandaan komt (``fetch``), hoe
+de ruwe response omgezet wordt (``normalize``), hoe lang hij in de cache
+blijft (``ttl``) en wat er geserveerd wordt als de API faalt (``fallback``).
+Het ophalen zelf is async en draait op de gedeelde event loop
+(utils/aio.py): de refresh scheduler houdt zo honderden fetches tegelijk in
+de lucht vanuit één proces. Flask routes lezen gewoon via de bestaande sync
+functies (``get_trending_crypto`` enz.), die via ``Provider.get`` de cache
+(met single-flight) gebruiken.
+
+Cache refreshes vragen conditioneel: per upstream URL onthoudt de Provider
+de validators van de laatste bruikbare response (ETag, Last-Modified en een
+hash van de body). Is de data niet veranderd (304 of dezelfde body), dan
+krijgt de al genormaliseerde data in de cache gewoon een nieuwe TTL, zonder
+parsen of normaliseren.
+"""
+
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+import os
+import time
+
+from utils import aio, http
+from utils.cache import UNCHANGED, get_cache_entry, get_or_load
+from utils.metrics import record_fetch
+from utils.scheduler import register_dataset
+
+# Conditionele requests naar upstream APIs (false = altijd de volledige response)
+CONDITIONAL_REQUESTS = os.getenv("CONDITIONAL_REQUESTS", "true").lower() not in ("0", "false", "no")
+
+# Validators per upstream resource (http.validator_key -> validator), per proces
+_VALIDATORS: Dict[str, dict] = {}
+# Alleen cache loads (Provider.load) mogen NOT_MODIFIED krijgen
+_CONDITIONAL: ContextVar[bool] = ContextVar("provider_conditional", default=False)
+# Validators van de lopende load; pas bewaard als de data bruikbaar blijkt
+_PENDING: ContextVar[Optional[dict]] = ContextVar("provider_validators", default=None)
+
+
+class Provider:
+    """
+    Eén upstream dataset: fetch, normalize, TTL en fallback.
+
+    Subklassen zetten ``name``, ``key`` en ``url`` en implementeren
+    ``normalize``; ``params``, ``fetch``, ``enabled`` en ``fallback`` zijn
+    optioneel te overschrijven.
+    """
+
+    # Provider naam (circuit breaker, metrics)
+    name = ""
+    # Cache key van de dataset
+    key = ""
+    # Cache TTL in seconden
+    ttl = 900
+    url = ""
+    # Read timeout in seconden (None = HTTP_READ_TIMEOUT)
+    timeout = None
+    # Conditionele requests (ETag / If-Modified-Since / body hash) bij een refresh
+    conditional = True
+
+    def enabled(self) -> bool:
+        """Of de live API gebruikt kan worden (bv. alleen met API key)"""
+        return True
+
+    def params(self) -> Optional[dict]:
+        """Query parameters voor de request"""
+        return None
+
+    async def fetch(self) -> Any:
+        """Haalt de ruwe data op (standaard: GET url met params, JSON)"""
+        return await self.get_json(self.url, params=self.params(), timeout=self.timeout)
+
+    def cached_data(self) -> Optional[Any]:
+        """
+        Data van deze dataset in de cache (vers of stale), alleen binnen een
+        cache load (waar UNCHANGED teruggeven zin heeft); anders None.
+        """
+        if not _CONDITIONAL.get():
+            return None
+        entry = get_cache_entry(self.key)
+        return entry.data if entry is not None else None
+
+    async def get_json(self, url: str, params: Optional[dict] = None, timeout=None,
+                       conditional: bool = True) -> Any:
+        """
+        GET JSON voor deze provider; tijdens een cache load conditioneel
+        (conditional=False: altijd de volledige response, bv. volgende pagina's).
+
+        Returns:
+            Geparste JSON, of http.NOT_MODIFIED als de resource niet veranderd
+            is sinds de data die nu in de cache staat
+        """
+        vkey = http.validator_key(url, params)
+        validator = None
+        if conditional and CONDITIONAL_REQUESTS and self.conditional and _CONDITIONAL.get() and get_cache_entry(self.key) is not None:
+            validator = _VALIDATORS.get(vkey)
+        data, new_validator = await http.get_json_if_changed(url, params=params, timeout=timeout,
+                                                             validator=validator)
+        pending = _PENDING.get()
+        if pending is not None:
+            pending[vkey] = new_validator
+        return data
+
+    def normalize(self, data: Any) -> Optional[Any]:
+        """
+        Zet de ruwe response om naar de structuur die de app gebruikt.
+
+        Returns:
+            De genormaliseerde data, of None als de response onbruikbaar is
+        """
+        raise NotImplementedError
+
+    def fallback(self) -> Optional[Any]:
+        """Data als de live API niets oplevert (standaard geen)"""
+        return None
+
+    async def load_live(self) -> Optional[Any]:
+        """
+        Haalt de live data op en normaliseert ze (zonder cache en fallback).
+
+        Returns:
+            De genormaliseerde data, UNCHANGED als de upstream data niet
+            veranderd is (alleen binnen load()), of None als de API call mislukt
+        """
+        if not self.enabled():
+            return None
+        start = time.perf_counter()
+        data = None
+        pending = {}
+        token = _PENDING.set(pending)
+        try:
+            raw = await self.fetch()
+            data = UNCHANGED if raw is http.NOT_MODIFIED else self.normalize(raw)
+        except Exception as e:
+            # Netwerk fouten, timeouts, HTTP errors, onverwachte responses
+            print(f"[{self.name.upper()}] API Error: {e}")
+        finally:
+            _PENDING.reset(token)
+            record_fetch(self.name, time.perf_counter() - start, data is not None)
+        if data:
+            _VALIDATORS.update(pending)
+        return data
+
+    async def load(self) -> Optional[Any]:
+        """
+        Live data voor de cache (de cache loader).
+
+        Zonder fallback: een mislukte load geeft None, zodat de circuit
+        breaker en de negatieve cache hem zien; de fallback komt pas in get().
+        """
+        token = _CONDITIONAL.set(True)
+        try:
+            return await self.load_live()
+        finally:
+            _CONDITIONAL.reset(token)
+
+    def load_sync(self) -> Optional[Any]:
+        """load() vanuit sync code (request handlers, get_or_load)"""
+        return aio.run(self.load())
+
+    def get(self) -> Optional[Any]:
+        """
+        Data uit de cache; bij een miss laadt één caller ze (single-flight).
+
+        Returns:
+            Gecachte of vers geladen data, anders de fallback (niet gecachet),
+            of None als er ook geen fallback is
+        """
+        data = get_or_load(self.key, self.load_sync, ttl=self.ttl, provider=self.name)
+        if not data:
+            fallback = self.fallback()
+            if fallback is not None:
+                return fallback
+        return data
+
+    def register(self):
+        """Laat de refresh scheduler deze dataset warm houden (async)"""
+        return register_dataset(self.key, self.load_sync, ttl=self.ttl,
+                                provider=self.name, aloader=self.load)
@@ -5,37 +5,27 @@ Deze module handelt alle interacties met de CoinGecko API af.
 Gratis API - geen API key nodig!
 """
 
-import requests
-from utils.cache import get_cache, set_cache
+import os
+from apis.base import Provider
 
-# CoinGecko API endpoint voor trending coins
-COINGECKO_TRENDING_URL = "https://api.coingecko.com/api/v3/search/trending"
+# CoinGecko API endpoint voor trending coins (env: bv. tools/standin_server.py)
+COINGECKO_TRENDING_URL = os.getenv("COINGECKO_TRENDING_URL", "https://api.coingecko.com/api/v3/search/trending")
 
-def get_trending_crypto():
-    """
-    Haalt trending cryptocurrency data op van CoinGecko.
 
-    Returns:
-        list: Lijst met trending coins (naam, symbool, market_cap_rank)
-        None: Als de API call mislukt
-    """
-    # Check cache first (15 minute TTL)
-    cache_key = "crypto_trending"
-    cached = get_cache(cache_key)
-    if cached:
-        return cached
-
-    try:
-        # Doe een GET request naar de CoinGecko API
-        response = requests.get(COINGECKO_TRENDING_URL, timeout=10)
+class CoinGeckoTrending(Provider):
+    """Trending coins van CoinGecko (15 minute TTL)"""
 
-        # Check of de request succesvol was (status code 200)
-        response.raise_for_status()
+    name = "coingecko"
+    key = "crypto_trending"
+    url = COINGECKO_TRENDING_URL
 
-        # Parse de JSON response
-        data = response.json()
+    def normalize(self, data):
+        """
+        Haalt alleen de relevante velden uit de CoinGecko response.
 
-        # Verwerk de data en haal alleen relevante velden eruit
+        Returns:
+            list: Lijst met trending coins (naam, symbool, market_cap_rank)
+        """
         trending_coins = []
 
         # CoinGecko geeft data terug in 'coins' array
@@ -54,18 +44,23 @@ def get_trending_crypto():
 
                 trending_coins.append(coin_info)
 
-        # Cache for 15 minutes (900 seconds)
-        if trending_coins:
-            set_cache(cache_key, trending_coins, ttl=900)
-
         return trending_coins
 
-    except requests.exceptions.RequestException as e:
-        # Netwerk fouten, timeouts, etc.
-        print(f"API Error: {e}")
-        return None
 
-    except Exception as e:
-        # Andere onverwachte fouten
-        print(f"Unexpected Error: {e}")
-        return None
+COINGECKO = CoinGeckoTrending()
+
+
+def get_trending_crypto():
+    """
+    Haalt trending cryptocurrency data op van CoinGecko.
+
+    Returns:
+        list: Lijst met trending coins (naam, symbool, market_cap_rank)
+        None: Als de API call mislukt
+    """
+    # Cache met single-flight: bij expiry doet maar één request de API call (15 minute TTL)
+    return COINGECKO.get()
+
+
+# Dataset die de refresh scheduler warm houdt
+COINGECKO.register()
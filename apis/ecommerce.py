@@ -6,7 +6,8 @@ Gebruikt pytrends voor trending zoekwoorden en product interesse.
 """
 
 import requests
-from utils.cache import get_cache, set_cache
+from utils.cache import get_cache, get_or_load
+from utils.scheduler import register_dataset
 
 # Probeer pytrends te importeren (optioneel)
 try:
@@ -15,6 +16,9 @@ try:
 except ImportError:
     PYTRENDS_AVAILABLE = False
 
+# Live data staat uit: mockdata heeft afbeeldingen
+LIVE_DATA_ENABLED = False
+
 def get_trending_ecommerce():
     """
     Haalt trending e-commerce data op.
@@ -30,19 +34,28 @@ def get_trending_ecommerce():
         list: Lijst met trending products/keywords
         None: Als de data ophalen mislukt
     """
-    # Check cache first (15 minute TTL)
     cache_key = "ecommerce_trending"
-    cached = get_cache(cache_key)
-    if cached:
-        return cached
 
-    # Return None to force fallback to mockdata which has images
-    return None
+    if not LIVE_DATA_ENABLED:
+        # Return None to force fallback to mockdata which has images
+        return get_cache(cache_key)
+
+    # Cache met single-flight (15 minute TTL)
+    return get_or_load(cache_key, _fetch_trending_ecommerce, ttl=900)
+
 
+def _fetch_trending_ecommerce():
+    """
+    Stelt de trending e-commerce lijst samen (zonder cache).
+
+    Returns:
+        list: Lijst met trending products/keywords
+        None: Als de data ophalen mislukt
+    """
     try:
         # OLD MVP: Trending shopping keywords (statisch voor demo)
         # In productie: vervang dit met echte API calls
-        trending_keywords_old = [
+        trending_keywords = [
             {
                 'keyword': 'AI Gadgets',
                 'value': 95,
@@ -141,3 +154,8 @@ def get_etsy_trending():
     FUTURE: Implementatie met Etsy trending items API.
     """
     pass
+
+
+# Dataset die de refresh scheduler warm houdt (alleen met live data)
+if LIVE_DATA_ENABLED:
+    register_dataset("ecommerce_trending", _fetch_trending_ecommerce, ttl=900)
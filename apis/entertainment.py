@@ -5,44 +5,69 @@ Deze module handelt trending entertainment data af.
 Bronnen: IMDb, YouTube, Spotify, Netflix trending content.
 """
 
-import requests
 import os
-from utils.cache import get_cache, set_cache
+from apis.base import Provider
+from utils import aio
+from utils.cache import get_cache
 
 # YouTube API config
 YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY', None)
-YOUTUBE_API_URL = "https://www.googleapis.com/youtube/v3/videos"
+YOUTUBE_API_URL = os.getenv("YOUTUBE_API_URL", "https://www.googleapis.com/youtube/v3/videos")
 
-def get_trending_entertainment():
-    """
-    Haalt trending entertainment data op.
+# Live data staat standaard uit: mockdata heeft afbeeldingen (LIVE_DATA_ENABLED=true voor benchmarks)
+LIVE_DATA_ENABLED = os.getenv("LIVE_DATA_ENABLED", "false").lower() in ("1", "true", "yes")
 
-    Gebruikt YouTube API als key beschikbaar, anders demo data.
 
-    Returns:
-        list: Lijst met trending entertainment items
-        None: Als de data ophalen mislukt
+class YouTubeTrending(Provider):
+    """
+    Trending videos van de YouTube Data API (10,000 requests/dag quota).
+    Zonder API key (of als de API faalt) demo data.
     """
-    # Check cache first (15 minute TTL)
-    cache_key = "entertainment_trending"
-    cached = get_cache(cache_key)
-    if cached:
-        return cached
-
-    # Return None to force fallback to mockdata with images
-    return None
-
-    # Probeer eerst YouTube API (als key beschikbaar)
-    if YOUTUBE_API_KEY:
-        youtube_data = get_youtube_trending()
-        if youtube_data:
-            return youtube_data
-
-    # Fallback naar demo data
-    try:
+
+    name = "youtube"
+    key = "entertainment_trending"
+    url = YOUTUBE_API_URL
+
+    def enabled(self):
+        return bool(YOUTUBE_API_KEY) and YOUTUBE_API_KEY != 'YOUR_YOUTUBE_API_KEY'
+
+    def params(self):
+        return {
+            'part': 'snippet,statistics',
+            'chart': 'mostPopular',
+            'regionCode': 'US',
+            'maxResults': 10,
+            'videoCategoryId': '0',  # All categories
+            'key': YOUTUBE_API_KEY
+        }
+
+    def normalize(self, data):
+        trending_items = []
+
+        if 'items' in data:
+            for video in data['items']:
+                snippet = video.get('snippet', {})
+                stats = video.get('statistics', {})
+
+                # Converteer views naar popularity score (0-100)
+                views = int(stats.get('viewCount', 0))
+                popularity = min(100, int((views / 1000000) * 10))  # 10M views = 100
+
+                trending_items.append({
+                    'title': snippet.get('title', 'Unknown'),
+                    'type': 'YouTube Video',
+                    'category': snippet.get('categoryId', 'General'),
+                    'popularity': popularity,
+                    'platform': 'YouTube',
+                    'rating': min(10, int(stats.get('likeCount', 0)) / max(1, int(stats.get('viewCount', 1))) * 1000)
+                })
+
+        return trending_items
+
+    def fallback(self):
         # MVP: Trending entertainment (statisch voor demo)
         # In productie: vervang met YouTube API, TMDb, etc.
-        trending_items = [
+        return [
             {
                 'title': 'Dune: Part Three',
                 'type': 'Movie',
@@ -125,60 +150,36 @@ def get_trending_entertainment():
             }
         ]
 
-        return trending_items
 
-    except Exception as e:
-        print(f"Entertainment Error: {e}")
-        return None
+YOUTUBE = YouTubeTrending()
 
 
-def get_youtube_trending():
-    """
-    Haalt trending videos op van YouTube Data API.
-    Gratis API met 10,000 requests/dag quota.
+def get_trending_entertainment():
     """
-    if not YOUTUBE_API_KEY or YOUTUBE_API_KEY == 'YOUR_YOUTUBE_API_KEY':
-        return None
-
-    try:
-        params = {
-            'part': 'snippet,statistics',
-            'chart': 'mostPopular',
-            'regionCode': 'US',
-            'maxResults': 10,
-            'videoCategoryId': '0',  # All categories
-            'key': YOUTUBE_API_KEY
-        }
-
-        response = requests.get(YOUTUBE_API_URL, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+    Haalt trending entertainment data op.
 
-        trending_items = []
+    Gebruikt YouTube API als key beschikbaar, anders demo data.
 
-        if 'items' in data:
-            for video in data['items']:
-                snippet = video.get('snippet', {})
-                stats = video.get('statistics', {})
+    Returns:
+        list: Lijst met trending entertainment items
+        None: Als de data ophalen mislukt
+    """
+    if not LIVE_DATA_ENABLED:
+        # Return None to force fallback to mockdata with images
+        return get_cache(YOUTUBE.key)
 
-                # Converteer views naar popularity score (0-100)
-                views = int(stats.get('viewCount', 0))
-                popularity = min(100, int((views / 1000000) * 10))  # 10M views = 100
+    # Cache met single-flight (15 minute TTL)
+    return YOUTUBE.get()
 
-                trending_items.append({
-                    'title': snippet.get('title', 'Unknown'),
-                    'type': 'YouTube Video',
-                    'category': snippet.get('categoryId', 'General'),
-                    'popularity': popularity,
-                    'platform': 'YouTube',
-                    'rating': min(10, int(stats.get('likeCount', 0)) / max(1, int(stats.get('viewCount', 1))) * 1000)
-                })
 
-        return trending_items
+def get_youtube_trending():
+    """
+    Haalt trending videos op van YouTube Data API (zonder cache en demo data).
 
-    except Exception as e:
-        print(f"YouTube API Error: {e}")
-        return None
+    Returns:
+        list: Trending videos, of None zonder key of als de API call mislukt
+    """
+    return aio.run(YOUTUBE.load_live())
 
 
 def get_tmdb_trending():
@@ -195,3 +196,8 @@ def get_spotify_trending():
     Trending tracks, artists, playlists.
     """
     pass
+
+
+# Dataset die de refresh scheduler warm houdt (alleen met live data)
+if LIVE_DATA_ENABLED:
+    YOUTUBE.register()
@@ -1,13 +1,71 @@
 """
 News feed aggregator for all categories using NewsData.io API.
 Provides unified article structure with caching support.
+
+Two ingest modes (NEWS_INGEST_MODE):
+- per_category: one NewsData.io query per category (default)
+- batched: one broad query for all categories, paginated up to
+  NEWS_INGEST_PAGES pages. Articles are classified locally by the
+  CATEGORY_QUERIES terms, and every news_<category> key is filled from
+  that one ingest cycle.
+
+  Trade-off of batched mode: the broad query only fits a few terms of each
+  category (NewsData.io caps q at 100 characters), and its results follow
+  the news, not the categories. The default of one page per category costs
+  as much as per-category mode, but a quiet category can still come back
+  with few articles. A category with fewer than NEWS_INGEST_MIN_ARTICLES
+  is topped up by its own query (news_topup_<category>, loaded on demand),
+  which costs extra credits only for those categories.
+
+Ingestion is incremental in both modes. Each news_<category> key holds a
+rolling window of up to NEWS_WINDOW_SIZE articles, deduplicated by a hash
+of their URL and ordered by pubDate, newest first. A refresh pages through
+the newest results only until it reaches an article it already has, then
+merges the new ones in. A refresh that brings nothing new keeps the cached
+window (same version) and only renews its TTL. get_articles serves any
+limit up to the window size from the cache.
+
+Near-duplicates (the same wire story from several sources or category
+queries) are grouped at ingest time with a MinHash/LSH index shared by all
+categories (utils/dedup.py). A window holds one canonical article per story,
+the earliest copy; the other copies are in its ``alternates`` list.
 """
 
-import requests
+import asyncio
+import hashlib
 import os
-from utils.cache import get_cache, set_cache
+import re
+from types import MappingProxyType
+from apis.base import Provider
+from utils import http
+from utils.cache import (UNCHANGED, add_refresh_listener, get_cache, get_cache_entry,
+                         set_cache, touch_cache)
+from utils.dedup import NearDuplicateIndex
+from utils.mockdata import MOCKDATA
+from utils.ratelimit import NORMAL, quota_for
 
 NEWS_API_KEY = os.getenv("NEWSDATA_API_KEY")
+NEWSDATA_URL = os.getenv("NEWSDATA_URL", "https://newsdata.io/api/1/news")
+
+NEWS_INGEST_MODE = os.getenv("NEWS_INGEST_MODE", "per_category").lower()
+# Batched mode: pages of the broad query per ingest and articles per page
+# (the free plan allows at most 10 per page)
+NEWS_INGEST_PAGES = int(os.getenv("NEWS_INGEST_PAGES", "6"))  # one per category
+NEWS_INGEST_PAGE_SIZE = int(os.getenv("NEWS_INGEST_PAGE_SIZE", "10"))
+# Batched mode: fewer articles than this for a category and its own query tops it up
+NEWS_INGEST_MIN_ARTICLES = int(os.getenv("NEWS_INGEST_MIN_ARTICLES", "5"))
+# NewsData.io rejects longer q parameters
+NEWSDATA_QUERY_MAX_LENGTH = 100
+
+# Articles kept per category (rolling window, newest first)
+NEWS_WINDOW_SIZE = int(os.getenv("NEWS_WINDOW_SIZE", "100"))
+# Per-category mode: max pages per refresh while no known article shows up
+NEWS_REFRESH_MAX_PAGES = int(os.getenv("NEWS_REFRESH_MAX_PAGES", "3"))
+# Group near-duplicate articles (NEAR_DUP_THRESHOLD sets how similar)
+NEWS_DEDUP_ENABLED = os.getenv("NEWS_DEDUP_ENABLED", "true").lower() not in ("0", "false", "no")
+
+# One index for all categories, so a story gets the same canonical article everywhere
+NEAR_DUPLICATES = NearDuplicateIndex() if NEWS_DEDUP_ENABLED else None
 
 # Query mappings per category
 CATEGORY_QUERIES = {
@@ -24,6 +82,10 @@ def get_articles(category, limit=10):
     """
     Fetch news articles for a specific category with caching.
 
+    Concurrent callers share a single upstream request per category, and an
+    expired list keeps being served while it is refreshed in the background.
+    Any limit up to NEWS_WINDOW_SIZE is served from the cached window.
+
     Args:
         category: Category name (crypto, stocks, ecommerce, entertainment, sports)
         limit: Maximum number of articles to return (default: 10)
@@ -31,65 +93,438 @@ def get_articles(category, limit=10):
     Returns:
         List of article dictionaries with unified structure
     """
-    cache_key = f"news_{category}"
-
-    # Check cache first (15 minute TTL)
-    cached = get_cache(cache_key)
-    if cached:
-        return cached[:limit]
-
     # Fallback if no API key
     if not NEWS_API_KEY:
         print(f"[NEWSFEEDS] No API key, using mockdata for {category}")
         return _load_fallback(category, limit)
 
-    # Build API request
-    query = CATEGORY_QUERIES.get(category, "trending")
-    url = "https://newsdata.io/api/1/news"
-    params = {
-        "apikey": NEWS_API_KEY,
-        "q": query,
-        "language": "en",
-        "size": limit
-    }
+    # Check cache first (15 minute TTL), fetch once on miss
+    if NEWS_INGEST_MODE == "batched":
+        articles = _get_batched_articles(category)
+    else:
+        articles = _provider(category).get()
+    if articles is None:
+        return _load_fallback(category, limit)
+
+    return articles[:limit]
+
+
+def _get_batched_articles(category):
+    """
+    Articles of one category from the batched ingest.
+
+    The per-category keys are written by the ingest itself; when one is
+    missing (first request, or evicted) the category is read from the ingest
+    result, which is loaded once for all categories. Nothing is written here.
+    When the ingest has fewer than NEWS_INGEST_MIN_ARTICLES for category,
+    the category's own query is loaded (and cached), and served if it has
+    more.
+
+    Returns:
+        List of articles, or None if neither has any for category
+    """
+    articles = get_cache(f"news_{category}")
+    if articles is None:
+        batch = NEWS_INGEST.get()
+        articles = batch.get(category) if batch else None
+    if articles is not None and len(articles) >= NEWS_INGEST_MIN_ARTICLES:
+        return articles
+    # Too few matches in the broad query: top up with the category's own query
+    own = _topup(category).get()
+    if own and len(own) > len(articles or ()):
+        return own
+    return articles
+
+
+def article_keys(category):
+    """Cache keys get_articles reads for category (for page version checks)"""
+    if NEWS_INGEST_MODE == "batched":
+        return [f"news_{category}", f"news_topup_{category}"]
+    return [f"news_{category}"]
+
+
+def get_mock_articles(category, limit=10):
+    """
+    Mockdata articles for a category, without touching the API or cache.
+    Used when the live articles aren't there in time (page deadline).
+
+    Args:
+        category: Category name
+        limit: Maximum number of articles to return (default: 10)
+
+    Returns:
+        List of article dictionaries with unified structure
+    """
+    return _load_fallback(category, limit)
+
+
+class NewsDataArticles(Provider):
+    """
+    Articles for one category from NewsData.io (15 minute TTL).
+    Only enabled with an API key; without one get_articles serves mockdata.
+
+    Args:
+        category: Category name
+        limit: Number of articles to request
+        key: Cache key (default: news_<category>)
+    """
+
+    name = "newsdata"
+    url = NEWSDATA_URL
+
+    def __init__(self, category, limit=10, key=None):
+        self.category = category
+        self.limit = limit
+        self.key = key or f"news_{category}"
+
+    def enabled(self):
+        return bool(NEWS_API_KEY)
+
+    def params(self, page=None):
+        params = {
+            "apikey": NEWS_API_KEY,
+            "q": CATEGORY_QUERIES.get(self.category, "trending"),
+            "language": "en",
+            "size": self.limit
+        }
+        if page:
+            params["page"] = page
+        return params
 
-    try:
-        print(f"[NEWSFEEDS] Fetching {category} articles from NewsData.io...")
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+    async def fetch(self):
+        print(f"[NEWSFEEDS] Fetching {self.category} articles from NewsData.io...")
+        window = self.cached_data() or []
+        # Without a window one page is enough to start one
+        max_pages = NEWS_REFRESH_MAX_PAGES if window else 1
+        return await _fetch_pages(self, max_pages, _window_ids(window))
+
+    def normalize(self, responses):
+        # Transform to unified structure
+        articles = [_to_article(article) for data in responses for article in data.get("results", [])]
+        window = self.cached_data()
+        merged, added = merge_articles(window or [], articles)
+
+        print(f"[NEWSFEEDS] Fetched {len(articles)} articles for {self.category}, {added} new")
+        if window and not added:
+            return UNCHANGED
+        return merged
+
+
+async def _fetch_pages(provider, max_pages, known):
+    """
+    Pages through a NewsData.io query (newest first) via nextPage.
+
+    Every page costs one NewsData.io credit. The first one is taken by the
+    cache load's quota check; each later page takes its own (normal
+    priority, without waiting), and paging stops when none is left.
+
+    Args:
+        provider: Provider with params(page)
+        max_pages: Max number of pages
+        known: Ids (_article_id) of the articles already stored; paging stops
+            at the first page that contains one of them
 
+    Returns:
+        list: Responses per page
+        http.NOT_MODIFIED: If the first page didn't change
+    """
+    responses = []
+    page = None
+    quota = quota_for(provider.name)
+    for _ in range(max(1, max_pages)):
+        # The quota file is locked and written: off the event loop
+        if responses and quota is not None and not await asyncio.to_thread(quota.acquire, NORMAL, 0):
+            break  # Out of credits: keep the pages we have
+        # Only the first page is conditional: later page tokens follow from it
+        data = await provider.get_json(provider.url, params=provider.params(page),
+                                       timeout=provider.timeout, conditional=not responses)
+        if data is http.NOT_MODIFIED:
+            return data
         if data.get("status") != "success":
+            if responses:
+                break  # Keep the pages we have
             raise Exception(f"API returned status: {data.get('status')}")
+        responses.append(data)
+        page = data.get("nextPage")
+        if not page or any(_article_id({"url": r.get("link") or ""}) in known
+                           for r in data.get("results", [])):
+            break
+    return responses
 
-        # Transform to unified structure
-        articles = [
-            {
-                "title": article["title"],
-                "description": article.get("description", "")[:200],  # Limit description length
-                "source": article.get("source_id", "Unknown"),
-                "url": article["link"],
-                "image": article.get("image_url") or "/static/placeholder.svg",
-                "published": article.get("pubDate", "")
-            }
-            for article in data.get("results", [])
-        ]
-
-        # Cache for 15 minutes (900 seconds)
-        set_cache(cache_key, articles, ttl=900)
-
-        print(f"[NEWSFEEDS] Fetched {len(articles)} articles for {category}")
-        return articles[:limit]
-
-    except Exception as e:
-        print(f"[NEWSFEEDS ERROR] {category}: {e}")
-        return _load_fallback(category, limit)
+
+def _article_id(article):
+    """Dedup key of an article: hash of its URL (without trailing slash)"""
+    url = (article.get("url") or "").strip().rstrip("/")
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _window_ids(window):
+    """Ids of every article in a window, alternates included"""
+    return {_article_id(a) for article in window for a in (article, *article.get("alternates", ()))}
+
+
+def _article_text(article):
+    return f"{article.get('title') or ''} {article.get('description') or ''}"
+
+
+def _collapse_duplicates(articles):
+    """
+    One canonical article per near-duplicate cluster, the other copies as
+    its ``alternates``. Existing alternates are clustered again, so a new
+    copy that is older than the current canonical takes its place.
+    """
+    flat = []
+    for article in articles:
+        flat.append({k: v for k, v in article.items() if k != "alternates"})
+        flat.extend(article.get("alternates", ()))
+
+    collapsed = []
+    for members in NEAR_DUPLICATES.cluster(flat, key=_article_id, text=_article_text):
+        # The earliest copy is the original story; min() keeps the first one on ties
+        canonical = min(members, key=lambda a: a.get("published") or "9999")
+        collapsed.append(dict(canonical, alternates=[a for a in members if a is not canonical]))
+    return collapsed
+
+
+def merge_articles(window, articles, max_size=None):
+    """
+    Merges articles into a rolling window.
+
+    Articles already in the window (same URL, also as an alternate) are
+    skipped and near-duplicates are grouped (NEWS_DEDUP_ENABLED); the result
+    is ordered by pubDate (newest first, articles without a date last) and
+    cut to max_size.
+
+    Args:
+        window: Current articles (newest first)
+        articles: Freshly fetched articles
+        max_size: Window size (default: NEWS_WINDOW_SIZE)
+
+    Returns:
+        tuple: (merged window, number of new articles in it)
+    """
+    if max_size is None:
+        max_size = NEWS_WINDOW_SIZE
+    seen = _window_ids(window)
+    new = []
+    for article in articles:
+        article_id = _article_id(article)
+        if article_id not in seen:
+            seen.add(article_id)
+            new.append(article)
+    if not new:
+        return list(window[:max_size]), 0
+    # pubDate is "YYYY-MM-DD HH:MM:SS", so it sorts as a string; sorted() is
+    # stable, so equal dates keep new articles ahead of older ones
+    combined = new + list(window)
+    if NEAR_DUPLICATES is not None:
+        combined = _collapse_duplicates(combined)
+    merged = sorted(combined, key=lambda a: a.get("published") or "", reverse=True)[:max_size]
+    new_ids = {_article_id(article) for article in new}
+    return merged, len(_window_ids(merged) & new_ids)
+
+
+def _to_article(article):
+    """One NewsData.io result in the unified article structure"""
+    return {
+        "title": article["title"],
+        "description": (article.get("description") or "")[:200],  # Limit description length
+        "source": article.get("source_id", "Unknown"),
+        "url": article["link"],
+        "image": article.get("image_url") or "/static/placeholder.svg",
+        "published": article.get("pubDate", "")
+    }
+
+
+def _query_terms(query):
+    """Lowercase terms of an OR query ("stock market OR finance" -> ["stock market", "finance"])"""
+    return [term.strip().lower() for term in query.split(" OR ") if term.strip()]
+
+
+def _broad_query(max_length=NEWSDATA_QUERY_MAX_LENGTH):
+    """
+    One OR query covering every category: terms are taken round-robin
+    (each category's first term, then each second term, ...) while they fit.
+    """
+    per_category = [_query_terms(query) for query in CATEGORY_QUERIES.values()]
+    query = ""
+    for depth in range(max(len(terms) for terms in per_category)):
+        for terms in per_category:
+            if depth >= len(terms):
+                continue
+            candidate = f"{query} OR {terms[depth]}" if query else terms[depth]
+            if len(candidate) <= max_length:
+                query = candidate
+    return query
+
+
+class KeywordClassifier:
+    """
+    Assigns articles to categories by the terms of their queries.
+
+    All terms are compiled into one regex, so an article costs one scan of
+    its title and description. An article goes to every category with a
+    matching term; articles without any match go to the default category.
+
+    Args:
+        queries: Category -> OR query (CATEGORY_QUERIES)
+        default: Category for articles that match no term
+    """
+
+    def __init__(self, queries, default="home"):
+        self.default = default
+        self._categories = {}
+        for category, query in queries.items():
+            for term in _query_terms(query):
+                self._categories.setdefault(term, []).append(category)
+        # Longest first, so "stock market" wins over a shorter overlapping term
+        terms = sorted(self._categories, key=len, reverse=True)
+        self._pattern = re.compile(r"\b(?:" + "|".join(re.escape(term) for term in terms) + r")\b")
+
+    def classify(self, article):
+        """
+        Returns:
+            list: Categories of article, in order of first match
+        """
+        text = f"{article.get('title') or ''} {article.get('description') or ''}".lower()
+        categories = []
+        for term in self._pattern.findall(text):
+            for category in self._categories[term]:
+                if category not in categories:
+                    categories.append(category)
+        return categories or [self.default]
+
+
+CLASSIFIER = KeywordClassifier(CATEGORY_QUERIES)
+
+
+class NewsDataIngest(Provider):
+    """
+    Batched ingest: one broad NewsData.io query for all categories
+    (NEWS_INGEST_MODE=batched), classified locally with CLASSIFIER.
+    Only enabled with an API key.
+    """
+
+    name = "newsdata"
+    key = "news_ingest"
+    url = NEWSDATA_URL
+
+    def __init__(self, pages=NEWS_INGEST_PAGES, size=NEWS_INGEST_PAGE_SIZE):
+        self.pages = max(1, pages)
+        self.size = size
+        self.query = _broad_query()
+
+    def enabled(self):
+        return bool(NEWS_API_KEY)
+
+    def params(self, page=None):
+        params = {
+            "apikey": NEWS_API_KEY,
+            "q": self.query,
+            "language": "en",
+            "size": self.size
+        }
+        if page:
+            params["page"] = page
+        return params
+
+    async def fetch(self):
+        """
+        Haalt de pagina's van de brede query op (volgende pagina via nextPage).
+
+        Returns:
+            list: Responses per pagina
+            http.NOT_MODIFIED: Als de eerste pagina niet veranderd is
+        """
+        print(f"[NEWSFEEDS] Fetching batched ingest ({self.pages} page(s)) from NewsData.io...")
+        windows = self.cached_data() or {}
+        known = {article_id for window in windows.values() for article_id in _window_ids(window)}
+        return await _fetch_pages(self, self.pages, known)
+
+    async def load(self):
+        data = await super().load()
+        if data is UNCHANGED:
+            # Not modified (304 or nothing new): the ingest key only gets a new
+            # TTL, and the category keys are renewed with it (cache writes: off the loop)
+            await asyncio.to_thread(_renew_categories, self.key)
+        return data
+
+    def normalize(self, responses):
+        by_category = {category: [] for category in CATEGORY_QUERIES}
+        for data in responses:
+            for result in data.get("results", []):
+                article = _to_article(result)
+                for category in CLASSIFIER.classify(article):
+                    by_category.setdefault(category, []).append(article)
+
+        # Merge into the windows of the previous ingest (pages may overlap too)
+        windows = self.cached_data()
+        merged = dict(windows or {})
+        added = {}
+        for category, articles in by_category.items():
+            if articles:
+                merged[category], added[category] = merge_articles(merged.get(category, []), articles)
+
+        print(f"[NEWSFEEDS] Ingested {sum(len(a) for a in by_category.values())} articles, new: "
+              + ", ".join(f"{c} {n}" for c, n in added.items()))
+        if windows and not any(added.values()):
+            return UNCHANGED
+        return merged or None
+
+
+NEWS_INGEST = NewsDataIngest()
+
+
+def _renew_categories(key):
+    """Renew the TTL of every category key of the ingest stored under key"""
+    entry = get_cache_entry(key)
+    if entry is not None:
+        _fill_categories(entry.data, unchanged=True)
+
+
+def _fill_categories(batch, unchanged=False):
+    """
+    Write an ingest result to the news_<category> keys (after every ingest).
+
+    Unchanged categories only get a new TTL, so their version (and every
+    page rendered from them) stays valid.
+
+    Args:
+        batch: Articles by category
+        unchanged: The ingest found nothing new, so every category is unchanged
+    """
+    for category, articles in batch.items():
+        key = f"news_{category}"
+        entry = None if unchanged else get_cache_entry(key)
+        same = unchanged or (entry is not None and entry.data == articles)
+        if same and touch_cache(key, ttl=NEWS_INGEST.ttl):
+            continue
+        set_cache(key, articles, ttl=NEWS_INGEST.ttl)
+
+
+# One provider per category
+NEWSDATA = {category: NewsDataArticles(category) for category in CATEGORY_QUERIES}
+
+
+def _provider(category):
+    provider = NEWSDATA.get(category)
+    return provider if provider is not None else NewsDataArticles(category)
+
+
+# Batched mode: a category's own query, for when the ingest brings too few
+NEWS_TOPUP = {category: NewsDataArticles(category, key=f"news_topup_{category}")
+              for category in CATEGORY_QUERIES}
+
+
+def _topup(category):
+    provider = NEWS_TOPUP.get(category)
+    return provider if provider is not None else NewsDataArticles(category, key=f"news_topup_{category}")
 
 
 def _load_fallback(category, limit=10):
     """
     Load mockdata as fallback when API fails.
-    Transforms mockdata to match news article structure.
+    The transformed articles are built once per version of the mockdata file.
 
     Args:
         category: Category name
@@ -98,28 +533,41 @@ def _load_fallback(category, limit=10):
     Returns:
         List of articles from mockdata with unified structure
     """
-    import json
-    mockdata_path = f"static/mockdata/{category}.json"
-
-    try:
-        with open(mockdata_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-            # Transform mockdata to news article format
-            articles = []
-            for item in data[:limit]:
-                article = {
-                    "title": item.get("title") or item.get("name") or item.get("keyword") or "Untitled",
-                    "description": item.get("description", "")[:200],
-                    "source": item.get("source", "TrendWatcher"),
-                    "url": item.get("url", "#"),  # Mockdata has no URL
-                    "image": item.get("image") or item.get("thumb") or "/static/placeholder.svg",
-                    "published": ""
-                }
-                articles.append(article)
-
-            print(f"[NEWSFEEDS] Loaded {len(articles)} articles from {mockdata_path}")
-            return articles
-    except Exception as e:
-        print(f"[NEWSFEEDS ERROR] Failed to load fallback: {e}")
-        return []
+    articles = MOCKDATA.derived(category, "articles",
+                                lambda items: _mock_to_articles(category, items))
+    return list(articles[:limit])
+
+
+def _mock_to_articles(category, items):
+    """
+    Transform mockdata records to the news article structure.
+
+    Args:
+        category: Category name (for logging)
+        items: Mockdata records
+
+    Returns:
+        Tuple of read-only articles with unified structure
+    """
+    articles = tuple(
+        MappingProxyType({
+            "title": item.get("title") or item.get("name") or item.get("keyword") or "Untitled",
+            "description": item.get("description", "")[:200],
+            "source": item.get("source", "TrendWatcher"),
+            "url": item.get("url", "#"),  # Mockdata has no URL
+            "image": item.get("image") or item.get("thumb") or "/static/placeholder.svg",
+            "published": ""
+        })
+        for item in items
+    )
+    print(f"[NEWSFEEDS] Loaded {len(articles)} articles from mockdata for {category}")
+    return articles
+
+
+# Keep every category warm via the refresh scheduler (only with an API key)
+if NEWS_API_KEY and NEWS_INGEST_MODE == "batched":
+    add_refresh_listener(NEWS_INGEST.key, _fill_categories)
+    NEWS_INGEST.register()
+elif NEWS_API_KEY:
+    for _news in NEWSDATA.values():
+        _news.register()
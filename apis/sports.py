@@ -5,42 +5,139 @@ Deze module handelt trending sports data af.
 Bronnen: TheSportsDB (live events), ESPN, Reddit sports communities.
 """
 
-import requests
+import asyncio
+import os
 from datetime import datetime, timedelta
-from utils.cache import get_cache, set_cache
+from apis.base import Provider
+from utils import aio, http
+from utils.cache import get_cache
+from utils.ratelimit import configure_quota
 
-# TheSportsDB API endpoint (gratis, geen key nodig voor basis calls)
-THESPORTSDB_BASE_URL = "https://www.thesportsdb.com/api/v1/json/3"
+# TheSportsDB API endpoint (gratis, geen key nodig voor basis calls; env: bv. tools/standin_server.py)
+THESPORTSDB_BASE_URL = os.getenv("THESPORTSDB_BASE_URL", "https://www.thesportsdb.com/api/v1/json/3")
 
-def get_trending_sports():
-    """
-    Haalt trending sports events en nieuws op.
+# Live data staat standaard uit: mockdata heeft afbeeldingen (LIVE_DATA_ENABLED=true voor benchmarks)
+LIVE_DATA_ENABLED = os.getenv("LIVE_DATA_ENABLED", "false").lower() in ("1", "true", "yes")
 
-    Probeert eerst live data van TheSportsDB API, fallback naar demo data.
+# Leagues worden parallel opgehaald: max aantal tegelijk en totale deadline (seconden)
+SPORTS_FANOUT_WORKERS = int(os.getenv("SPORTS_FANOUT_WORKERS", "6"))
+SPORTS_FANOUT_DEADLINE = float(os.getenv("SPORTS_FANOUT_DEADLINE", "6"))
 
-    Returns:
-        list: Lijst met trending sports items
-        None: Als de data ophalen mislukt
+# Populaire leagues om te checken (Belgische Jupiler Pro League eerst!)
+POPULAR_LEAGUES = [
+    ('4330', 'Belgian Jupiler Pro League', 'Football'),
+    ('4424', 'UEFA Champions League', 'Football'),
+    ('4328', 'English Premier League', 'Football'),
+    ('4331', 'Spanish La Liga', 'Football'),
+    ('4332', 'Italian Serie A', 'Football'),
+    ('4387', 'NBA', 'Basketball'),
+]
+
+# Genoeg keep-alive connecties voor alle parallelle league requests
+http.configure_host(THESPORTSDB_BASE_URL, pool_maxsize=max(1, SPORTS_FANOUT_WORKERS))
+# Eén refresh = één call per league
+configure_quota("thesportsdb", cost=len(POPULAR_LEAGUES))
+
+
+class TheSportsDBEvents(Provider):
+    """
+    Volgende events van de populaire leagues op TheSportsDB.
+    Als de API niets oplevert: demo data.
     """
-    # Check cache first (15 minute TTL)
-    cache_key = "sports_trending"
-    cached = get_cache(cache_key)
-    if cached:
-        return cached
-
-    # Return None to force fallback to mockdata with images
-    return None
-
-    # Probeer eerst TheSportsDB API
-    live_data = get_thesportsdb_trending()
-    if live_data and len(live_data) > 0:
-        return live_data
-
-    # Fallback naar demo data als API niet werkt
-    try:
+
+    name = "thesportsdb"
+    key = "sports_trending"
+
+    def __init__(self):
+        # Laatst ontvangen events per league (voor leagues zonder wijzigingen)
+        self._events = {}
+
+    async def fetch(self):
+        """
+        Haalt volgende events op voor alle leagues tegelijk, binnen één deadline.
+
+        Returns:
+            list: Events per league (None voor een mislukte of te trage league), in league volgorde
+            http.NOT_MODIFIED: Als geen enkele league veranderd is
+        """
+        limit = asyncio.Semaphore(max(1, SPORTS_FANOUT_WORKERS))
+
+        async def league_events(league_id):
+            async with limit:
+                return await self._fetch_league_events(league_id)
+
+        tasks = [asyncio.ensure_future(league_events(league_id))
+                 for league_id, _, _ in POPULAR_LEAGUES]
+        _, pending = await asyncio.wait(tasks, timeout=SPORTS_FANOUT_DEADLINE)
+
+        results = []
+        for (league_id, _, _), task in zip(POPULAR_LEAGUES, tasks):
+            if task in pending:
+                # Te traag: deze league overslaan, de rest gaat gewoon door
+                task.cancel()
+                print(f"League {league_id} missed the {SPORTS_FANOUT_DEADLINE:g}s deadline, skipping")
+                results.append(None)
+            else:
+                results.append(task.result())
+
+        if all(events is http.NOT_MODIFIED for events in results):
+            return http.NOT_MODIFIED
+        # Ongewijzigde leagues: de events van de vorige response hergebruiken
+        return [self._events.get(league_id) if events is http.NOT_MODIFIED else events
+                for (league_id, _, _), events in zip(POPULAR_LEAGUES, results)]
+
+    async def _fetch_league_events(self, league_id):
+        """
+        Haalt de volgende events van één league op.
+
+        Args:
+            league_id: TheSportsDB league id
+
+        Returns:
+            list: Events van de league
+            http.NOT_MODIFIED: Als de events niet veranderd zijn
+            None: Als de call mislukt (league wordt overgeslagen)
+        """
+        try:
+            url = f"{THESPORTSDB_BASE_URL}/eventsnextleague.php?id={league_id}"
+            data = await self.get_json(url, timeout=5)
+            if data is http.NOT_MODIFIED:
+                return data
+            events = data.get('events') if data else None
+            self._events[league_id] = events
+            return events
+
+        except Exception as e:
+            # Skip deze league bij fout, de andere leagues gaan door
+            print(f"Error fetching league {league_id}: {e}")
+            return None
+
+    def normalize(self, results):
+        trending_items = []
+
+        # Verwerk in vaste league volgorde (popularity hangt af van de positie)
+        for (league_id, league_name, sport), events in zip(POPULAR_LEAGUES, results):
+            if not events:
+                continue
+
+            # Neem eerste upcoming events
+            for event in events[:2]:  # Max 2 per league
+                if event:
+                    trending_items.append({
+                        'title': f"{event.get('strHomeTeam', 'TBD')} vs {event.get('strAwayTeam', 'TBD')}",
+                        'sport': sport,
+                        'league': league_name,
+                        'popularity': min(99, 85 + len(trending_items) * 2),  # Mock popularity score
+                        'status': event.get('strStatus', 'Upcoming'),
+                        'engagement': f"{max(5, 100 - len(trending_items) * 10)}K mentions"  # Mock engagement
+                    })
+
+        return trending_items if len(trending_items) > 0 else None
+
+    def fallback(self):
         # MVP: Trending sports (statisch voor demo)
         # In productie: vervang met ESPN API, TheSportsDB, etc.
-        trending_items = [
+        return [
             {
                 'title': 'Champions League Final',
                 'sport': 'Football',
@@ -123,11 +220,26 @@ def get_trending_sports():
             }
         ]
 
-        return trending_items
 
-    except Exception as e:
-        print(f"Sports Error: {e}")
-        return None
+THESPORTSDB = TheSportsDBEvents()
+
+
+def get_trending_sports():
+    """
+    Haalt trending sports events en nieuws op.
+
+    Probeert eerst live data van TheSportsDB API, fallback naar demo data.
+
+    Returns:
+        list: Lijst met trending sports items
+        None: Als de data ophalen mislukt
+    """
+    if not LIVE_DATA_ENABLED:
+        # Return None to force fallback to mockdata with images
+        return get_cache(THESPORTSDB.key)
+
+    # Cache met single-flight (15 minute TTL)
+    return THESPORTSDB.get()
 
 
 def get_espn_trending():
@@ -140,57 +252,14 @@ def get_espn_trending():
 
 def get_thesportsdb_trending():
     """
-    Haalt live sports events op van TheSportsDB API.
+    Haalt live sports events op van TheSportsDB API (zonder cache en demo data).
     Gratis API voor league data, live scores, upcoming matches.
 
     Returns:
         list: Lijst met trending sports events
         None: Als de API call mislukt
     """
-    try:
-        trending_items = []
-
-        # Populaire leagues om te checken (Belgische Jupiler Pro League eerst!)
-        popular_leagues = [
-            ('4330', 'Belgian Jupiler Pro League', 'Football'),
-            ('4424', 'UEFA Champions League', 'Football'),
-            ('4328', 'English Premier League', 'Football'),
-            ('4331', 'Spanish La Liga', 'Football'),
-            ('4332', 'Italian Serie A', 'Football'),
-            ('4387', 'NBA', 'Basketball'),
-        ]
-
-        # Haal volgende events op voor elke league
-        for league_id, league_name, sport in popular_leagues[:3]:  # Eerste 3 om API calls te beperken
-            try:
-                url = f"{THESPORTSDB_BASE_URL}/eventsnextleague.php?id={league_id}"
-                response = requests.get(url, timeout=5)
-                response.raise_for_status()
-                data = response.json()
-
-                if data and 'events' in data and data['events']:
-                    # Neem eerste upcoming event
-                    for event in data['events'][:2]:  # Max 2 per league
-                        if event:
-                            trending_items.append({
-                                'title': f"{event.get('strHomeTeam', 'TBD')} vs {event.get('strAwayTeam', 'TBD')}",
-                                'sport': sport,
-                                'league': league_name,
-                                'popularity': 85 + len(trending_items) * 2,  # Mock popularity score
-                                'status': event.get('strStatus', 'Upcoming'),
-                                'engagement': f"{(100 - len(trending_items) * 10)}K mentions"  # Mock engagement
-                            })
-
-            except Exception as e:
-                # Skip deze league bij fout, ga door met volgende
-                print(f"Error fetching league {league_id}: {e}")
-                continue
-
-        return trending_items if len(trending_items) > 0 else None
-
-    except Exception as e:
-        print(f"TheSportsDB Error: {e}")
-        return None
+    return aio.run(THESPORTSDB.load_live())
 
 
 def get_reddit_sports_trending():
@@ -199,3 +268,8 @@ def get_reddit_sports_trending():
     Trending posts from sports subreddits.
     """
     pass
+
+
+# Dataset die de refresh scheduler warm houdt (alleen met live data)
+if LIVE_DATA_ENABLED:
+    THESPORTSDB.register()
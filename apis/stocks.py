@@ -5,107 +5,110 @@ Deze module handelt alle interacties met de Alpha Vantage API af.
 API voor stock market data - trending aandelen en top gainers/losers.
 """
 
-import requests
 import os
-from utils.cache import get_cache, set_cache
+from apis.base import Provider
+from utils import http
+from utils.cache import get_cache
+from utils.metrics import timed_fetch
 
-# Alpha Vantage API endpoints
-ALPHA_VANTAGE_BASE_URL = "https://www.alphavantage.co/query"
+# Alpha Vantage API endpoints (env: bv. tools/standin_server.py)
+ALPHA_VANTAGE_BASE_URL = os.getenv("ALPHA_VANTAGE_BASE_URL", "https://www.alphavantage.co/query")
 
-def get_trending_stocks(api_key=None):
+# Live data staat standaard uit: mockdata heeft een consistentere structuur (LIVE_DATA_ENABLED=true voor benchmarks)
+LIVE_DATA_ENABLED = os.getenv("LIVE_DATA_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+class AlphaVantageMovers(Provider):
     """
-    Haalt trending stock market data op van Alpha Vantage.
-    Gebruikt de TOP_GAINERS_LOSERS functie voor de meest bewegende aandelen.
+    Top gainers en losers van Alpha Vantage (TOP_GAINERS_LOSERS, 15 minute TTL).
 
     Args:
         api_key (str): Alpha Vantage API key (optioneel, gebruikt env var als niet gegeven)
-
-    Returns:
-        list: Lijst met trending stocks (symbol, naam, price, change_percentage)
-        None: Als de API call mislukt
     """
-    # Check cache first (15 minute TTL)
-    cache_key = "stocks_trending"
-    cached = get_cache(cache_key)
-    if cached:
-        return cached
 
-    # Return None to force fallback to mockdata with consistent structure
-    return None
+    name = "alphavantage"
+    key = "stocks_trending"
+    url = ALPHA_VANTAGE_BASE_URL
 
-    # Gebruik API key van parameter of environment variable
-    if api_key is None:
-        api_key = os.environ.get('ALPHA_VANTAGE_API_KEY', 'IIBD0TLOIBKW0AXZ')
+    def __init__(self, api_key=None):
+        self.api_key = api_key
 
-    try:
-        # Alpha Vantage TOP_GAINERS_LOSERS endpoint
-        params = {
+    def params(self):
+        # Gebruik API key van parameter of environment variable
+        api_key = self.api_key
+        if api_key is None:
+            api_key = os.environ.get('ALPHA_VANTAGE_API_KEY', 'IIBD0TLOIBKW0AXZ')
+        return {
             'function': 'TOP_GAINERS_LOSERS',
             'apikey': api_key
         }
 
-        # Doe een GET request naar de Alpha Vantage API
-        response = requests.get(ALPHA_VANTAGE_BASE_URL, params=params, timeout=10)
-
-        # Check of de request succesvol was (status code 200)
-        response.raise_for_status()
-
-        # Parse de JSON response
-        data = response.json()
+    def normalize(self, data):
+        """
+        Combineert top 5 gainers en top 5 losers.
 
+        Returns:
+            list: Lijst met trending stocks (symbol, naam, price, change_percentage)
+            None: Bij een API error message
+        """
         # Check voor API error messages
         if 'Error Message' in data or 'Note' in data:
             print(f"Alpha Vantage API Error: {data}")
             return None
 
-        # Verwerk de data - combineer top gainers en top losers
         trending_stocks = []
 
         # Voeg top 5 gainers toe
         if 'top_gainers' in data:
             for stock in data['top_gainers'][:5]:
-                stock_info = {
-                    'symbol': stock.get('ticker', 'N/A'),
-                    'name': stock.get('ticker', 'N/A'),  # Alpha Vantage geeft geen volledige naam in deze endpoint
-                    'price': stock.get('price', '0'),
-                    'change_amount': stock.get('change_amount', '0'),
-                    'change_percentage': stock.get('change_percentage', '0%'),
-                    'volume': stock.get('volume', '0'),
-                    'trend_type': 'gainer'  # Markeer als gainer
-                }
-                trending_stocks.append(stock_info)
+                trending_stocks.append(_stock_info(stock, 'gainer'))  # Markeer als gainer
 
         # Voeg top 5 losers toe
         if 'top_losers' in data:
             for stock in data['top_losers'][:5]:
-                stock_info = {
-                    'symbol': stock.get('ticker', 'N/A'),
-                    'name': stock.get('ticker', 'N/A'),
-                    'price': stock.get('price', '0'),
-                    'change_amount': stock.get('change_amount', '0'),
-                    'change_percentage': stock.get('change_percentage', '0%'),
-                    'volume': stock.get('volume', '0'),
-                    'trend_type': 'loser'  # Markeer als loser
-                }
-                trending_stocks.append(stock_info)
-
-        # Cache for 15 minutes (900 seconds)
-        if trending_stocks:
-            set_cache(cache_key, trending_stocks, ttl=900)
+                trending_stocks.append(_stock_info(stock, 'loser'))  # Markeer als loser
 
         return trending_stocks
 
-    except requests.exceptions.RequestException as e:
-        # Netwerk fouten, timeouts, etc.
-        print(f"API Error: {e}")
-        return None
 
-    except Exception as e:
-        # Andere onverwachte fouten
-        print(f"Unexpected Error: {e}")
-        return None
+def _stock_info(stock, trend_type):
+    """Relevante velden van één Alpha Vantage stock"""
+    return {
+        'symbol': stock.get('ticker', 'N/A'),
+        'name': stock.get('ticker', 'N/A'),  # Alpha Vantage geeft geen volledige naam in deze endpoint
+        'price': stock.get('price', '0'),
+        'change_amount': stock.get('change_amount', '0'),
+        'change_percentage': stock.get('change_percentage', '0%'),
+        'volume': stock.get('volume', '0'),
+        'trend_type': trend_type
+    }
 
 
+ALPHA_VANTAGE = AlphaVantageMovers()
+
+
+def get_trending_stocks(api_key=None):
+    """
+    Haalt trending stock market data op van Alpha Vantage.
+    Gebruikt de TOP_GAINERS_LOSERS functie voor de meest bewegende aandelen.
+
+    Args:
+        api_key (str): Alpha Vantage API key (optioneel, gebruikt env var als niet gegeven)
+
+    Returns:
+        list: Lijst met trending stocks (symbol, naam, price, change_percentage)
+        None: Als de API call mislukt
+    """
+    if not LIVE_DATA_ENABLED:
+        # Return None to force fallback to mockdata with consistent structure
+        return get_cache(ALPHA_VANTAGE.key)
+
+    # Cache met single-flight: bij expiry doet maar één request de API call (15 minute TTL)
+    provider = ALPHA_VANTAGE if api_key is None else AlphaVantageMovers(api_key)
+    return provider.get()
+
+
+@timed_fetch("alphavantage")
 def get_stock_quote(symbol, api_key=None):
     """
     Haalt een realtime quote op voor een specifiek aandeel.
@@ -128,7 +131,7 @@ def get_stock_quote(symbol, api_key=None):
             'apikey': api_key
         }
 
-        response = requests.get(ALPHA_VANTAGE_BASE_URL, params=params, timeout=10)
+        response = http.get(ALPHA_VANTAGE_BASE_URL, params=params)
         response.raise_for_status()
 
         data = response.json()
@@ -148,3 +151,8 @@ def get_stock_quote(symbol, api_key=None):
     except Exception as e:
         print(f"Error fetching quote for {symbol}: {e}")
         return None
+
+
+# Dataset die de refresh scheduler warm houdt (alleen met live data)
+if LIVE_DATA_ENABLED:
+    ALPHA_VANTAGE.register()
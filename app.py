@@ -4,20 +4,39 @@ TrendWatcher - Multi-Theme Flask Webapp
 Multi-market trending data met per-category themes.
 """
 
-from flask import Flask, render_template, jsonify, request, redirect, url_for
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for
 from apis.coingecko import get_trending_crypto
 from apis.stocks import get_trending_stocks
 from apis.ecommerce import get_trending_ecommerce
 from apis.entertainment import get_trending_entertainment
 from apis.sports import get_trending_sports
-from apis.newsfeeds import get_articles
+from apis.newsfeeds import article_keys, get_articles, get_mock_articles
 from utils.affiliates import add_affiliate_to_articles
+from utils.compression import init_compression
+from utils.fragment_cache import init_fragment_cache
+from utils.loader import init_request_loader, request_loader
+from utils.cache import get_cache_version, load_snapshot, serve_from_cache_only, start_snapshots
+from utils.metrics import enable_flush, render_prometheus
+from utils.page_cache import cached_page
+from utils.mockdata import MOCKDATA
+from utils.template_cache import init_template_cache
+from utils.streaming import defer, init_streaming, render_page
+from utils.scheduler import DATASETS, SCHEDULER_MODE, start_scheduler
+from utils.trend_index import TREND_INDEX_K, get_trend_index
 from datetime import datetime
+from functools import partial
+from operator import itemgetter
 import os
 import json
 import threading
 
 app = Flask(__name__)
+init_request_loader(app)
+init_streaming(app)
+init_compression(app)
+init_fragment_cache(app)
+# Na de extensions: templates compileren (of uit data/jinja_cache laden)
+init_template_cache(app)
 
 # Google Analytics tracking ID
 GA_TRACKING_ID = os.environ.get('GA_TRACKING_ID', 'G-HP85ZJG199')
@@ -26,51 +45,115 @@ GA_TRACKING_ID = os.environ.get('GA_TRACKING_ID', 'G-HP85ZJG199')
 VOTES_FILE = "data/votes.json"
 _vote_lock = threading.Lock()
 
-# ========== MOCKDATA HELPER ==========
+# Reload mockdata on inotify events when watchdog is installed (else mtime polling)
+MOCKDATA.watch()
+
+# Metrics snapshots per worker, zodat /metrics alle workers optelt
+enable_flush()
+
+# Warm restart: restore the last cache snapshot and keep writing new ones
+load_snapshot()
+start_snapshots()
+
+# Background refresh: handlers only read from cache when a scheduler keeps it warm
+if SCHEDULER_MODE == "inprocess":
+    start_scheduler()
+elif SCHEDULER_MODE == "external":
+    # Refreshed by tools/refresh_worker.py (needs CACHE_BACKEND=sqlite/redis)
+    serve_from_cache_only(DATASETS)
+
+# ========== DATASET HELPERS ==========
+# Alle lookups lopen via de request loader: elke dataset max. één keer per request
+
+ARTICLES_PER_PAGE = 10
+
+# Live trending data per category (cache key <category>_trending)
+TRENDING_SOURCES = {
+    'crypto': get_trending_crypto,
+    'stocks': get_trending_stocks,
+    'ecommerce': get_trending_ecommerce,
+    'entertainment': get_trending_entertainment,
+    'sports': get_trending_sports,
+}
 
 def load_mock(category):
     """
     Load mock data from JSON file as fallback.
+    Parsed once and reloaded only when the file changes (see utils/mockdata.py).
 
     Args:
         category (str): Category name (crypto, stocks, ecommerce, entertainment, sports)
 
     Returns:
-        list: Mock data or empty list if file not found
+        tuple: Read-only mock records, or empty tuple if file not found
+    """
+    return request_loader().load(f"mock_{category}", partial(MOCKDATA.get, category),
+                                 version=partial(MOCKDATA.version, category))
+
+def load_trending(category):
+    """
+    Live trending data for a category, looked up once per request.
+
+    Args:
+        category (str): Category name (key of TRENDING_SOURCES)
+
+    Returns:
+        list: Trending items, or None/empty if there is no live data
     """
-    path = f"static/mockdata/{category}.json"
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading mock data for {category}: {e}")
-            return []
-    return []
+    key = f"{category}_trending"
+    return request_loader().load(key, TRENDING_SOURCES[category],
+                                 version=partial(get_cache_version, key))
+
+def load_trending_or_mock(category):
+    """Live trending data for a category, or its mockdata when there is none"""
+    data = load_trending(category)
+    if not data or len(data) == 0:
+        data = load_mock(category)
+    return data
+
+def load_articles(category):
+    """News articles for a category, looked up once per request."""
+    keys = article_keys(category)
+    # Zonder API key (of als die faalt) komen de artikelen uit de mockdata
+    return request_loader().load(keys[0], partial(get_articles, category, limit=ARTICLES_PER_PAGE),
+                                 version=lambda: (tuple(get_cache_version(k) for k in keys),
+                                                  MOCKDATA.version(category)))
+
+def mock_articles(category):
+    """Mockdata artikelen: fallback als de echte niet op tijd binnen zijn (PAGE_DATA_DEADLINE)"""
+    return get_mock_articles(category, limit=ARTICLES_PER_PAGE)
+
+def top_articles(articles):
+    """Eerste 5 artikelen voor het 'trending' blok"""
+    return articles[:5] if articles else []
 
 # Helper functions voor demo data
+DEMO_GAINERS = [
+    {"symbol": "SPRB", "change": "+1434%"},
+    {"symbol": "SOPA", "change": "+275%"},
+    {"symbol": "TSLA", "change": "+12%"}
+]
+
+DEMO_LOSERS = [
+    {"symbol": "DOGE", "change": "-15%"},
+    {"symbol": "META", "change": "-8%"}
+]
+
 def get_demo_gainers():
     """Top gainers voor sidebar"""
-    stocks = get_trending_stocks()
+    stocks = load_trending('stocks')
     if stocks:
         return [{"symbol": s['symbol'], "change": s['change_percentage']}
                 for s in stocks if s.get('trend_type') == 'gainer'][:5]
-    return [
-        {"symbol": "SPRB", "change": "+1434%"},
-        {"symbol": "SOPA", "change": "+275%"},
-        {"symbol": "TSLA", "change": "+12%"}
-    ]
+    return DEMO_GAINERS
 
 def get_demo_losers():
     """Top losers voor sidebar"""
-    stocks = get_trending_stocks()
+    stocks = load_trending('stocks')
     if stocks:
         return [{"symbol": s['symbol'], "change": s['change_percentage']}
                 for s in stocks if s.get('trend_type') == 'loser'][:5]
-    return [
-        {"symbol": "DOGE", "change": "-15%"},
-        {"symbol": "META", "change": "-8%"}
-    ]
+    return DEMO_LOSERS
 
 def get_demo_articles():
     """Demo articles voor homepage"""
@@ -104,185 +187,198 @@ def _write_votes(votes_dict):
 # ========== PAGE ROUTES ==========
 
 @app.route('/')
+@cached_page
 def home():
     """Homepage - Newspaper style"""
-    # Get news articles for homepage
-    articles_data = get_articles("home", limit=10)
+    def load_home_articles():
+        # Get news articles for homepage
+        articles_data = load_articles("home")
+
+        # Fallback to mockdata if no articles
+        if not articles_data or len(articles_data) == 0:
+            articles_data = load_mock('home')
 
-    # Fallback to mockdata if no articles
-    if not articles_data or len(articles_data) == 0:
-        articles_data = load_mock('home')
+        # Ensure we have at least one article
+        if not articles_data or len(articles_data) == 0:
+            articles_data = [{"title": "Welcome to TrendWatcher", "description": "Your source for trending news", "image": "", "source": "TrendWatcher"}]
+        return articles_data
 
-    # Ensure we have at least one article
-    if not articles_data or len(articles_data) == 0:
-        articles_data = [{"title": "Welcome to TrendWatcher", "description": "Your source for trending news", "image": "", "source": "TrendWatcher"}]
+    # Alle datasets laden parallel; te laat (PAGE_DATA_DEADLINE) = fallback
+    articles_data = defer(load_home_articles, fallback=partial(mock_articles, "home"))
 
-    return render_template(
+    return render_page(
         'home.html',
         theme='newspaper',
-        featured=articles_data[0] if articles_data else {},
-        articles=articles_data[1:] if len(articles_data) > 1 else [],
-        gainers=get_demo_gainers(),
-        losers=get_demo_losers(),
+        featured=articles_data.then(lambda a: a[0] if a else {}),
+        articles=articles_data.then(lambda a: a[1:] if len(a) > 1 else []),
+        gainers=defer(get_demo_gainers, fallback=lambda: DEMO_GAINERS),
+        losers=defer(get_demo_losers, fallback=lambda: DEMO_LOSERS),
         GA_ID=GA_TRACKING_ID
     )
 
 @app.route('/crypto')
+@cached_page
 def crypto():
     """Crypto page - Cyberpunk theme"""
-    # Get news articles for main feed
-    articles = get_articles("crypto", limit=10)
+    def load_sidebar(load=load_trending_or_mock):
+        # Get crypto coins for sidebar (gainers/losers)
+        coins = load('crypto')
 
-    # Get crypto coins for sidebar (gainers/losers)
-    coins = get_trending_crypto()
-    if not coins or len(coins) == 0:
-        coins = load_mock('crypto')
+        # Gainers, losers from the precomputed index (built once per data version)
+        index = get_trend_index('crypto', coins)
+        gainers = index.top('gainers') if coins else get_demo_gainers()
+        losers = index.top('losers') if coins else get_demo_losers()
+        return gainers, losers
 
-    # Calculate gainers, losers, trending from coins data for sidebar
-    gainers = sorted(coins, key=lambda x: x.get('change', 0), reverse=True)[:5] if coins else get_demo_gainers()
-    losers = sorted(coins, key=lambda x: x.get('change', 0))[:5] if coins else get_demo_losers()
-    trending = articles[:5] if articles else []
+    # News articles for main feed, sidebar from live data (mockdata if too late)
+    articles = defer(load_articles, "crypto", fallback=partial(mock_articles, "crypto"))
+    sidebar = defer(load_sidebar, fallback=partial(load_sidebar, load_mock))
 
-    return render_template(
+    return render_page(
         'crypto.html',
         category='crypto',
         theme='cyberpunk',
         articles=articles,  # News articles in main feed
-        gainers=gainers,    # Crypto coins in sidebar
-        losers=losers,
-        trending=trending,
+        gainers=sidebar.then(itemgetter(0)),    # Crypto coins in sidebar
+        losers=sidebar.then(itemgetter(1)),
+        trending=articles.then(top_articles),
         GA_ID=GA_TRACKING_ID
     )
 
 @app.route('/stocks')
+@cached_page
 def stocks():
     """Stocks page - Finance theme"""
-    # Get news articles for main feed
-    articles = get_articles("stocks", limit=10)
-
-    # Get stock data for sidebar (gainers/losers)
-    stocks_data = get_trending_stocks()
-    if not stocks_data or len(stocks_data) == 0:
-        stocks_data = load_mock('stocks')
+    def load_sidebar(load=load_trending_or_mock):
+        # Get stock data for sidebar (gainers/losers)
+        stocks_data = load('stocks')
 
-    # Add affiliate links to stocks
-    stocks_data = add_affiliate_to_articles(stocks_data, "stocks")
+        # Gainers, losers from the precomputed index, with eToro affiliate links
+        index = get_trend_index('stocks', stocks_data)
+        gainers = add_affiliate_to_articles(index.top('gainers'), "stocks") if stocks_data else get_demo_gainers()
+        losers = add_affiliate_to_articles(index.top('losers'), "stocks") if stocks_data else get_demo_losers()
+        return gainers, losers
 
-    # Calculate gainers, losers from stocks data for sidebar
-    gainers = sorted(stocks_data, key=lambda x: float(x.get('change', 0)), reverse=True)[:5] if stocks_data else get_demo_gainers()
-    losers = sorted(stocks_data, key=lambda x: float(x.get('change', 0)))[:5] if stocks_data else get_demo_losers()
-    trending = articles[:5] if articles else []
+    # News articles for main feed, sidebar from live data (mockdata if too late)
+    articles = defer(load_articles, "stocks", fallback=partial(mock_articles, "stocks"))
+    sidebar = defer(load_sidebar, fallback=partial(load_sidebar, load_mock))
 
-    return render_template(
+    return render_page(
         'stocks.html',
         category='stocks',
         theme='finance',
         articles=articles,  # News articles in main feed
-        gainers=gainers,    # Stock data in sidebar (with eToro affiliate links)
-        losers=losers,
-        trending=trending,
+        gainers=sidebar.then(itemgetter(0)),    # Stock data in sidebar (with eToro affiliate links)
+        losers=sidebar.then(itemgetter(1)),
+        trending=articles.then(top_articles),
         GA_ID=GA_TRACKING_ID
     )
 
 @app.route('/ecommerce')
+@cached_page
 def ecommerce():
     """E-commerce page - Shop theme"""
-    # Get news articles for main feed
-    articles = get_articles("ecommerce", limit=10)
+    def load_shop_articles(load=load_articles):
+        # News articles with affiliate links
+        return add_affiliate_to_articles(load("ecommerce"), "ecommerce")
 
-    # Add affiliate links to articles
-    articles = add_affiliate_to_articles(articles, "ecommerce")
+    def load_gainers(load=load_trending_or_mock):
+        # Get product data for sidebar
+        products = load('ecommerce')
 
-    # Get product data for sidebar
-    products = get_trending_ecommerce()
-    if not products or len(products) == 0:
-        products = load_mock('ecommerce')
+        # Gainers (by growth %) from the precomputed index, with affiliate links
+        index = get_trend_index('ecommerce', products)
+        return add_affiliate_to_articles(index.top('gainers'), "ecommerce") if products else get_demo_gainers()
 
-    # Add affiliate links to products
-    products = add_affiliate_to_articles(products, "ecommerce")
+    articles = defer(load_shop_articles, fallback=partial(load_shop_articles, mock_articles))
 
-    # Calculate gainers (by growth %)
-    gainers = sorted(products, key=lambda x: int(x.get('growth', '0%').replace('%', '').replace('+', '')), reverse=True)[:5] if products else get_demo_gainers()
-    losers = get_demo_losers()  # E-commerce doesn't have losers typically
-    trending = articles[:5] if articles else []
-
-    return render_template(
+    return render_page(
         'ecommerce.html',
         category='ecommerce',
         theme='shop',
         articles=articles,  # News articles in main feed (with affiliate links)
-        gainers=gainers,    # Product data in sidebar (with affiliate links)
-        losers=losers,
-        trending=trending,
+        gainers=defer(load_gainers, fallback=partial(load_gainers, load_mock)),    # Product data in sidebar (with affiliate links)
+        losers=defer(get_demo_losers, fallback=lambda: DEMO_LOSERS),  # E-commerce doesn't have losers typically
+        trending=articles.then(top_articles),
         GA_ID=GA_TRACKING_ID
     )
 
 @app.route('/entertainment')
+@cached_page
 def entertainment():
     """Entertainment page - Magazine theme"""
-    # Get news articles for main feed
-    articles = get_articles("entertainment", limit=10)
-
-    # Get entertainment items for sidebar
-    items = get_trending_entertainment()
-    if not items or len(items) == 0:
-        items = load_mock('entertainment')
+    def load_popular(load=load_trending_or_mock):
+        # Get entertainment items for sidebar, from the precomputed index
+        items = load('entertainment')
+        return get_trend_index('entertainment', items).top('popular')
 
-    # Prep data for sidebar
-    trending_items = sorted(items, key=lambda x: x.get('popularity', 0), reverse=True)[:5] if items else []
-    top_rated_items = sorted(items, key=lambda x: x.get('rating', 0), reverse=True)[:5] if items else []
-    gainers = trending_items  # Use popularity as "gainers"
-    losers = get_demo_losers()
+    # News articles for main feed
+    articles = defer(load_articles, "entertainment", fallback=partial(mock_articles, "entertainment"))
+    trending_items = defer(load_popular, fallback=partial(load_popular, load_mock))
 
-    return render_template(
+    return render_page(
         'entertainment.html',
         category='entertainment',
         theme='magazine',
         articles=articles,  # News articles in main feed
-        gainers=gainers,    # Entertainment items in sidebar
-        losers=losers,
+        gainers=trending_items,    # Entertainment items in sidebar (popularity as "gainers")
+        losers=defer(get_demo_losers, fallback=lambda: DEMO_LOSERS),
         trending=trending_items,
         GA_ID=GA_TRACKING_ID
     )
 
 @app.route('/sports')
+@cached_page
 def sports():
     """Sports page - Sports theme"""
-    # Get news articles for main feed
-    articles = get_articles("sports", limit=10)
+    def load_popular(load=load_trending_or_mock):
+        # Get sports matches for sidebar; trending and gainers (by popularity) from the precomputed index
+        matches = load('sports')
+        return get_trend_index('sports', matches).top('popular')
 
-    # Get sports matches for sidebar
-    matches = get_trending_sports()
-    if not matches or len(matches) == 0:
-        matches = load_mock('sports')
+    # News articles for main feed
+    articles = defer(load_articles, "sports", fallback=partial(mock_articles, "sports"))
+    trending_matches = defer(load_popular, fallback=partial(load_popular, load_mock))
 
-    # Calculate trending and gainers (by popularity)
-    trending_matches = sorted(matches, key=lambda x: x.get('popularity', 0), reverse=True)[:5] if matches else []
-    gainers = trending_matches  # Use popularity as "gainers"
-    losers = get_demo_losers()
-
-    return render_template(
+    return render_page(
         'sports.html',
         category='sports',
         theme='sports',
         articles=articles,  # News articles in main feed
-        gainers=gainers,    # Sports matches in sidebar
-        losers=losers,
+        gainers=trending_matches,    # Sports matches in sidebar (popularity as "gainers")
+        losers=defer(get_demo_losers, fallback=lambda: DEMO_LOSERS),
         trending=trending_matches,
         GA_ID=GA_TRACKING_ID
     )
 
 # ========== API ROUTES (behouden voor backwards compatibility) ==========
 
+def trending_response(category, data):
+    """
+    JSON response voor een /api/<category>/trending endpoint.
+
+    Met ?view=<naam> (bv. gainers, losers, popular) komt de voorberekende
+    ranglijst terug in plaats van de volledige dataset; ?limit=N (max
+    TREND_INDEX_K) bepaalt de lengte.
+    """
+    view = request.args.get('view')
+    if not view:
+        return jsonify({'success': True, 'data': data})
+    index = get_trend_index(category, data)
+    if view not in index.views:
+        return jsonify({'error': f'Onbekende view: {view}', 'views': sorted(index.views)}), 400
+    limit = min(max(request.args.get('limit', 5, type=int), 1), TREND_INDEX_K)
+    return jsonify({'success': True, 'view': view, 'data': index.top(view, limit)})
+
 @app.route('/crypto/trending')
 @app.route('/api/crypto/trending')
 def crypto_api():
     """API endpoint voor crypto data"""
     try:
-        data = get_trending_crypto()
+        data = load_trending('crypto')
         if data is None:
             return jsonify({'error': 'Kon geen data ophalen'}), 500
-        return jsonify({'success': True, 'data': data})
+        return trending_response('crypto', data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -290,10 +386,10 @@ def crypto_api():
 def stocks_api():
     """API endpoint voor stocks data"""
     try:
-        data = get_trending_stocks()
+        data = load_trending('stocks')
         if data is None:
             return jsonify({'error': 'Kon geen data ophalen'}), 500
-        return jsonify({'success': True, 'data': data})
+        return trending_response('stocks', data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -301,10 +397,10 @@ def stocks_api():
 def ecommerce_api():
     """API endpoint voor e-commerce data"""
     try:
-        data = get_trending_ecommerce()
+        data = load_trending('ecommerce')
         if data is None:
             return jsonify({'error': 'Kon geen data ophalen'}), 500
-        return jsonify({'success': True, 'data': data})
+        return trending_response('ecommerce', data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -312,10 +408,10 @@ def ecommerce_api():
 def entertainment_api():
     """API endpoint voor entertainment data"""
     try:
-        data = get_trending_entertainment()
+        data = load_trending('entertainment')
         if data is None:
             return jsonify({'error': 'Kon geen data ophalen'}), 500
-        return jsonify({'success': True, 'data': data})
+        return trending_response('entertainment', data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -323,10 +419,10 @@ def entertainment_api():
 def sports_api():
     """API endpoint voor sports data"""
     try:
-        data = get_trending_sports()
+        data = load_trending('sports')
         if data is None:
             return jsonify({'error': 'Kon geen data ophalen'}), 500
-        return jsonify({'success': True, 'data': data})
+        return trending_response('sports', data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -353,6 +449,13 @@ def api_vote():
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
 
+# ========== MONITORING ==========
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics (cache hit/miss, upstream latency) van alle workers"""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 # ========== ERROR HANDLERS ==========
 
 @app.errorhandler(404)
@@ -421,16 +524,19 @@ def track_click():
 # ========== LEGAL PAGES ==========
 
 @app.route("/privacy")
+@cached_page
 def privacy():
     """Privacy policy page"""
     return render_template("legal/privacy.html", GA_ID=GA_TRACKING_ID)
 
 @app.route("/terms")
+@cached_page
 def terms():
     """Terms of use page"""
     return render_template("legal/terms.html", GA_ID=GA_TRACKING_ID)
 
 @app.route("/cookies")
+@cached_page
 def cookies_policy():
     """Cookie policy page"""
     return render_template("legal/cookies.html", GA_ID=GA_TRACKING_ID)
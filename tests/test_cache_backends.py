@@ -0,0 +1,151 @@
+"""
+Tests for the shared cache backends (utils/cache_backends.py).
+
+The Redis path runs against fakeredis, an in-process stand-in for a Redis
+server; two RedisCache instances on one fake server play two workers.
+
+Gebruik:
+    pip install pytest fakeredis
+    python -m pytest -q tests
+"""
+
+import time
+
+import pytest
+
+from utils import cache
+from utils.cache_backends import RedisCache, SQLiteCache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def _worker(server):
+    return RedisCache(client=fakeredis.FakeRedis(server=server), prefix="test:")
+
+
+def test_redis_set_get_roundtrip(server):
+    backend = _worker(server)
+    entry = backend.set("crypto_trending", {"coins": [1, 2]}, ttl=60, stale_ttl=30)
+
+    loaded = backend.get("crypto_trending")
+    assert loaded.data == {"coins": [1, 2]}
+    assert loaded.version == entry.version
+    assert loaded.is_fresh()
+    assert backend.get("missing") is None
+
+
+def test_redis_other_worker_sees_new_version(server):
+    writer, reader = _worker(server), _worker(server)
+    writer.set("news_home", ["a"], ttl=60)
+    assert reader.get("news_home").data == ["a"]
+
+    writer.set("news_home", ["b"], ttl=60)
+    assert reader.get("news_home").data == ["b"]
+
+
+def test_redis_touch_keeps_version(server):
+    backend = _worker(server)
+    entry = backend.set("news_home", ["a"], ttl=1)
+    touched = _worker(server).touch("news_home", ttl=60)
+
+    assert touched.version == entry.version
+    assert touched.expires > entry.expires
+    assert backend.touch("missing", ttl=60) is None
+
+
+def test_redis_touch_does_not_recreate_a_vanished_entry(server):
+    backend = _worker(server)
+    other = fakeredis.FakeRedis(server=server)
+    backend.set("news_home", ["a"], ttl=60)
+    name = backend._key("news_home")
+
+    # The entry expires between touch's check and its write
+    client = backend._client
+    real_pipeline = client.pipeline
+
+    def racing_pipeline(*args, **kwargs):
+        pipe = real_pipeline(*args, **kwargs)
+        real_hget = pipe.hget
+
+        def hget(*hget_args):
+            value = real_hget(*hget_args)
+            other.delete(name)
+            return value
+        pipe.hget = hget
+        return pipe
+
+    client.pipeline = racing_pipeline
+    assert backend.touch("news_home", ttl=60) is None
+    assert not other.exists(name)
+
+
+def test_redis_expired_entry_is_gone(server):
+    backend = _worker(server)
+    backend.set("stocks_trending", [1], ttl=0, stale_ttl=0)
+    time.sleep(0.01)
+    assert backend.get("stocks_trending") is None
+
+
+def test_redis_delete_items_and_size(server):
+    backend = _worker(server)
+    backend.set("a", [1], ttl=60)
+    backend.set("b", {"x": "y"}, ttl=60)
+
+    assert len(backend) == 2
+    assert dict(backend.items())["b"].data == {"x": "y"}
+    assert backend.total_bytes == sum(e.size for _, e in backend.items(include_data=False))
+
+    assert backend.delete("a")
+    assert not backend.delete("a")
+    backend.clear()
+    assert len(backend) == 0
+
+
+def test_redis_lease_is_exclusive_per_worker(server):
+    first, second = _worker(server), _worker(server)
+    assert first.acquire_lease("news_home", ttl=5)
+    assert not second.acquire_lease("news_home", ttl=5)
+
+    # Only the owner can release it
+    second.release_lease("news_home")
+    assert not second.acquire_lease("news_home", ttl=5)
+    first.release_lease("news_home")
+    assert second.acquire_lease("news_home", ttl=5)
+
+
+def test_get_or_load_through_redis(server, monkeypatch):
+    monkeypatch.setattr(cache, "_CACHE", _worker(server))
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"items": [1, 2, 3]}
+
+    assert cache.get_or_load("redis_test_key", loader, ttl=60) == {"items": [1, 2, 3]}
+    assert cache.get_or_load("redis_test_key", loader, ttl=60) == {"items": [1, 2, 3]}
+    assert len(calls) == 1
+
+    # A second worker reads the stored value without loading
+    monkeypatch.setattr(cache, "_CACHE", _worker(server))
+    assert cache.get_or_load("redis_test_key", loader, ttl=60) == {"items": [1, 2, 3]}
+    assert len(calls) == 1
+
+
+def test_sqlite_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.cache_backends.SQLITE_ACCESS_RESOLUTION", 0)
+    backend = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=2, sweep_interval=0)
+    backend.set("a", 1, ttl=60)
+    time.sleep(0.01)
+    backend.set("b", 2, ttl=60)
+    time.sleep(0.01)
+    backend.get("a")
+    backend.set("c", 3, ttl=60)
+
+    assert sorted(key for key, _ in backend.items(include_data=False)) == ["a", "c"]
+    assert len(backend) == 2
+    assert backend.evictions == 1
@@ -0,0 +1,133 @@
+"""
+Tests for the provider circuit breakers (utils/circuit.py): the
+closed -> open -> half_open cycle, the growing backoff, and giving back a
+probe that a quota refusal kept from running.
+"""
+
+import pytest
+
+from utils import cache, circuit, ratelimit
+from utils.cache_backends import TTLCache
+from utils.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from utils.ratelimit import Quota
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(circuit.time, "time", clock)
+    return clock
+
+
+def _breaker():
+    return CircuitBreaker("test", failure_threshold=3, base_backoff=30, max_backoff=100)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = _breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    # A success resets the count
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["retry_in"] == 30
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_with_doubled_backoff(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+
+    backoffs = []
+    for _ in range(3):
+        clock.now = breaker.retry_at
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        backoffs.append(breaker.retry_at - clock.now)
+
+    # 30 -> 60 -> 120, capped at max_backoff
+    assert backoffs == [60, 100, 100]
+
+    # Closing resets the backoff
+    clock.now = breaker.retry_at
+    assert breaker.allow()
+    breaker.record_success()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.retry_at - clock.now == 30
+
+
+def test_release_gives_the_probe_back(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = breaker.retry_at
+
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_quota_refusal_releases_the_probe(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, "_STORE", ratelimit._QuotaStore(""))
+    monkeypatch.setattr(cache, "_CACHE", TTLCache())
+    breaker = _breaker()
+    monkeypatch.setattr(cache, "breaker_for", lambda provider: breaker)
+    quota = Quota("test_probe", per_day=1)
+    monkeypatch.setattr(cache, "quota_for", lambda provider: quota)
+    ratelimit._STORE._memory["test_probe"] = {"day": ratelimit._today(), "used": 1}
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = breaker.retry_at
+
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"items": [1]}
+
+    # The probe is claimed, then refused by the quota: nothing was called upstream
+    assert cache.get_or_load("probe", loader, ttl=60, provider="test_probe") is None
+    assert not calls
+    assert breaker.state == HALF_OPEN
+
+    # The next request may still probe, and its success closes the breaker
+    quota.per_day = 2
+    assert cache.get_or_load("probe", loader, ttl=60, provider="test_probe") == {"items": [1]}
+    assert breaker.state == CLOSED
@@ -0,0 +1,19 @@
+"""
+Tests for the Prometheus exposition of the metrics (utils/metrics.py).
+"""
+
+from utils import metrics
+
+
+def test_label_values_are_escaped():
+    labels = (("route", 'C:\\news "home"\nx'), ("prefix", "plain"))
+    assert metrics._format_labels(labels) == '{route="C:\\\\news \\"home\\"\\nx",prefix="plain"}'
+
+
+def test_rendered_output_escapes_label_values(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    metrics.inc("trendwatcher_page_cache_total", (("route", 'a"b\nc'), ("result", "hit")))
+
+    lines = metrics.render_prometheus().splitlines()
+
+    assert 'trendwatcher_page_cache_total{route="a\\"b\\nc",result="hit"} 1' in lines
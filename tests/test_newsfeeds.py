@@ -0,0 +1,163 @@
+"""
+Tests for the incremental news ingest (apis/newsfeeds.py): merging fetched
+articles into a rolling window, and paging until a known article shows up.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from apis import newsfeeds
+from utils import http, ratelimit
+from utils.dedup import NearDuplicateIndex
+from utils.ratelimit import Quota
+
+
+def _article(n, published, title=None, url=None):
+    return {
+        "title": title or f"Story number {n} about topic {n * 7919}",
+        "description": f"Unrelated body text {n} for item {n * 104729}",
+        "source": "test",
+        "url": url or f"https://example.com/news/{n}",
+        "image": "",
+        "published": published,
+    }
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    # The near-duplicate index is shared module state; every test gets its own
+    monkeypatch.setattr(newsfeeds, "NEAR_DUPLICATES", NearDuplicateIndex())
+
+
+def test_merge_orders_by_pubdate_newest_first():
+    window = [_article(1, "2026-01-01 10:00:00")]
+    articles = [_article(2, "2026-01-01 09:00:00"), _article(3, "2026-01-01 11:00:00"),
+                _article(4, "")]
+
+    merged, added = newsfeeds.merge_articles(window, articles)
+
+    assert [a["url"][-1] for a in merged] == ["3", "1", "2", "4"]
+    assert added == 3
+
+
+def test_merge_skips_known_urls():
+    window = [_article(1, "2026-01-01 10:00:00")]
+    # Same URL with a trailing slash counts as the same article
+    again = _article(1, "2026-01-01 12:00:00", url="https://example.com/news/1/")
+
+    merged, added = newsfeeds.merge_articles(window, [again])
+
+    assert added == 0
+    assert merged == window
+
+    merged, added = newsfeeds.merge_articles(window, [again, _article(2, "2026-01-01 11:00:00")])
+    assert added == 1
+    assert len(merged) == 2
+
+
+def test_merge_groups_near_duplicates_as_alternates():
+    title = "Bitcoin climbs above record high as institutional investors pile into new funds"
+    original = _article(1, "2026-01-01 08:00:00", title=title)
+    copy = _article(2, "2026-01-01 09:30:00", title=title + " today")
+    copy["description"] = original["description"]
+
+    merged, added = newsfeeds.merge_articles([], [copy, original])
+
+    assert len(merged) == 1
+    # The earliest copy is canonical, the later one its alternate
+    assert merged[0]["url"] == original["url"]
+    assert [a["url"] for a in merged[0]["alternates"]] == [copy["url"]]
+    assert added == 2
+
+    # An alternate is known too: fetching it again adds nothing
+    merged, added = newsfeeds.merge_articles(merged, [copy])
+    assert added == 0
+
+
+def test_merge_caps_the_window():
+    window = [_article(n, f"2026-01-01 10:{n:02d}:00") for n in range(5)]
+    articles = [_article(n, f"2026-01-01 11:{n:02d}:00") for n in range(5, 8)]
+
+    merged, added = newsfeeds.merge_articles(window, articles, max_size=4)
+
+    assert len(merged) == 4
+    assert [a["url"].rsplit("/", 1)[1] for a in merged] == ["7", "6", "5", "4"]
+    assert added == 3
+
+
+class _Pages:
+    """Provider stand-in answering get_json from a list of pages"""
+
+    name = "test_news"
+    url = "https://newsdata.test/api/1/news"
+    timeout = 5
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def params(self, page=None):
+        return {"page": page}
+
+    async def get_json(self, url, params=None, timeout=None, conditional=True):
+        index = int(params["page"] or 0)
+        self.requested.append(index)
+        return self.pages[index]
+
+
+def _page(index, links, last=False):
+    return {"status": "success",
+            "results": [{"link": link} for link in links],
+            "nextPage": None if last else str(index + 1)}
+
+
+def _links(start, count):
+    return [f"https://example.com/news/{n}" for n in range(start, start + count)]
+
+
+def test_paging_stops_at_first_page_with_a_known_article():
+    pages = [_page(0, _links(30, 5)), _page(1, _links(25, 5)), _page(2, _links(20, 5))]
+    provider = _Pages(pages)
+    known = {newsfeeds._article_id({"url": "https://example.com/news/27"})}
+
+    responses = asyncio.run(newsfeeds._fetch_pages(provider, 3, known))
+
+    assert provider.requested == [0, 1]
+    assert len(responses) == 2
+
+
+def test_paging_stops_at_max_pages_and_last_page():
+    pages = [_page(0, _links(30, 5)), _page(1, _links(25, 5)), _page(2, _links(20, 5), last=True)]
+
+    provider = _Pages(pages)
+    assert len(asyncio.run(newsfeeds._fetch_pages(provider, 2, set()))) == 2
+    assert provider.requested == [0, 1]
+
+    provider = _Pages(pages)
+    assert len(asyncio.run(newsfeeds._fetch_pages(provider, 10, set()))) == 3
+
+
+def test_paging_returns_not_modified_from_first_page():
+    provider = _Pages([http.NOT_MODIFIED])
+    assert asyncio.run(newsfeeds._fetch_pages(provider, 3, set())) is http.NOT_MODIFIED
+
+
+def test_later_pages_take_a_quota_credit_each(monkeypatch):
+    store = ratelimit._QuotaStore("")
+    monkeypatch.setattr(ratelimit, "_STORE", store)
+    # The first page was paid by the cache load; normal priority may use 90 of
+    # the 100 credits, so there is one left for one more page
+    store._memory["test_news"] = {"day": ratelimit._today(), "used": 89,
+                                  "pace": 10, "pace_at": time.time()}
+    quota = Quota("test_news", per_minute=None, per_day=100)
+    monkeypatch.setattr(newsfeeds, "quota_for", lambda name: quota)
+    pages = [_page(0, _links(30, 5)), _page(1, _links(25, 5)), _page(2, _links(20, 5))]
+    provider = _Pages(pages)
+
+    responses = asyncio.run(newsfeeds._fetch_pages(provider, 3, set()))
+
+    assert provider.requested == [0, 1]
+    assert len(responses) == 2
+    assert store.read("test_news")["used"] == 90
@@ -0,0 +1,102 @@
+"""
+Tests for the provider quotas (utils/ratelimit.py): the per-priority share of
+the daily budget, the pacing bucket, the per-minute bucket, and how a load
+refused by the quota goes through get_or_load.
+"""
+
+import time
+
+import pytest
+
+from utils import cache, ratelimit
+from utils.cache_backends import TTLCache
+from utils.circuit import CLOSED, breaker_for
+from utils.ratelimit import HIGH, LOW, NORMAL, Quota
+
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    # Day counters in memory, and no quota left over from another test
+    store = ratelimit._QuotaStore("")
+    monkeypatch.setattr(ratelimit, "_STORE", store)
+    monkeypatch.setattr(ratelimit, "_QUOTAS", {})
+    return store
+
+
+def _seed(store, name, used, pace):
+    store._memory[name] = {"day": ratelimit._today(), "used": used,
+                           "pace": pace, "pace_at": time.time()}
+
+
+def test_priorities_get_their_share_of_the_day():
+    quota = Quota("test_day", per_day=100)
+    store = ratelimit._STORE
+
+    _seed(store, "test_day", used=75, pace=50)
+    assert not quota.acquire(LOW)
+    assert quota.acquire(NORMAL)
+
+    _seed(store, "test_day", used=90, pace=50)
+    assert not quota.acquire(NORMAL)
+    assert quota.acquire(HIGH)
+
+    _seed(store, "test_day", used=100, pace=50)
+    assert not quota.acquire(HIGH)
+
+
+def test_pacing_bucket_spreads_normal_loads():
+    # A day of 100 units: bursts of 10, refilling at one unit per 864 seconds
+    quota = Quota("test_pace", per_day=100)
+    assert quota.burst == 10
+
+    assert all(quota.acquire(NORMAL) for _ in range(10))
+    assert not quota.acquire(NORMAL)
+    assert quota.delay(NORMAL) == pytest.approx(864, rel=0.01)
+
+    # A waiting request still loads, and runs the pace into debt
+    assert quota.acquire(HIGH)
+    assert ratelimit._STORE.read("test_pace")["pace"] == pytest.approx(-1, abs=0.01)
+
+    # Two units of refill: the debt is paid off first, then one normal load fits
+    state = ratelimit._STORE._memory["test_pace"]
+    state["pace_at"] -= 2 * 864
+    assert quota.acquire(NORMAL)
+    assert not quota.acquire(NORMAL)
+
+
+def test_minute_bucket_holds_a_longer_window():
+    # NewsData.io: 30 credits per 15 minutes lets a cold start load every category
+    newsdata = ratelimit.quota_for("newsdata")
+    assert newsdata.minute_burst == 30
+    assert all(newsdata.acquire(HIGH, wait=0) for _ in range(6))
+
+    quota = Quota("test_minute", per_minute=2)
+    assert quota.acquire(HIGH, wait=0)
+    assert quota.acquire(HIGH, wait=0)
+    assert not quota.acquire(HIGH, wait=0)
+
+
+def test_refused_load_is_retried_on_the_next_request(monkeypatch):
+    monkeypatch.setattr(cache, "_CACHE", TTLCache())
+    quota = Quota("test_refused", per_day=1)
+    monkeypatch.setattr(cache, "quota_for", lambda provider: quota)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"items": [1]}
+
+    assert cache.get_or_load("first", loader, ttl=60, provider="test_refused") == {"items": [1]}
+    # The day is used up: the load is refused without calling the loader
+    assert cache.get_or_load("second", loader, ttl=60, provider="test_refused") is None
+    assert len(calls) == 1
+
+    # Not an upstream failure: nothing negatively cached, the breaker stays closed
+    assert not cache._recently_failed("second")
+    assert cache.get_cache_version("second") is None
+    assert breaker_for("test_refused").state == CLOSED
+
+    # Budget back: the next request loads right away
+    quota.per_day = 2
+    assert cache.get_or_load("second", loader, ttl=60, provider="test_refused") == {"items": [1]}
+    assert len(calls) == 2
@@ -0,0 +1,74 @@
+"""
+Compression Benchmark
+=====================
+Compares gzip levels and brotli qualities on the bodies the app actually
+sends: rendered pages, API JSON (built from the mockdata) and the static CSS/JS.
+Prints compressed size and CPU time per compression, to pick the request-time
+levels (COMPRESS_GZIP_LEVEL / COMPRESS_BROTLI_QUALITY) and confirm the
+build-time ones.
+
+Gebruik:
+    python tools/bench_compression.py [herhalingen]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("CACHE_SNAPSHOT_INTERVAL", "0")
+os.environ.setdefault("COMPRESS_ENABLED", "false")
+os.environ.setdefault("METRICS_FLUSH_INTERVAL", "0")
+
+from utils.compression import BROTLI_AVAILABLE, compress
+
+SETTINGS = [("gzip", 1), ("gzip", 6), ("gzip", 9)]
+if BROTLI_AVAILABLE:
+    SETTINGS += [("br", 1), ("br", 5), ("br", 11)]
+
+
+def collect_bodies():
+    """Return [(label, bytes)] of representative response bodies"""
+    from app import app
+
+    bodies = []
+    client = app.test_client()
+    for route in ("/", "/crypto", "/sports"):
+        bodies.append((f"page {route}", client.get(route).get_data()))
+
+    with open("static/mockdata/crypto.json", encoding="utf-8") as f:
+        payload = {"success": True, "data": json.load(f)}
+    bodies.append(("api crypto json", json.dumps(payload).encode("utf-8")))
+
+    for path in ("static/styles.css", "static/js/cookie-consent.js"):
+        with open(path, "rb") as f:
+            bodies.append((os.path.basename(path), f.read()))
+    return bodies
+
+
+def main():
+    """Compress every body with every setting and print a table"""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    bodies = collect_bodies()
+
+    header = f"{'body':<22}{'size':>9}" + "".join(f"{enc + ' ' + str(lvl):>18}" for enc, lvl in SETTINGS)
+    print(header)
+    print(f"{'':<22}{'KiB':>9}" + "".join(f"{'KiB / ms':>18}" for _ in SETTINGS))
+    for label, body in bodies:
+        row = f"{label:<22}{len(body) / 1024:>9.1f}"
+        for encoding, level in SETTINGS:
+            start = time.perf_counter()
+            for _ in range(runs):
+                data = compress(body, encoding, level)
+            ms = (time.perf_counter() - start) * 1000 / runs
+            row += f"{len(data) / 1024:>10.1f} / {ms:>5.2f}"
+        print(row)
+
+    if not BROTLI_AVAILABLE:
+        print("\nℹ️  brotli niet geïnstalleerd: alleen gzip gemeten")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Cache Snapshot Benchmark
+========================
+Measures snapshot size, save time and startup load time for a cache filled
+with realistic payloads (the mockdata files, repeated under many keys).
+
+Gebruik:
+    python tools/bench_snapshot.py [aantal_keys]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import cache
+
+
+def main():
+    """Fill the cache, save and reload a snapshot, print timings"""
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    base = "static/mockdata"
+    payloads = []
+    for file in sorted(os.listdir(base)):
+        if file.endswith(".json"):
+            with open(os.path.join(base, file), encoding="utf-8") as f:
+                payloads.append(json.load(f))
+
+    for i in range(keys):
+        cache.set_cache(f"bench_{i}", payloads[i % len(payloads)], ttl=900)
+    raw_bytes = cache._CACHE.total_bytes
+
+    path = os.path.join(tempfile.mkdtemp(), "snapshot.json.gz")
+    start = time.perf_counter()
+    written = cache.save_snapshot(path)
+    save_ms = (time.perf_counter() - start) * 1000
+    size = os.path.getsize(path)
+
+    cache.clear_cache()
+    start = time.perf_counter()
+    restored = cache.load_snapshot(path)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    print(f"📦 Entries:        {written} written, {restored} restored")
+    print(f"📏 Snapshot size:  {size / 1024:.1f} KiB ({raw_bytes / 1024:.1f} KiB JSON, "
+          f"{raw_bytes / max(1, size):.1f}x compressed)")
+    print(f"💾 Save time:      {save_ms:.1f} ms")
+    print(f"🚀 Load time:      {load_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
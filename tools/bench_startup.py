@@ -0,0 +1,89 @@
+"""
+Cold Start Benchmark
+====================
+Measures time-to-first-byte per route from a cold process: every route is
+requested as the very first request of a fresh Python process, once for each
+template setup:
+
+- lazy:        no bytecode cache, templates compiled on first use (old behaviour)
+- cold cache:  precompile at startup into an empty bytecode cache (first deploy)
+- warm cache:  precompile at startup from a filled bytecode cache (recycled worker)
+
+Import time (including precompilation) is reported separately from TTFB.
+The page cache is disabled, so the first request always renders.
+
+Gebruik:
+    python tools/bench_startup.py [route ...]
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = ["/", "/crypto", "/stocks", "/ecommerce", "/entertainment", "/sports", "/privacy"]
+
+# Runs in the child process: import the app, then time one request
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+response = app.test_client().get(sys.argv[1])
+done = time.perf_counter()
+print(json.dumps({"status": response.status_code,
+                  "import_ms": (imported - start) * 1000,
+                  "ttfb_ms": (done - imported) * 1000}))
+"""
+
+
+def run_cold(route, env):
+    """Start a fresh interpreter and return its timings for route"""
+    result = subprocess.run([sys.executable, "-c", _CHILD, route], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(result.stderr.strip() or "no output")
+
+
+def main():
+    """Run every route in every setup and print a table"""
+    routes = sys.argv[1:] or ROUTES
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    base_env = dict(os.environ, PAGE_CACHE_ENABLED="false", SCHEDULER_MODE="off",
+                    CACHE_SNAPSHOT_PATH=os.path.join(workdir, "snapshot.json.gz"),
+                    CACHE_SNAPSHOT_INTERVAL="0", METRICS_DIR=os.path.join(workdir, "metrics"))
+    cache_dir = os.path.join(workdir, "jinja_cache")
+
+    setups = [
+        ("lazy", dict(base_env, JINJA_CACHE_DIR="", TEMPLATE_PRECOMPILE="false"), False),
+        ("cold cache", dict(base_env, JINJA_CACHE_DIR=cache_dir, TEMPLATE_PRECOMPILE="true"), True),
+        ("warm cache", dict(base_env, JINJA_CACHE_DIR=cache_dir, TEMPLATE_PRECOMPILE="true"), False),
+    ]
+
+    print(f"{'route':<16}" + "".join(f"{name:>24}" for name, _, _ in setups))
+    print(f"{'':<16}" + "".join(f"{'import / ttfb (ms)':>24}" for _ in setups))
+    try:
+        for route in routes:
+            row = f"{route:<16}"
+            for name, env, clear in setups:
+                if clear:
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                try:
+                    t = run_cold(route, env)
+                    row += f"{t['import_ms']:>15.0f} / {t['ttfb_ms']:>6.1f}"
+                except Exception as e:
+                    print(f"❌ {route} ({name}): {e}")
+                    row += f"{'error':>24}"
+            print(row)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
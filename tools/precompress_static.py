@@ -0,0 +1,71 @@
+"""
+Static Asset Precompression
+===========================
+Writes .gz (and .br, when brotli is installed) siblings next to the text
+files in static/, at maximum compression. The app serves them by content
+negotiation (see utils/compression.py); a sibling older than its source file
+is ignored, so run this again after changing an asset (e.g. in the deploy).
+
+Gebruik:
+    python tools/precompress_static.py [static_map]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.compression import BROTLI_AVAILABLE, compress
+
+EXTENSIONS = (".css", ".js", ".svg", ".json", ".html", ".txt", ".xml")
+MIN_SIZE = 256
+
+# Build time: no request waiting, so use the highest levels
+LEVELS = {"gzip": 9, "br": 11}
+
+
+def precompress(base):
+    """Write missing or outdated siblings for every compressible file under base"""
+    encodings = [("gzip", ".gz")] + ([("br", ".br")] if BROTLI_AVAILABLE else [])
+    written = skipped = 0
+    total_in = total_out = 0
+
+    for root, _, files in os.walk(base):
+        for name in sorted(files):
+            if not name.endswith(EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            mtime = os.path.getmtime(path)
+            if os.path.getsize(path) < MIN_SIZE:
+                continue
+
+            with open(path, "rb") as f:
+                body = f.read()
+            for encoding, suffix in encodings:
+                target = path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                    skipped += 1
+                    continue
+                data = compress(body, encoding, LEVELS[encoding])
+                # Only worth serving when it is actually smaller
+                if len(data) >= len(body):
+                    continue
+                with open(target, "wb") as f:
+                    f.write(data)
+                written += 1
+                total_in += len(body)
+                total_out += len(data)
+                print(f"   ✅ {os.path.relpath(target, base)}: "
+                      f"{len(body) / 1024:.1f} KiB → {len(data) / 1024:.1f} KiB")
+
+    if not BROTLI_AVAILABLE:
+        print("ℹ️  brotli niet geïnstalleerd, alleen .gz geschreven")
+    if written:
+        print(f"\n📦 {written} bestanden geschreven ({total_in / 1024:.1f} KiB → "
+              f"{total_out / 1024:.1f} KiB), {skipped} waren al actueel")
+    else:
+        print(f"✨ Alles actueel ({skipped} bestanden)")
+
+
+if __name__ == "__main__":
+    precompress(sys.argv[1] if len(sys.argv) > 1 else "static")
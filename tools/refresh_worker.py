@@ -0,0 +1,48 @@
+"""
+Standalone Refresh Worker
+=========================
+Keeps all registered datasets warm in the shared cache, so the web workers
+(started with SCHEDULER_MODE=external) only ever read from cache.
+
+Gebruik:
+    CACHE_BACKEND=sqlite python tools/refresh_worker.py
+"""
+
+import os
+import sys
+import time
+
+# Project root op het pad zetten zodat apis/ en utils/ importeerbaar zijn
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importeren registreert de datasets van elke provider
+import apis.coingecko  # noqa: F401
+import apis.ecommerce  # noqa: F401
+import apis.entertainment  # noqa: F401
+import apis.newsfeeds  # noqa: F401
+import apis.sports  # noqa: F401
+import apis.stocks  # noqa: F401
+from utils.cache import CACHE_BACKEND
+from utils.metrics import enable_flush
+from utils.scheduler import DATASETS, start_scheduler
+
+
+def main():
+    """Run the refresh scheduler in the foreground until interrupted"""
+    if CACHE_BACKEND == "memory":
+        print("⚠️  CACHE_BACKEND=memory: web workers won't see this worker's cache. "
+              "Use CACHE_BACKEND=sqlite or redis.")
+
+    print(f"🔄 Refresh worker gestart ({len(DATASETS)} datasets): {', '.join(sorted(DATASETS))}")
+    enable_flush()
+    scheduler = start_scheduler()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n⏹️  Refresh worker gestopt")
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
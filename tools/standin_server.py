@@ -0,0 +1,434 @@
+"""
+Upstream Stand-in Server
+========================
+Local stand-in for every upstream API the apis/ modules call (CoinGecko,
+Alpha Vantage, YouTube, NewsData.io, TheSportsDB), so the full fetch path
+(HTTP pools, conditional requests, deadlines, circuit breakers, quotas) can
+be load-tested on one machine.
+
+Each provider lives under its own path prefix. Responses are replayed from
+recorded payloads when a payload directory has one for the request, and
+otherwise synthesized from the mockdata in static/mockdata/. With --record
+the requests are forwarded to the real API first and the responses saved
+for later replays (API keys are passed through but left out of file names).
+
+Upstream behaviour is configurable per provider ("[provider=]value", the
+option can be repeated):
+- --latency: fixed:MS, uniform:MIN-MAX, normal:MEAN,SD or lognormal:MEDIAN,SIGMA (ms)
+- --error-rate: share of 500/503 responses
+- --rate-limit-rate: share of 429 responses (with Retry-After)
+- --drip-rate: share of bodies sent slowly, spread over --drip-seconds
+
+Responses carry an ETag and answer If-None-Match with 304 (--no-etag turns
+that off). NewsData.io results are paginated (``page`` / ``nextPage``) from a
+window of --news-total articles; with --news-interval a new article is
+published every so many seconds.
+
+Gebruik:
+    python tools/standin_server.py [--port 8700] [--payloads DIR [--record]] \\
+        [--latency uniform:20-200] [--latency thesportsdb=lognormal:300,0.6] \\
+        [--error-rate 0.02] [--rate-limit-rate newsdata=0.1] [--drip-rate 0.05]
+
+    Daarna de app (of tools/refresh_worker.py) starten met de env vars die de
+    server bij het opstarten print, plus LIVE_DATA_ENABLED=true en API keys.
+"""
+
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MOCKDATA_DIR = os.path.join(ROOT, "static", "mockdata")
+
+# Path prefix -> (real upstream, env var of the app, path of that URL on the upstream)
+PROVIDERS = {
+    "coingecko": ("https://api.coingecko.com", "COINGECKO_TRENDING_URL", "/api/v3/search/trending"),
+    "alphavantage": ("https://www.alphavantage.co", "ALPHA_VANTAGE_BASE_URL", "/query"),
+    "youtube": ("https://www.googleapis.com", "YOUTUBE_API_URL", "/youtube/v3/videos"),
+    "newsdata": ("https://newsdata.io", "NEWSDATA_URL", "/api/1/news"),
+    "thesportsdb": ("https://www.thesportsdb.com", "THESPORTSDB_BASE_URL", "/api/v1/json/3"),
+}
+
+# Query parameters left out of recorded file names
+SECRET_PARAMS = {"apikey", "api_key", "key", "token"}
+
+
+def _load_mock(category):
+    with open(os.path.join(MOCKDATA_DIR, f"{category}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Behaviour:
+    """Latency, error, 429 and slow-drip settings, with per-provider overrides"""
+
+    def __init__(self, args):
+        self.latency = self._per_provider(args.latency, "fixed:0", str)
+        self.error_rate = self._per_provider(args.error_rate, "0", float)
+        self.rate_limit_rate = self._per_provider(args.rate_limit_rate, "0", float)
+        self.drip_rate = self._per_provider(args.drip_rate, "0", float)
+        self.drip_seconds = args.drip_seconds
+        for spec in self.latency.values():
+            self._sample(spec)  # Validate up front
+
+    @staticmethod
+    def _per_provider(values, default, convert):
+        settings = {"*": convert(default)}
+        for value in values or []:
+            provider, _, setting = value.rpartition("=")
+            if provider and provider not in PROVIDERS:
+                raise SystemExit(f"❌ Onbekende provider: {provider}")
+            settings[provider or "*"] = convert(setting)
+        return settings
+
+    @staticmethod
+    def _get(settings, provider):
+        return settings.get(provider, settings["*"])
+
+    @staticmethod
+    def _sample(spec):
+        """Latency in seconds for one request"""
+        kind, _, value = spec.partition(":")
+        if kind == "fixed":
+            ms = float(value or 0)
+        elif kind == "uniform":
+            low, high = (float(v) for v in value.split("-"))
+            ms = random.uniform(low, high)
+        elif kind == "normal":
+            mean, sd = (float(v) for v in value.split(","))
+            ms = random.gauss(mean, sd)
+        elif kind == "lognormal":
+            median, sigma = (float(v) for v in value.split(","))
+            ms = median * random.lognormvariate(0, sigma)
+        else:
+            raise SystemExit(f"❌ Onbekende latency verdeling: {spec}")
+        return max(0.0, ms) / 1000
+
+    def latency_for(self, provider):
+        return self._sample(self._get(self.latency, provider))
+
+    def outcome(self, provider):
+        """'error', 'rate_limited', 'drip' or 'ok' for one request"""
+        roll = random.random()
+        for outcome, settings in (("error", self.error_rate),
+                                  ("rate_limited", self.rate_limit_rate),
+                                  ("drip", self.drip_rate)):
+            rate = self._get(settings, provider)
+            if roll < rate:
+                return outcome
+            roll -= rate
+        return "ok"
+
+
+class Synthesizer:
+    """Upstream-shaped payloads built from the mockdata"""
+
+    def __init__(self, news_total, news_interval):
+        self.started = time.time()
+        self.news_total = news_total
+        self.news_interval = news_interval
+        from apis.newsfeeds import CATEGORY_QUERIES
+        self.category_queries = CATEGORY_QUERIES
+
+    def build(self, provider, path, params):
+        return getattr(self, provider)(path, params)
+
+    def coingecko(self, path, params):
+        coins = [{
+            "item": {
+                "id": coin["name"].lower().replace(" ", "-"),
+                "name": coin["name"],
+                "symbol": coin["symbol"],
+                "market_cap_rank": coin.get("market_cap_rank"),
+                "thumb": coin.get("image", ""),
+            },
+            "score": i,
+        } for i, coin in enumerate(_load_mock("crypto"))]
+        return {"coins": coins, "nfts": [], "categories": []}
+
+    def alphavantage(self, path, params):
+        stocks = _load_mock("stocks")
+        if params.get("function") == "GLOBAL_QUOTE":
+            symbol = params.get("symbol", "")
+            stock = next((s for s in stocks if s["symbol"] == symbol), None)
+            if stock is None:
+                return {"Global Quote": {}}
+            return {"Global Quote": {
+                "01. symbol": stock["symbol"],
+                "05. price": f"{stock['price']:.4f}",
+                "06. volume": stock.get("volume", "0"),
+                "09. change": f"{stock['price'] * stock['change'] / 100:.4f}",
+                "10. change percent": f"{stock['change']:.4f}%",
+            }}
+
+        def ticker(stock, sign):
+            change = abs(stock["change"]) * sign
+            return {
+                "ticker": stock["symbol"],
+                "price": f"{stock['price']:.2f}",
+                "change_amount": f"{stock['price'] * change / 100:.2f}",
+                "change_percentage": f"{change:.2f}%",
+                "volume": stock.get("volume", "0"),
+            }
+        ranked = sorted(stocks, key=lambda s: s["change"], reverse=True)
+        return {
+            "metadata": "Top gainers, losers, and most actively traded US tickers",
+            "last_updated": datetime.fromtimestamp(self.started, timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "top_gainers": [ticker(s, 1) for s in ranked],
+            "top_losers": [ticker(s, -1) for s in reversed(ranked)],
+            "most_actively_traded": [ticker(s, 1 if s["change"] >= 0 else -1) for s in stocks],
+        }
+
+    def youtube(self, path, params):
+        items = _load_mock("entertainment")[:int(params.get("maxResults", 10))]
+        return {"kind": "youtube#videoListResponse", "items": [{
+            "id": hashlib.md5(item["title"].encode()).hexdigest()[:11],
+            "snippet": {"title": item["title"], "categoryId": "24", "description": item.get("description", "")},
+            "statistics": {"viewCount": str(item["popularity"] * 100000),
+                           "likeCount": str(int(item["popularity"] * 100000 * item["rating"] / 1000))},
+        } for item in items]}
+
+    def _news_pools(self, categories):
+        """(category, records) for the categories with a non-empty mockdata file"""
+        pools = [(c, _load_mock(c)) for c in categories
+                 if os.path.exists(os.path.join(MOCKDATA_DIR, f"{c}.json"))]
+        return [(c, pool) for c, pool in pools if pool]
+
+    def newsdata(self, path, params):
+        query = params.get("q", "")
+        categories = [c for c, q in self.category_queries.items() if q == query]
+        if not categories:
+            # Broad query: every category whose terms appear in it
+            terms = set(re.findall(r"[a-z0-9-]+", query.lower())) - {"or"}
+            categories = [c for c, q in self.category_queries.items()
+                          if terms & set(re.findall(r"[a-z0-9-]+", q.lower()))] or list(self.category_queries)
+        pools = self._news_pools(categories) or self._news_pools(self.category_queries)
+        if not pools:
+            # No news mockdata at all: an empty (but valid) response
+            return {"status": "success", "totalResults": 0, "results": [], "nextPage": None}
+
+        size = int(params.get("size", 10))
+        page = int(params.get("page", 1) or 1)
+        step = self.news_interval or 600
+        # Newest article id; with an interval new ones keep appearing at the top
+        newest = self.news_total - 1
+        if self.news_interval:
+            newest += int((time.time() - self.started) / self.news_interval)
+        oldest = newest - self.news_total + 1
+        first = newest - (page - 1) * size
+        ids = range(first, max(oldest, first - size + 1) - 1, -1)
+
+        results = []
+        for article_id in ids:
+            category, pool = pools[article_id % len(pools)]
+            item = pool[(article_id // len(pools)) % len(pool)]
+            published = self.started + (article_id - (self.news_total - 1)) * step
+            results.append({
+                "article_id": f"standin-{article_id}",
+                "title": item.get("title") or item.get("name") or "Untitled",
+                "link": f"https://standin.local/news/{category}/{article_id}",
+                "description": item.get("description") or item.get("teaser") or "",
+                "source_id": "standin",
+                "image_url": item.get("image"),
+                "pubDate": datetime.fromtimestamp(published, timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                "category": [category],
+            })
+        has_more = ids and ids[-1] > oldest
+        return {"status": "success", "totalResults": self.news_total, "results": results,
+                "nextPage": str(page + 1) if has_more else None}
+
+    def thesportsdb(self, path, params):
+        items = _load_mock("sports")
+        league = params.get("id", "0")
+        events = []
+        for i, item in enumerate(items[:3]):
+            home, _, away = item["title"].partition(" vs ")
+            events.append({
+                "idEvent": f"{league}{i}",
+                "idLeague": league,
+                "strEvent": item["title"],
+                "strHomeTeam": home if away else f"{item['league']} {i + 1}",
+                "strAwayTeam": away or "TBD",
+                "strStatus": item.get("status", "Not Started"),
+            })
+        return {"events": events}
+
+
+class Recorder:
+    """Recorded payloads in DIR/<provider>/<request>.json (optionally recording new ones)"""
+
+    def __init__(self, directory, record):
+        self.directory = directory
+        self.record = record
+        self._lock = threading.Lock()
+
+    def _file(self, provider, path, params):
+        query = sorted((k, v) for k, v in params.items() if k.lower() not in SECRET_PARAMS)
+        identity = f"{path}?{urlencode(query)}"
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", identity).strip("_")[:80]
+        digest = hashlib.sha1(identity.encode()).hexdigest()[:8]
+        return os.path.join(self.directory, provider, f"{slug}-{digest}.json")
+
+    def replay(self, provider, path, params):
+        try:
+            with open(self._file(provider, path, params), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def fetch_and_save(self, provider, path, params):
+        import requests
+        upstream = PROVIDERS[provider][0]
+        response = requests.get(upstream + path, params=params, timeout=15,
+                                headers={"User-Agent": "TrendWatcher/1.0"})
+        response.raise_for_status()
+        body = response.content
+        json.loads(body)  # Only JSON is worth recording
+        file = self._file(provider, path, params)
+        with self._lock:
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            with open(file, "wb") as f:
+                f.write(body)
+        print(f"💾 Opgenomen: {os.path.relpath(file)}")
+        return body
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "TrendWatcherStandin/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        provider, _, rest = parts.path.lstrip("/").partition("/")
+        if provider not in PROVIDERS:
+            return self._send(404, json.dumps({"error": "unknown provider"}).encode())
+        path = "/" + rest
+        params = dict(parse_qsl(parts.query))
+        behaviour = self.server.behaviour
+        self.server.count(provider)
+
+        time.sleep(behaviour.latency_for(provider))
+        outcome = behaviour.outcome(provider)
+        if outcome == "error":
+            status = random.choice((500, 503))
+            return self._send(status, json.dumps({"status": "error", "message": "stand-in error"}).encode())
+        if outcome == "rate_limited":
+            return self._send(429, json.dumps({"status": "error", "message": "Too Many Requests"}).encode(),
+                              {"Retry-After": "60"})
+
+        try:
+            body = self.server.payload(provider, path, params)
+        except Exception as e:
+            print(f"❌ {provider}{path}: {e}")
+            return self._send(502, json.dumps({"status": "error", "message": str(e)}).encode())
+
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.server.etags and self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", {"ETag": etag})
+        headers = {"ETag": etag} if self.server.etags else {}
+        self._send(200, body, headers, drip=outcome == "drip")
+
+    def _send(self, status, body, headers=None, drip=False):
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not drip:
+            self.wfile.write(body)
+            return
+        # Slow drip: the body in small chunks spread over drip_seconds
+        chunks = max(1, min(len(body), 20))
+        size = -(-len(body) // chunks)
+        for i in range(0, len(body), size):
+            self.wfile.write(body[i:i + size])
+            self.wfile.flush()
+            time.sleep(self.server.behaviour.drip_seconds / chunks)
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, behaviour, synthesizer, recorder=None, etags=True, verbose=False):
+        super().__init__(address, StandinHandler)
+        self.behaviour = behaviour
+        self.synthesizer = synthesizer
+        self.recorder = recorder
+        self.etags = etags
+        self.verbose = verbose
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def count(self, provider):
+        with self._lock:
+            self.requests[provider] = self.requests.get(provider, 0) + 1
+
+    def payload(self, provider, path, params):
+        """Recorded payload, freshly recorded one, or a synthesized one"""
+        if self.recorder is not None:
+            if self.recorder.record:
+                return self.recorder.fetch_and_save(provider, path, params)
+            body = self.recorder.replay(provider, path, params)
+            if body is not None:
+                return body
+        return json.dumps(self.synthesizer.build(provider, path, params)).encode()
+
+
+def main():
+    """Start the stand-in server and print the env vars that point the app at it"""
+    parser = argparse.ArgumentParser(description="Local stand-in for the upstream APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--payloads", help="Directory with recorded payloads")
+    parser.add_argument("--record", action="store_true", help="Forward to the real APIs and record into --payloads")
+    parser.add_argument("--latency", action="append", help="[provider=]fixed:MS|uniform:MIN-MAX|normal:MEAN,SD|lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", action="append", help="[provider=]share of 500/503 responses")
+    parser.add_argument("--rate-limit-rate", action="append", help="[provider=]share of 429 responses")
+    parser.add_argument("--drip-rate", action="append", help="[provider=]share of slow-drip bodies")
+    parser.add_argument("--drip-seconds", type=float, default=5.0, help="Time a slow-drip body takes")
+    parser.add_argument("--news-total", type=int, default=200, help="NewsData.io articles per query")
+    parser.add_argument("--news-interval", type=float, default=0, help="Seconds between new NewsData.io articles (0 = fixed set)")
+    parser.add_argument("--no-etag", action="store_true", help="No ETag / 304 responses")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    if args.record and not args.payloads:
+        parser.error("--record needs --payloads")
+    recorder = Recorder(args.payloads, args.record) if args.payloads else None
+    server = StandinServer((args.host, args.port), Behaviour(args),
+                           Synthesizer(args.news_total, args.news_interval),
+                           recorder, etags=not args.no_etag, verbose=args.verbose)
+
+    mode = "opnemen" if args.record else ("replay + mockdata" if recorder else "mockdata")
+    print(f"🧪 Stand-in server op http://{args.host}:{args.port} ({mode})")
+    print("   Wijs de app ernaar met:")
+    for provider, (_, env, path) in PROVIDERS.items():
+        print(f"   export {env}=http://{args.host}:{args.port}/{provider}{path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        total = sum(server.requests.values())
+        print(f"\n⏹️  Gestopt na {total} requests: "
+              + ", ".join(f"{p} {n}" for p, n in sorted(server.requests.items())))
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
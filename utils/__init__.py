@@ -1,5 +1,5 @@
 """Utility modules for TrendWatcher."""
 
-from .cache import get_cache, set_cache, clear_cache, get_cache_stats
+from .cache import get_cache, set_cache, get_or_load, clear_cache, get_cache_stats
 
-__all__ = ['get_cache', 'set_cache', 'clear_cache', 'get_cache_stats']
+__all__ = ['get_cache', 'set_cache', 'get_or_load', 'clear_cache', 'get_cache_stats']
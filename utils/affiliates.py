@@ -62,14 +62,17 @@ def generate_bolcom_link(product_name):
 def add_affiliate_to_article(article, category):
     """
     Add affiliate URL to article based on category.
+    Works on a copy, so cached and read-only articles are never modified.
 
     Args:
         article: Article dictionary
         category: Category name (crypto, stocks, ecommerce, etc.)
 
     Returns:
-        Article with affiliate_url added
+        Copy of the article with affiliate_url added
     """
+    article = dict(article)
+
     if category == "ecommerce":
         # E-commerce gets Amazon affiliate links
         product_name = article.get("title") or article.get("name") or article.get("keyword", "")
@@ -0,0 +1,81 @@
+"""
+Shared asyncio event loop.
+One loop per process runs in a daemon thread. The provider engine
+(apis/base.py) and the refresh scheduler run their upstream fetches on it,
+so hundreds of fetches can be in flight from a single process without a
+thread each. Sync code (request handlers, get_or_load loaders) hands a
+coroutine over with ``run`` and blocks until it is done; ``submit`` returns
+a future instead.
+
+Blocking calls made from coroutines (``asyncio.to_thread``) go to the loop's
+default executor, sized by ``AIO_THREADS``.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Coroutine, Optional
+import asyncio
+import os
+import threading
+
+# Threads for blocking work started from the loop (e.g. requests without aiohttp)
+AIO_THREADS = int(os.getenv("AIO_THREADS", "32"))
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid = None
+_loop_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return this process's shared loop, starting it on first use.
+
+    Created lazily per process, like the HTTP session: a forked worker gets
+    its own loop thread instead of a copy of its parent's dead one.
+    """
+    global _loop, _loop_pid, _loop_thread
+    pid = os.getpid()
+    if _loop is not None and _loop_pid == pid:
+        return _loop
+    with _lock:
+        if _loop is None or _loop_pid != pid:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=max(1, AIO_THREADS),
+                                                         thread_name_prefix="aio-blocking"))
+            thread = threading.Thread(target=loop.run_forever, name="aio-loop", daemon=True)
+            thread.start()
+            _loop, _loop_pid, _loop_thread = loop, pid, thread
+    return _loop
+
+
+def in_loop_thread() -> bool:
+    """True when called from the shared loop's own thread."""
+    return _loop_thread is not None and threading.current_thread() is _loop_thread
+
+
+def submit(coro: Coroutine) -> Future:
+    """Schedule coro on the shared loop; returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """
+    Run coro on the shared loop and wait for its result (from sync code).
+
+    Args:
+        coro: Coroutine to run
+        timeout: Max seconds to wait (the coroutine is cancelled after it)
+
+    Raises:
+        RuntimeError: When called from the loop thread itself (would deadlock;
+            await the coroutine there instead)
+    """
+    if in_loop_thread():
+        coro.close()
+        raise RuntimeError("aio.run() called from the event loop thread; await instead")
+    future = submit(coro)
+    try:
+        return future.result(timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise
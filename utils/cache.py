@@ -1,14 +1,82 @@
 """
-Simple in-memory cache with TTL support for API responses.
+Cache with TTL support for API responses.
 Helps avoid rate limits by caching API responses for a specified duration.
+
+By default entries live in a bounded, thread-safe in-process LRU engine
+(``TTLCache``). Set ``CACHE_BACKEND=sqlite`` to share one cache between all
+gunicorn workers on a host, or ``CACHE_BACKEND=redis`` for a Redis-compatible
+server (see utils/cache_backends.py). Expired entries are kept around for a
+grace period so ``get_or_load`` can serve them stale while one caller
+refreshes the key.
 """
 
-from datetime import datetime, timedelta
-from typing import Any, Optional
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional, Tuple
+import asyncio
+import atexit
+import gzip
 import json
+import os
+import threading
+import time
+
+from .cache_backends import TTLCache, create_backend, json_default
+from .circuit import breaker_for, get_breaker_stats
+from .ratelimit import HIGH, LOW, NORMAL, get_quota_stats, quota_for
+from . import metrics
+
+# Storage backend: memory (per process), sqlite (per host) or redis
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+
+# How long past expiry an entry may still be served while it is refreshed
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", "3600"))
+# How long concurrent callers wait for an in-flight load of the same key
+CACHE_LOAD_TIMEOUT = int(os.getenv("CACHE_LOAD_TIMEOUT", "15"))
+# How long a failed load is remembered before get_or_load tries again
+CACHE_NEGATIVE_TTL = int(os.getenv("CACHE_NEGATIVE_TTL", "60"))
+# Warm-restart snapshot of the memory backend (interval 0 disables it)
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "data/cache_snapshot.json.gz")
+CACHE_SNAPSHOT_INTERVAL = int(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300"))
+
+
+# Shared cache instance used by all API modules
+_CACHE = create_backend(CACHE_BACKEND)
+
+# Loader result meaning "upstream data unchanged": the cached value is kept
+# (same version, no refresh listeners) and only gets a new TTL
+UNCHANGED = object()
+
+
+class _Flight:
+    """A load in progress for one key; other callers wait on it."""
+
+    __slots__ = ("done", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+# In-flight loads by key (single-flight coordination)
+_FLIGHTS = {}
+_FLIGHTS_LOCK = threading.Lock()
+
+
+def _cache_gauges() -> dict:
+    return {("trendwatcher_cache_entries", ()): len(_CACHE),
+            ("trendwatcher_cache_bytes", ()): _CACHE.total_bytes}
+
+
+# Per-process size gauges; shared backends would be counted once per worker
+if _CACHE.name == "memory":
+    metrics.register_gauges(_cache_gauges)
+
+# Callbacks run with the new data whenever a key is (re)loaded
+_REFRESH_LISTENERS = {}
+
+# Keys kept warm by the refresh scheduler; get_or_load never loads these itself
+_SCHEDULED_KEYS = set()
 
-# In-memory cache storage
-_CACHE = {}
 
 def get_cache(key: str) -> Optional[Any]:
     """
@@ -20,23 +88,17 @@ def get_cache(key: str) -> Optional[Any]:
     Returns:
         Cached data if valid, None if expired or not found
     """
-    if key not in _CACHE:
-        return None
-
-    entry = _CACHE[key]
-    now = datetime.now()
-
-    # Check if cache has expired
-    if entry["expires"] < now:
-        # Clean up expired entry
-        del _CACHE[key]
+    entry = _CACHE.get(key)
+    if entry is None or not entry.is_fresh():
+        metrics.record_cache("miss", key)
         return None
 
-    print(f"[CACHE HIT] {key} (expires in {(entry['expires'] - now).seconds}s)")
-    return entry["data"]
+    metrics.record_cache("hit", key)
+    return entry.data
 
 
-def set_cache(key: str, data: Any, ttl: int = 900) -> None:
+def set_cache(key: str, data: Any, ttl: int = 900,
+              stale_ttl: int = CACHE_STALE_TTL) -> None:
     """
     Store data in cache with TTL (time-to-live).
 
@@ -44,17 +106,316 @@ def set_cache(key: str, data: Any, ttl: int = 900) -> None:
         key: Cache key (e.g., "crypto_trending", "stocks_news")
         data: Data to cache (must be JSON-serializable)
         ttl: Time-to-live in seconds (default: 900 = 15 minutes)
+        stale_ttl: Extra seconds the entry may be served stale by get_or_load
     """
-    now = datetime.now()
-    expires = now + timedelta(seconds=ttl)
+    _CACHE.set(key, data, ttl, stale_ttl)
+    metrics.inc("trendwatcher_cache_sets_total", (("prefix", metrics.key_prefix(key)),))
+
+
+def touch_cache(key: str, ttl: int = 900, stale_ttl: int = CACHE_STALE_TTL) -> bool:
+    """
+    Give the (fresh or stale) entry for key a new TTL, keeping its data and version.
+
+    Returns:
+        True if there was an entry to renew
+    """
+    return _CACHE.touch(key, ttl, stale_ttl) is not None
+
+
+def get_or_load(key: str, loader: Callable[[], Any], ttl: int = 900,
+                stale_ttl: int = CACHE_STALE_TTL,
+                timeout: float = CACHE_LOAD_TIMEOUT,
+                provider: Optional[str] = None,
+                negative_ttl: int = CACHE_NEGATIVE_TTL) -> Optional[Any]:
+    """
+    Return cached data for key, calling loader at most once across threads.
+
+    - Fresh entry: returned directly.
+    - Stale entry (expired, inside its stale window): returned immediately
+      while a single background thread refreshes the key.
+    - Missing entry: exactly one caller runs loader; concurrent callers for
+      the same key wait for (and share) its result instead of hitting the
+      upstream API themselves.
+
+    Loader results are only cached when truthy; a loader returning UNCHANGED
+    renews the TTL of the cached value. A failed load (loader returned None
+    or raised) is remembered for negative_ttl seconds, during
+    which get_or_load returns None (or the stale value) without calling the
+    loader again. When a provider is given, its circuit breaker and quota
+    (utils/ratelimit.py) decide whether the loader may run at all: a caller
+    without any data loads at high priority, a stale refresh at low.
+
+    Args:
+        key: Cache key (e.g., "crypto_trending", "news_crypto")
+        loader: Zero-argument callable that fetches fresh data
+        ttl: Time-to-live in seconds for loaded data
+        stale_ttl: Seconds past expiry the data may still be served stale
+        timeout: Max seconds to wait on another caller's in-flight load
+        provider: Upstream provider name for the circuit breaker
+        negative_ttl: Seconds to remember a failed load
+
+    Returns:
+        Cached or freshly loaded data, or None if loading failed
+    """
+    entry = _CACHE.get(key)
+    if entry is None:
+        metrics.record_cache("miss", key)
+    else:
+        metrics.record_cache("hit" if entry.is_fresh() else "stale", key)
+
+    if key in _SCHEDULED_KEYS:
+        # The scheduler refreshes this key; request handlers only read
+        return entry.data if entry is not None else None
+
+    if entry is not None and entry.is_fresh():
+        return entry.data
+
+    if _recently_failed(key):
+        # Negative cache: don't hit a failing upstream on every request
+        return entry.data if entry is not None else None
+
+    if entry is not None:
+        # Serve stale while refreshing in the background
+        _start_flight(key, loader, ttl, stale_ttl, provider, negative_ttl, LOW, background=True)
+        return entry.data
+
+    flight, leader = _start_flight(key, loader, ttl, stale_ttl, provider, negative_ttl, HIGH)
+    if not leader:
+        flight.done.wait(timeout)
+    return flight.result
+
+
+def refresh_cache(key: str, loader: Callable[[], Any], ttl: int = 900,
+                  stale_ttl: int = CACHE_STALE_TTL,
+                  timeout: float = CACHE_LOAD_TIMEOUT,
+                  provider: Optional[str] = None) -> Optional[Any]:
+    """
+    Reload key now, regardless of whether the cached entry is still fresh.
+
+    Goes through the same single-flight path (circuit breaker, quota at
+    normal priority) as get_or_load, so a refresh never runs concurrently
+    with another load of the same key.
+
+    Returns:
+        Freshly loaded data, or None if loading failed
+    """
+    flight, leader = _start_flight(key, loader, ttl, stale_ttl, provider,
+                                   CACHE_NEGATIVE_TTL, NORMAL)
+    if not leader:
+        flight.done.wait(timeout)
+    return flight.result
+
+
+def serve_from_cache_only(keys) -> None:
+    """
+    Mark keys as owned by the refresh scheduler.
+
+    get_or_load then only reads these keys (fresh or stale) and never calls
+    the upstream loader from a request handler.
+    """
+    _SCHEDULED_KEYS.update(keys)
+
+
+def add_refresh_listener(key: str, callback: Callable[[Any], None]) -> None:
+    """
+    Call callback(data) every time key is loaded through get_or_load/refresh_cache.
+
+    Used to build derived structures (ranked views, page invalidation) at
+    ingest time instead of on the first request that needs them.
+    """
+    _REFRESH_LISTENERS.setdefault(key, []).append(callback)
+
+
+def _notify_refresh(key: str, data: Any) -> None:
+    for callback in _REFRESH_LISTENERS.get(key, ()):
+        try:
+            callback(data)
+        except Exception as e:
+            print(f"[CACHE LISTENER ERROR] {key}: {e}")
+
+
+def get_cache_entry(key: str):
+    """
+    Return the raw cache entry for key (fresh or stale), or None.
+
+    The entry exposes ``data``, ``expires``, ``cached_at`` and ``version``.
+    """
+    return _CACHE.get(key)
+
+
+def get_cache_version(key: str) -> Optional[Tuple[int, bool]]:
+    """
+    Return (version, fresh) of the entry for key, or None if there is none.
+
+    The version changes whenever key is rewritten (in any worker, with a
+    shared backend), so it identifies the cached data; the fresh flag makes
+    the result change on expiry as well, so derived data (rendered pages) is
+    rebuilt and the stale key gets refreshed. While a missing key is
+    negatively cached, the marker's version is returned instead, so the
+    result also changes when a failed load may be retried.
+    """
+    entry = _CACHE.get(key)
+    if entry is None:
+        entry = _CACHE.get(_negative_key(key))
+        if entry is None or not entry.is_fresh():
+            return None
+        return entry.version, False
+    return entry.version, entry.is_fresh()
+
+
+def _start_flight(key, loader, ttl, stale_ttl, provider, negative_ttl, priority, background=False):
+    """Join the in-flight load for key, or start one. Returns (flight, leader)."""
+    with _FLIGHTS_LOCK:
+        flight = _FLIGHTS.get(key)
+        if flight is not None:
+            return flight, False
+        flight = _FLIGHTS[key] = _Flight()
+
+    args = (key, flight, loader, ttl, stale_ttl, provider, negative_ttl, priority, background)
+    if background:
+        threading.Thread(target=_run_flight, args=args,
+                         name=f"cache-refresh-{key}", daemon=True).start()
+    else:
+        _run_flight(*args)
+    return flight, True
+
+
+def _run_flight(key, flight, loader, ttl, stale_ttl, provider, negative_ttl, priority, background):
+    breaker = breaker_for(provider) if provider else None
+    outcome = "error"
+    try:
+        outcome = _flight_gate(key, flight, provider, breaker, priority, background)
+        if outcome is None:
+            try:
+                flight.result = loader()
+            except Exception as e:
+                print(f"[CACHE LOAD ERROR] {key}: {e}")
+                flight.result = None
+            finally:
+                _CACHE.release_lease(key)
+            outcome = _flight_store(key, flight, breaker, ttl, stale_ttl, negative_ttl)
+    except Exception as e:
+        print(f"[CACHE LOAD ERROR] {key}: {e}")
+    finally:
+        _end_flight(key, flight, outcome or "error")
+
+
+def _flight_gate(key, flight, provider, breaker, priority, background) -> Optional[str]:
+    """
+    Check the circuit breaker and quota, and take the lease.
+    Returns the outcome if the load may not run.
+    """
+    if breaker is not None and not breaker.allow():
+        return "circuit_open"
+    quota = quota_for(provider)
+    if quota is not None and not quota.acquire(priority):
+        # Not an upstream failure: no negative caching, breaker unchanged
+        breaker.release()
+        return "rate_limited"
+    # With a shared backend, only one worker process refreshes a key
+    if not _CACHE.acquire_lease(key, CACHE_LOAD_TIMEOUT):
+        flight.result = None if background else _await_other_worker(key)
+        return "other_worker"
+    return None
 
-    _CACHE[key] = {
-        "data": data,
-        "expires": expires,
-        "cached_at": now
-    }
 
-    print(f"[CACHE SET] {key} (TTL: {ttl}s)")
+def _flight_store(key, flight, breaker, ttl, stale_ttl, negative_ttl) -> str:
+    """Store a load's result (or remember its failure) and report it to the breaker."""
+    if flight.result is UNCHANGED:
+        entry = _CACHE.touch(key, ttl, stale_ttl)
+        flight.result = entry.data if entry is not None else None
+        if entry is not None:
+            if breaker is not None:
+                breaker.record_success()
+            return "not_modified"
+    if flight.result is None:
+        if breaker is not None:
+            breaker.record_failure()
+        set_cache(_negative_key(key), True, ttl=negative_ttl, stale_ttl=0)
+        return "error"
+    if breaker is not None:
+        breaker.record_success()
+    if flight.result:
+        set_cache(key, flight.result, ttl=ttl, stale_ttl=stale_ttl)
+        _notify_refresh(key, flight.result)
+    return "ok"
+
+
+def _end_flight(key, flight, outcome) -> None:
+    metrics.inc("trendwatcher_cache_refreshes_total",
+                (("prefix", metrics.key_prefix(key)), ("outcome", outcome)))
+    with _FLIGHTS_LOCK:
+        _FLIGHTS.pop(key, None)
+    flight.done.set()
+
+
+async def refresh_cache_async(key: str, loader: Callable[[], Awaitable[Any]], ttl: int = 900,
+                              stale_ttl: int = CACHE_STALE_TTL,
+                              timeout: float = CACHE_LOAD_TIMEOUT,
+                              provider: Optional[str] = None) -> Optional[Any]:
+    """
+    Coroutine version of refresh_cache, for async loaders (apis/base.py).
+
+    Shares the single-flight registry with the sync functions: while a
+    request thread loads key, this waits for that load (without blocking the
+    event loop) instead of starting a second one, and the other way round.
+
+    Returns:
+        Freshly loaded data, or None if loading failed
+    """
+    with _FLIGHTS_LOCK:
+        flight = _FLIGHTS.get(key)
+        leader = flight is None
+        if leader:
+            flight = _FLIGHTS[key] = _Flight()
+    if not leader:
+        await asyncio.to_thread(flight.done.wait, timeout)
+        return flight.result
+
+    breaker = breaker_for(provider) if provider else None
+    outcome = "error"
+    try:
+        # The gate and the store do blocking I/O (quota file lock, SQLite/Redis
+        # leases and writes): run them in the loop's executor, like sync loaders.
+        # Like a background refresh: no polling for another worker's result
+        outcome = await asyncio.to_thread(_flight_gate, key, flight, provider, breaker,
+                                          NORMAL, True)
+        if outcome is None:
+            try:
+                flight.result = await loader()
+            except Exception as e:
+                print(f"[CACHE LOAD ERROR] {key}: {e}")
+                flight.result = None
+            finally:
+                await asyncio.to_thread(_CACHE.release_lease, key)
+            outcome = await asyncio.to_thread(_flight_store, key, flight, breaker, ttl,
+                                              stale_ttl, CACHE_NEGATIVE_TTL)
+    except Exception as e:
+        print(f"[CACHE LOAD ERROR] {key}: {e}")
+    finally:
+        _end_flight(key, flight, outcome or "error")
+    return flight.result
+
+
+def _negative_key(key: str) -> str:
+    return f"negative_{key}"
+
+
+def _recently_failed(key: str) -> bool:
+    entry = _CACHE.get(_negative_key(key))
+    return entry is not None and entry.is_fresh()
+
+
+def _await_other_worker(key: str) -> Optional[Any]:
+    """Poll the shared backend until another worker has stored key, or give up."""
+    deadline = time.monotonic() + CACHE_LOAD_TIMEOUT
+    while time.monotonic() < deadline:
+        entry = _CACHE.get(key)
+        if entry is not None and entry.is_fresh():
+            return entry.data
+        time.sleep(0.1)
+    entry = _CACHE.get(key)
+    return entry.data if entry is not None else None
 
 
 def clear_cache(key: Optional[str] = None) -> None:
@@ -65,31 +426,46 @@ def clear_cache(key: Optional[str] = None) -> None:
         key: Specific cache key to clear, or None to clear all
     """
     if key:
-        if key in _CACHE:
-            del _CACHE[key]
+        if _CACHE.delete(key):
             print(f"[CACHE CLEAR] {key}")
     else:
         _CACHE.clear()
         print("[CACHE CLEAR] All entries cleared")
 
 
-def get_cache_stats() -> dict:
+def get_cache_stats(include_entries: bool = False) -> dict:
     """
     Get statistics about current cache state.
 
+    Args:
+        include_entries: Also list every entry with its timestamps (walks
+            the whole cache, so keep it off for frequent polling)
+
     Returns:
         Dictionary with cache statistics
     """
-    now = datetime.now()
+    lookups = metrics.cache_lookup_totals()
+    total_lookups = sum(lookups.values())
     stats = {
+        "backend": _CACHE.name,
         "total_entries": len(_CACHE),
-        "active_entries": 0,
-        "expired_entries": 0,
-        "entries": []
+        "total_bytes": _CACHE.total_bytes,
+        "evictions": _CACHE.evictions,
+        "hits": lookups.get("hit", 0),
+        "stale_hits": lookups.get("stale", 0),
+        "misses": lookups.get("miss", 0),
+        "hit_ratio": round((lookups.get("hit", 0) + lookups.get("stale", 0)) / total_lookups, 4)
+                     if total_lookups else None,
+        "breakers": get_breaker_stats(),
+        "quotas": get_quota_stats(),
     }
+    if not include_entries:
+        return stats
 
-    for key, entry in _CACHE.items():
-        is_expired = entry["expires"] < now
+    now = time.time()
+    stats.update({"active_entries": 0, "expired_entries": 0, "entries": []})
+    for key, entry in _CACHE.items(include_data=False):
+        is_expired = entry.expires < now
         if is_expired:
             stats["expired_entries"] += 1
         else:
@@ -97,10 +473,106 @@ def get_cache_stats() -> dict:
 
         stats["entries"].append({
             "key": key,
-            "cached_at": entry["cached_at"].isoformat(),
-            "expires": entry["expires"].isoformat(),
+            "cached_at": datetime.fromtimestamp(entry.cached_at).isoformat(),
+            "expires": datetime.fromtimestamp(entry.expires).isoformat(),
             "expired": is_expired,
-            "ttl_remaining": max(0, (entry["expires"] - now).seconds)
+            "ttl_remaining": max(0, int(entry.expires - now)),
+            "size_bytes": entry.size
         })
 
     return stats
+
+
+# ========== SNAPSHOTS (warm restarts) ==========
+
+def save_snapshot(path: str = CACHE_SNAPSHOT_PATH) -> int:
+    """
+    Write all live cache entries to a gzipped JSON snapshot (atomic).
+
+    Entries keep their absolute ``expires``/``stale_until``/``cached_at``
+    timestamps, so after a restart they have exactly their remaining TTL.
+    Only the memory backend needs this; the sqlite and redis backends
+    already outlive the process.
+
+    Args:
+        path: Snapshot file
+
+    Returns:
+        Number of entries written
+    """
+    now = time.time()
+    entries = [[key, e.expires, e.stale_until, e.cached_at, e.data]
+               for key, e in _CACHE.items() if e.stale_until > now]
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump({"saved_at": now, "entries": entries}, f,
+                  separators=(",", ":"), default=json_default)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+def load_snapshot(path: str = CACHE_SNAPSHOT_PATH) -> int:
+    """
+    Load a snapshot written by save_snapshot into the memory backend.
+
+    Entries whose stale window already passed are skipped; the rest are
+    restored with their original timestamps.
+
+    Args:
+        path: Snapshot file
+
+    Returns:
+        Number of entries restored (0 if there is no usable snapshot)
+    """
+    if not isinstance(_CACHE, TTLCache) or not os.path.exists(path):
+        return 0
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[CACHE SNAPSHOT ERROR] Could not read {path}: {e}")
+        return 0
+
+    now = time.time()
+    restored = 0
+    for key, expires, stale_until, cached_at, data in snapshot.get("entries", []):
+        if stale_until > now:
+            _CACHE.restore(key, data, expires, stale_until, cached_at)
+            restored += 1
+    print(f"[CACHE SNAPSHOT] Restored {restored} entries from {path}")
+    return restored
+
+
+_SNAPSHOT_THREAD = None
+
+
+def start_snapshots(path: str = CACHE_SNAPSHOT_PATH,
+                    interval: int = CACHE_SNAPSHOT_INTERVAL) -> None:
+    """
+    Periodically save snapshots in a daemon thread, plus once at exit.
+
+    No-op for shared backends or when interval is 0.
+    """
+    global _SNAPSHOT_THREAD
+    if not isinstance(_CACHE, TTLCache) or interval <= 0 or _SNAPSHOT_THREAD is not None:
+        return
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            _save_quietly(path)
+
+    _SNAPSHOT_THREAD = threading.Thread(target=loop, name="cache-snapshot", daemon=True)
+    _SNAPSHOT_THREAD.start()
+    atexit.register(_save_quietly, path)
+
+
+def _save_quietly(path: str) -> None:
+    try:
+        save_snapshot(path)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"[CACHE SNAPSHOT ERROR] Could not write {path}: {e}")
@@ -0,0 +1,674 @@
+"""
+Storage backends for utils/cache.py.
+
+- ``TTLCache``: bounded in-process LRU engine with lock striping (default)
+- ``SQLiteCache``: a WAL-mode SQLite file shared by all workers on one host
+- ``RedisCache``: any Redis-compatible server, shared across hosts
+
+All backends expose the same small interface (get/set/touch/delete/clear/
+items, sweep and refresh leases), store values JSON-serialized once at write time,
+and hand back ``_Entry`` objects so utils/cache.py doesn't care which one is
+active. The shared backends keep a per-process copy of the last decoded value
+per key and only re-parse when another worker wrote a newer version.
+"""
+
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Iterator, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from . import metrics
+
+# Redis client is optional (only needed for CACHE_BACKEND=redis)
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Engine limits (overridable via environment)
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "data/cache.sqlite3")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = os.getenv("REDIS_PREFIX", "trendwatcher:")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_SHARDS = int(os.getenv("CACHE_SHARDS", "16"))
+CACHE_SWEEP_INTERVAL = int(os.getenv("CACHE_SWEEP_INTERVAL", "60"))
+# SQLite: seconds within which repeated reads of a key don't rewrite its accessed_at
+SQLITE_ACCESS_RESOLUTION = 10
+
+
+def json_default(value: Any) -> Any:
+    """
+    JSON fallback for cache values: read-only mappings (the MappingProxyType
+    records of utils/mockdata.py) become plain dicts, anything else its str().
+    """
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+
+def _dumps(data: Any) -> bytes:
+    """Serialize a cache value once, compactly."""
+    return json.dumps(data, separators=(",", ":"), default=json_default).encode("utf-8")
+
+
+def _estimate_size(data: Any) -> int:
+    """
+    Estimate the memory footprint of a cached value in bytes.
+
+    Cached values are JSON-serializable API payloads, so the length of their
+    JSON encoding is a cheap and stable proxy. Writes are rare compared to
+    reads (once per TTL window), so the encoding cost stays off the hot path.
+    """
+    try:
+        return len(json.dumps(data, default=json_default))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class _Entry:
+    """
+    Single cache entry with wall-clock metadata.
+
+    ``version`` changes on every write of the key, so it can be used to tell
+    whether two reads saw the same data.
+    """
+
+    __slots__ = ("data", "expires", "stale_until", "cached_at", "size", "version")
+
+    def __init__(self, data: Any, expires: float, stale_until: float,
+                 cached_at: float, size: int, version: int = 0):
+        self.data = data
+        self.expires = expires
+        self.stale_until = stale_until
+        self.cached_at = cached_at
+        self.size = size
+        self.version = version or time.time_ns()
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return self.expires >= (time.time() if now is None else now)
+
+
+class _Shard:
+    """One lock-protected LRU segment of the cache."""
+
+    __slots__ = ("lock", "entries", "bytes", "evictions")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache with per-entry TTL and lock striping.
+
+    Args:
+        max_entries: Maximum number of live entries across all shards
+        max_bytes: Approximate memory budget across all shards
+        shards: Number of independently locked segments
+        sweep_interval: Seconds between expiry sweeps (0 disables sweeping)
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES,
+                 shards: int = CACHE_SHARDS,
+                 sweep_interval: int = CACHE_SWEEP_INTERVAL):
+        shards = max(1, shards)
+        self._shards = tuple(_Shard() for _ in range(shards))
+        self._max_entries = max(1, max_entries // shards)
+        self._max_bytes = max(1, max_bytes // shards)
+        self._sweep_interval = sweep_interval
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key: str) -> Optional[_Entry]:
+        """
+        Return the entry for key (marking it recently used), or None.
+
+        The entry may be past its TTL but still inside its stale window;
+        callers check ``entry.is_fresh()``.
+        """
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None:
+                return None
+            if entry.stale_until < time.time():
+                # Clean up expired entry
+                del shard.entries[key]
+                shard.bytes -= entry.size
+                return None
+            shard.entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, data: Any, ttl: int, stale_ttl: int = 0) -> _Entry:
+        """Store data under key, evicting least recently used entries if needed."""
+        now = time.time()
+        entry = _Entry(data, now + ttl, now + ttl + stale_ttl, now,
+                       _estimate_size(data))
+        self._store(key, entry)
+        return entry
+
+    def restore(self, key: str, data: Any, expires: float, stale_until: float,
+                cached_at: float) -> _Entry:
+        """Store an entry with its original timestamps (e.g. from a snapshot)."""
+        entry = _Entry(data, expires, stale_until, cached_at, _estimate_size(data))
+        self._store(key, entry)
+        return entry
+
+    def touch(self, key: str, ttl: int, stale_ttl: int = 0) -> Optional[_Entry]:
+        """Renew the TTL of key's entry, keeping its data and version. None if there is none."""
+        now = time.time()
+        shard = self._shard(key)
+        with shard.lock:
+            old = shard.entries.get(key)
+            if old is None or old.stale_until < now:
+                return None
+            entry = _Entry(old.data, now + ttl, now + ttl + stale_ttl, now, old.size, old.version)
+            shard.entries[key] = entry
+            shard.entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, entry: _Entry) -> None:
+        shard = self._shard(key)
+        with shard.lock:
+            old = shard.entries.pop(key, None)
+            if old is not None:
+                shard.bytes -= old.size
+            shard.entries[key] = entry
+            shard.bytes += entry.size
+            self._evict(shard)
+        self._maybe_sweep()
+
+    def delete(self, key: str) -> bool:
+        """Remove key from the cache. Returns True if it was present."""
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.pop(key, None)
+            if entry is None:
+                return False
+            shard.bytes -= entry.size
+            return True
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.bytes = 0
+
+    def items(self, include_data: bool = True) -> Iterator[Tuple[str, _Entry]]:
+        """Yield a consistent per-shard snapshot of (key, entry) pairs."""
+        for shard in self._shards:
+            with shard.lock:
+                snapshot = list(shard.entries.items())
+            yield from snapshot
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self._shards)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(shard.bytes for shard in self._shards)
+
+    @property
+    def evictions(self) -> int:
+        return sum(shard.evictions for shard in self._shards)
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        """Single process: the in-process single-flight is all the coordination needed."""
+        return True
+
+    def release_lease(self, key: str) -> None:
+        pass
+
+    def _evict(self, shard: _Shard) -> None:
+        # Caller holds shard.lock. Always keep the entry that was just written.
+        entries = shard.entries
+        while len(entries) > 1 and (len(entries) > self._max_entries
+                                    or shard.bytes > self._max_bytes):
+            evicted_key, evicted = entries.popitem(last=False)
+            shard.bytes -= evicted.size
+            shard.evictions += 1
+            metrics.inc("trendwatcher_cache_evictions_total",
+                        (("prefix", metrics.key_prefix(evicted_key)),))
+
+    def sweep(self) -> int:
+        """Drop all entries past their stale window. Returns the number removed."""
+        now = time.time()
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                expired = [k for k, e in shard.entries.items() if e.stale_until < now]
+                for k in expired:
+                    shard.bytes -= shard.entries.pop(k).size
+                removed += len(expired)
+        return removed
+
+    def _maybe_sweep(self) -> None:
+        if not self._sweep_interval or time.monotonic() < self._next_sweep:
+            return
+        # Only one thread sweeps at a time; the others just carry on
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sweep = time.monotonic() + self._sweep_interval
+            self.sweep()
+        finally:
+            self._sweep_lock.release()
+
+
+
+
+class _DecodedMemo:
+    """
+    Per-process copy of the last decoded value per key.
+
+    Shared backends check the stored version first and only fetch and
+    json-decode the value when it changed since this process last read it.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self._lock = threading.Lock()
+        self._values = OrderedDict()
+        self._max_entries = max_entries
+
+    def get(self, key: str, version: int) -> Any:
+        with self._lock:
+            hit = self._values.get(key)
+            if hit is None or hit[0] != version:
+                return _MISSING
+            self._values.move_to_end(key)
+            return hit[1]
+
+    def put(self, key: str, version: int, data: Any) -> None:
+        with self._lock:
+            self._values[key] = (version, data)
+            self._values.move_to_end(key)
+            while len(self._values) > self._max_entries:
+                self._values.popitem(last=False)
+
+    def discard(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._values.clear()
+            else:
+                self._values.pop(key, None)
+
+
+_MISSING = object()
+
+
+class SQLiteCache:
+    """
+    Cache shared by all worker processes on one host via a WAL-mode SQLite file.
+
+    WAL lets readers run concurrently with the single writer, so page renders
+    in different gunicorn workers never block each other. Refresh leases live
+    in the same file and make sure only one worker refreshes a given key.
+
+    Eviction is LRU: reads stamp ``accessed_at`` (at most once per
+    SQLITE_ACCESS_RESOLUTION seconds per key, so reads rarely write), and the
+    row count is kept up to date by triggers, so a write never has to count
+    the table.
+
+    Args:
+        path: SQLite database file (created if missing)
+        max_entries: Maximum number of rows; least recently used are evicted first
+        sweep_interval: Seconds between expiry sweeps (0 disables sweeping)
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH,
+                 max_entries: int = CACHE_MAX_ENTRIES,
+                 sweep_interval: int = CACHE_SWEEP_INTERVAL):
+        self.path = path
+        self._max_entries = max_entries
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._local = threading.local()
+        self._memo = _DecodedMemo(max_entries)
+        self._owner = uuid.uuid4().hex
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._create_schema(conn)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.execute("""CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL,
+            stale_until REAL NOT NULL, cached_at REAL NOT NULL,
+            size INTEGER NOT NULL, version INTEGER NOT NULL,
+            accessed_at REAL NOT NULL DEFAULT 0)""")
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cache)")}
+        if "accessed_at" not in columns:
+            # Files written before LRU eviction
+            conn.execute("ALTER TABLE cache ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+            conn.execute("UPDATE cache SET accessed_at = cached_at")
+        conn.execute("DROP INDEX IF EXISTS cache_cached_at")
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        conn.execute("""CREATE TABLE IF NOT EXISTS leases (
+            key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)""")
+
+        # Row count maintained by triggers (REPLACE fires the delete trigger
+        # because every connection enables recursive_triggers)
+        conn.execute("""CREATE TABLE IF NOT EXISTS cache_count (
+            id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL)""")
+        conn.execute("INSERT OR IGNORE INTO cache_count VALUES (0, (SELECT COUNT(*) FROM cache))")
+        conn.execute("""CREATE TRIGGER IF NOT EXISTS cache_count_insert AFTER INSERT ON cache
+            BEGIN UPDATE cache_count SET entries = entries + 1 WHERE id = 0; END""")
+        conn.execute("""CREATE TRIGGER IF NOT EXISTS cache_count_delete AFTER DELETE ON cache
+            BEGIN UPDATE cache_count SET entries = entries - 1 WHERE id = 0; END""")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA recursive_triggers=ON")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[_Entry]:
+        row = self._conn().execute(
+            "SELECT expires, stale_until, cached_at, size, version, accessed_at "
+            "FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        expires, stale_until, cached_at, size, version, accessed_at = row
+        now = time.time()
+        if stale_until < now:
+            return None
+        if now - accessed_at >= SQLITE_ACCESS_RESOLUTION:
+            try:
+                self._conn().execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            except sqlite3.OperationalError:
+                # Only the eviction order; a busy writer must not fail the read
+                pass
+
+        data = self._memo.get(key, version)
+        if data is _MISSING:
+            value = self._conn().execute(
+                "SELECT value FROM cache WHERE key = ? AND version = ?",
+                (key, version)).fetchone()
+            if value is None:
+                # Rewritten by another worker between the two reads
+                return self.get(key)
+            data = json.loads(value[0])
+            self._memo.put(key, version, data)
+        return _Entry(data, expires, stale_until, cached_at, size, version)
+
+    def set(self, key: str, data: Any, ttl: int, stale_ttl: int = 0) -> _Entry:
+        now = time.time()
+        blob = _dumps(data)
+        entry = _Entry(data, now + ttl, now + ttl + stale_ttl, now, len(blob))
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires, stale_until, cached_at, "
+            "size, version, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, blob, entry.expires, entry.stale_until, now, entry.size, entry.version, now))
+        self._memo.put(key, entry.version, data)
+        self._evict(conn)
+        self._maybe_sweep()
+        return entry
+
+    def touch(self, key: str, ttl: int, stale_ttl: int = 0) -> Optional[_Entry]:
+        now = time.time()
+        cur = self._conn().execute(
+            "UPDATE cache SET expires = ?, stale_until = ?, cached_at = ?, accessed_at = ? "
+            "WHERE key = ? AND stale_until >= ?",
+            (now + ttl, now + ttl + stale_ttl, now, now, key, now))
+        return self.get(key) if cur.rowcount else None
+
+    def delete(self, key: str) -> bool:
+        self._memo.discard(key)
+        cur = self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+        return cur.rowcount > 0
+
+    def clear(self) -> None:
+        self._memo.discard()
+        self._conn().execute("DELETE FROM cache")
+
+    def items(self, include_data: bool = True) -> Iterator[Tuple[str, _Entry]]:
+        columns = "key, expires, stale_until, cached_at, size, version"
+        if include_data:
+            columns += ", value"
+        rows = self._conn().execute(f"SELECT {columns} FROM cache").fetchall()
+        for row in rows:
+            data = json.loads(row[6]) if include_data else None
+            yield row[0], _Entry(data, *row[1:6])
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT entries FROM cache_count WHERE id = 0").fetchone()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        """Try to become the one worker that refreshes key for the next ttl seconds."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires < ?", (key, now))
+            cur = conn.execute("INSERT OR IGNORE INTO leases VALUES (?, ?, ?)",
+                               (key, self._owner, now + ttl))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return cur.rowcount > 0
+
+    def release_lease(self, key: str) -> None:
+        self._conn().execute("DELETE FROM leases WHERE key = ? AND owner = ?",
+                             (key, self._owner))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        if len(self) <= self._max_entries:
+            return
+        # SELECT then DELETE in one transaction (DELETE ... RETURNING needs SQLite 3.35)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            excess = len(self) - self._max_entries
+            evicted = [row[0] for row in conn.execute(
+                "SELECT key FROM cache ORDER BY accessed_at LIMIT ?", (max(0, excess),))]
+            conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in evicted])
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        self.evictions += len(evicted)
+        for evicted_key in evicted:
+            metrics.inc("trendwatcher_cache_evictions_total",
+                        (("prefix", metrics.key_prefix(evicted_key)),))
+
+    def sweep(self) -> int:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM leases WHERE expires < ?", (now,))
+        return conn.execute("DELETE FROM cache WHERE stale_until < ?", (now,)).rowcount
+
+    def _maybe_sweep(self) -> None:
+        if self._sweep_interval and time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + self._sweep_interval
+            self.sweep()
+
+
+class RedisCache:
+    """
+    Cache on a Redis-compatible server (Redis, Valkey, KeyDB, fakeredis...).
+
+    Each key is a hash holding the serialized value plus its metadata, with a
+    server-side expiry at the end of the stale window. Size limits and LRU
+    eviction are left to the server's ``maxmemory`` policy.
+
+    Args:
+        url: Server URL, used when no client is passed
+        client: Pre-built redis-py compatible client (e.g. a local stand-in)
+        prefix: Namespace prepended to every key
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = REDIS_URL, client: Any = None,
+                 prefix: str = REDIS_PREFIX):
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self._prefix = prefix
+        self._memo = _DecodedMemo()
+        self._owner = uuid.uuid4().hex
+        self.evictions = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self._prefix}cache:{key}"
+
+    def get(self, key: str) -> Optional[_Entry]:
+        meta = self._client.hmget(self._key(key), "expires", "stale_until",
+                                  "cached_at", "size", "version")
+        if meta[0] is None:
+            return None
+        expires, stale_until, cached_at = (float(v) for v in meta[:3])
+        size, version = int(meta[3]), int(meta[4])
+        if stale_until < time.time():
+            return None
+
+        data = self._memo.get(key, version)
+        if data is _MISSING:
+            value, current = self._client.hmget(self._key(key), "value", "version")
+            if value is None or int(current) != version:
+                return self.get(key)
+            data = json.loads(value)
+            self._memo.put(key, version, data)
+        return _Entry(data, expires, stale_until, cached_at, size, version)
+
+    def set(self, key: str, data: Any, ttl: int, stale_ttl: int = 0) -> _Entry:
+        now = time.time()
+        blob = _dumps(data)
+        entry = _Entry(data, now + ttl, now + ttl + stale_ttl, now, len(blob))
+        pipe = self._client.pipeline()
+        pipe.delete(self._key(key))
+        pipe.hset(self._key(key), mapping={
+            "value": blob, "expires": entry.expires, "stale_until": entry.stale_until,
+            "cached_at": now, "size": entry.size, "version": entry.version})
+        pipe.expire(self._key(key), max(1, int(ttl + stale_ttl)))
+        pipe.execute()
+        self._memo.put(key, entry.version, data)
+        return entry
+
+    def touch(self, key: str, ttl: int, stale_ttl: int = 0) -> Optional[_Entry]:
+        name = self._key(key)
+        # WATCH/MULTI: the renewal only applies if the hash checked is still there
+        # at EXEC, so an entry expiring in between isn't recreated without its value
+        with self._client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(name)
+                    stale_until = pipe.hget(name, "stale_until")
+                    now = time.time()
+                    if stale_until is None or float(stale_until) < now:
+                        pipe.unwatch()
+                        return None
+                    pipe.multi()
+                    pipe.hset(name, mapping={
+                        "expires": now + ttl, "stale_until": now + ttl + stale_ttl, "cached_at": now})
+                    pipe.expire(name, max(1, int(ttl + stale_ttl)))
+                    pipe.execute()
+                    break
+                except redis.WatchError:
+                    # Rewritten or expired meanwhile: check again
+                    continue
+        return self.get(key)
+
+    def delete(self, key: str) -> bool:
+        self._memo.discard(key)
+        return bool(self._client.delete(self._key(key)))
+
+    def _scan(self):
+        return self._client.scan_iter(match=f"{self._prefix}cache:*")
+
+    def clear(self) -> None:
+        self._memo.discard()
+        for raw in self._scan():
+            self._client.delete(raw)
+
+    def items(self, include_data: bool = True) -> Iterator[Tuple[str, _Entry]]:
+        strip = len(self._key(""))
+        for raw in self._scan():
+            name = raw.decode() if isinstance(raw, bytes) else raw
+            entry = self.get(name[strip:]) if include_data else None
+            if include_data:
+                if entry is not None:
+                    yield name[strip:], entry
+                continue
+            meta = self._client.hmget(raw, "expires", "stale_until", "cached_at",
+                                      "size", "version")
+            if meta[0] is not None:
+                yield name[strip:], _Entry(None, float(meta[0]), float(meta[1]),
+                                           float(meta[2]), int(meta[3]), int(meta[4]))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._scan())
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(e.size for _, e in self.items(include_data=False))
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        lease = f"{self._prefix}lease:{key}"
+        return bool(self._client.set(lease, self._owner, nx=True, px=int(ttl * 1000)))
+
+    def release_lease(self, key: str) -> None:
+        lease = f"{self._prefix}lease:{key}"
+        owner = self._client.get(lease)
+        if owner is not None and (owner.decode() if isinstance(owner, bytes) else owner) == self._owner:
+            self._client.delete(lease)
+
+    def sweep(self) -> int:
+        # The server expires keys itself
+        return 0
+
+
+def create_backend(name: str):
+    """
+    Build the cache backend selected by name ("memory", "sqlite" or "redis").
+
+    Unknown names fall back to the in-process memory backend.
+    """
+    if name == "sqlite":
+        return SQLiteCache()
+    if name == "redis":
+        return RedisCache()
+    if name != "memory":
+        print(f"[CACHE] Unknown CACHE_BACKEND '{name}', using memory")
+    return TTLCache()
@@ -0,0 +1,128 @@
+"""
+Circuit breakers for upstream API providers.
+Stops calling a provider that keeps failing, so an outage costs one probe per
+backoff interval instead of one blocked worker per page view.
+
+States:
+- closed: calls go through; consecutive failures are counted
+- open: calls are refused until the backoff interval has passed
+- half_open: exactly one probe call is let through; success closes the
+  breaker, failure reopens it with a doubled backoff
+"""
+
+from typing import Dict
+import os
+import threading
+import time
+
+from . import metrics
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_BASE_BACKOFF = float(os.getenv("CIRCUIT_BASE_BACKOFF", "30"))
+CIRCUIT_MAX_BACKOFF = float(os.getenv("CIRCUIT_MAX_BACKOFF", "900"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric value per state for the metrics gauge
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a single upstream provider.
+
+    Args:
+        name: Provider name (e.g., "coingecko")
+        failure_threshold: Consecutive failures before the breaker opens
+        base_backoff: Seconds the breaker stays open the first time
+        max_backoff: Upper bound for the exponentially growing backoff
+    """
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 base_backoff: float = CIRCUIT_BASE_BACKOFF,
+                 max_backoff: float = CIRCUIT_MAX_BACKOFF):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = CLOSED
+        self.failures = 0
+        self.opens = 0
+        self.retry_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a call may be made now (claims the probe when half-open)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() >= self.retry_at:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Give back a claimed probe that wasn't used (e.g. the call was rate limited)."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"[CIRCUIT] {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+            self.opens = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                backoff = min(self.max_backoff, self.base_backoff * (2 ** self.opens))
+                self.opens += 1
+                self.state = OPEN
+                self.retry_at = time.time() + backoff
+                print(f"[CIRCUIT] {self.name} open for {backoff:.0f}s "
+                      f"after {self.failures} failures")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in": max(0, int(self.retry_at - time.time())) if self.state == OPEN else 0,
+            }
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def breaker_for(provider: str) -> CircuitBreaker:
+    """Return the process-wide breaker for provider, creating it on first use."""
+    breaker = _BREAKERS.get(provider)
+    if breaker is None:
+        with _BREAKERS_LOCK:
+            breaker = _BREAKERS.setdefault(provider, CircuitBreaker(provider))
+    return breaker
+
+
+def get_breaker_stats() -> dict:
+    """State of every known breaker, by provider."""
+    return {name: breaker.stats() for name, breaker in list(_BREAKERS.items())}
+
+
+def _breaker_gauges() -> dict:
+    return {("trendwatcher_circuit_state", (("provider", name),)): _STATE_VALUES[b.state]
+            for name, b in list(_BREAKERS.items())}
+
+
+# Every worker has its own breakers; /metrics reports the worst state per provider
+metrics.register_gauges(_breaker_gauges)
@@ -0,0 +1,154 @@
+"""
+Response compression (gzip, and brotli when installed).
+Pages, JSON API responses and other text bodies are compressed after the
+view ran. Compressed bytes are cached per body version (its ETag, or a hash
+of the body) and encoding, so a cached page is compressed once rather than on
+every request.
+
+Static files aren't compressed at request time: ``tools/precompress_static.py``
+writes ``.gz``/``.br`` siblings at build time, and requests for static files
+are answered with the best sibling the client accepts.
+"""
+
+from typing import Optional
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Flask, request, send_from_directory
+
+from . import metrics
+from .cache_backends import TTLCache
+
+# Brotli is optioneel (pip install brotli); zonder valt alles terug op gzip
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "true").lower() not in ("0", "false", "no")
+# Levels for request-time compression (bodies are cached, so mid levels pay off)
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+# Smaller bodies aren't worth the CPU and headers
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "512"))
+COMPRESS_CACHE_MAX_BYTES = int(os.getenv("COMPRESS_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/css", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+}
+
+# Preferred first
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz")) if BROTLI_AVAILABLE else (("gzip", ".gz"),)
+
+_COMPRESSED = TTLCache(max_entries=1024, max_bytes=COMPRESS_CACHE_MAX_BYTES, shards=4)
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """
+    Compress body with the given content coding.
+
+    Args:
+        body: Uncompressed bytes
+        encoding: "gzip" or "br"
+        level: gzip level / brotli quality (default: the request-time setting)
+    """
+    if encoding == "br":
+        quality = COMPRESS_BROTLI_QUALITY if level is None else level
+        return brotli.compress(body, quality=quality)
+    # mtime=0: same input, same bytes (stable for caching and ETags)
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def coded_etag(version: str) -> Optional[str]:
+    """ETag of the compressed variant this request gets of a body with ETag version, if any."""
+    encoding = _accepted_encoding() if COMPRESS_ENABLED else None
+    return f"{version}-{encoding}" if encoding else None
+
+
+def _accepted_encoding() -> Optional[str]:
+    accepted = request.accept_encodings
+    for encoding, _ in _ENCODINGS:
+        if accepted[encoding] > 0:
+            return encoding
+    return None
+
+
+def _compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+
+    etag, _ = response.get_etag()
+    version = etag or hashlib.blake2b(body, digest_size=16).hexdigest()
+    key = f"compressed_{encoding}_{version}"
+    entry = _COMPRESSED.get(key)
+    if entry is not None:
+        compressed = entry.data
+        metrics.inc("trendwatcher_compression_total", (("encoding", encoding), ("result", "hit")))
+    else:
+        compressed = compress(body, encoding)
+        _COMPRESSED.set(key, compressed, ttl=3600)
+        metrics.inc("trendwatcher_compression_total", (("encoding", encoding), ("result", "miss")))
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    # A strong ETag has to differ per content coding
+    response.set_etag(f"{version}-{encoding}")
+    return response.make_conditional(request)
+
+
+def _precompressed_static(app: Flask):
+    """Serve a .br/.gz sibling of the requested static file, if there is a current one."""
+    filename = (request.view_args or {}).get("filename")
+    if not filename or not app.static_folder:
+        return None
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+
+    accepted = request.accept_encodings
+    for encoding, suffix in _ENCODINGS:
+        if accepted[encoding] <= 0:
+            continue
+        try:
+            if os.stat(path + suffix).st_mtime < mtime:
+                continue  # Older than the file itself: rebuild with precompress_static
+        except OSError:
+            continue
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype,
+                                       max_age=app.get_send_file_max_age(filename))
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        metrics.inc("trendwatcher_compression_total", (("encoding", encoding), ("result", "static")))
+        return response
+    return None
+
+
+def init_compression(app: Flask) -> None:
+    """Compress text responses of app and serve precompressed static files."""
+    if not COMPRESS_ENABLED:
+        return
+
+    @app.before_request
+    def _serve_precompressed():
+        if request.endpoint == "static":
+            return _precompressed_static(app)
+        return None
+
+    app.after_request(_compress_response)
@@ -0,0 +1,167 @@
+"""
+Near-duplicate detection for articles (MinHash + LSH).
+The same wire story comes back under several category queries and from
+several sources, with small edits. Every text is cut into word shingles and
+summarized in a MinHash signature, whose share of equal positions estimates
+the Jaccard similarity of two shingle sets. The signatures are split into
+bands and indexed per band (locality-sensitive hashing), so a new text is
+only compared with texts that share at least one band: the cost of a lookup
+stays flat as the index grows instead of growing with it.
+
+The permutations are seeded, so signatures are the same in every process.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Sequence, Set, Tuple
+import os
+import random
+import re
+import threading
+import zlib
+
+# Estimated Jaccard similarity from which two texts are the same story
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.6"))
+# Texts kept in the index (least recently seen are dropped first)
+NEAR_DUP_MAX_ENTRIES = int(os.getenv("NEAR_DUP_MAX_ENTRIES", "5000"))
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs from about 0.5 similarity become candidates
+BANDS = 16
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x7E4D)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"[a-z0-9]+")
+
+Signature = Tuple[int, ...]
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Word shingles of text (lowercase, punctuation ignored); short texts are one shingle."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def signature(shingle_set: Set[str]) -> Signature:
+    """MinHash signature of a shingle set (empty for an empty set)."""
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingle_set]
+    if not hashes:
+        return ()
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    if not a or not b:
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+class _Entry:
+    __slots__ = ("signature", "cluster")
+
+    def __init__(self, signature: Signature, cluster: Hashable):
+        self.signature = signature
+        self.cluster = cluster
+
+
+class NearDuplicateIndex:
+    """
+    LSH index that assigns every text to a cluster of near-duplicates.
+
+    A cluster is named after its first member. Lookups are by key, so adding
+    a text that is already indexed costs nothing.
+
+    Args:
+        threshold: Min estimated similarity to join a cluster
+        max_entries: Max texts kept; the least recently seen are dropped
+        bands: LSH bands (NUM_PERM must be a multiple)
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD,
+                 max_entries: int = NEAR_DUP_MAX_ENTRIES, bands: int = BANDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self._buckets: List[Dict[Signature, Set[Hashable]]] = [{} for _ in range(bands)]
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _bands(self, sig: Signature):
+        for band in range(self.bands):
+            yield band, sig[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, key: Hashable, text: str) -> Hashable:
+        """
+        Index text under key (once) and return its cluster.
+
+        Returns:
+            The cluster of the most similar indexed text above the threshold,
+            or key itself for a new story
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry.cluster
+
+            sig = signature(shingles(text))
+            cluster, best = key, 0.0
+            if sig:
+                candidates = set()
+                for band, rows in self._bands(sig):
+                    candidates.update(self._buckets[band].get(rows, ()))
+                for candidate in candidates:
+                    other = self._entries[candidate]
+                    score = similarity(sig, other.signature)
+                    if score >= self.threshold and score > best:
+                        cluster, best = other.cluster, score
+                for band, rows in self._bands(sig):
+                    self._buckets[band].setdefault(rows, set()).add(key)
+
+            self._entries[key] = _Entry(sig, cluster)
+            while len(self._entries) > self.max_entries:
+                self._evict()
+            return cluster
+
+    def _evict(self) -> None:
+        key, entry = self._entries.popitem(last=False)
+        if not entry.signature:
+            return
+        for band, rows in self._bands(entry.signature):
+            bucket = self._buckets[band].get(rows)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][rows]
+
+    def cluster(self, items: Sequence, key: Callable[[object], Hashable],
+                text: Callable[[object], str]) -> List[list]:
+        """
+        Group items into near-duplicate clusters.
+
+        Args:
+            items: Items to group (e.g. articles)
+            key: Unique key of an item (items with the same key count once)
+            text: Text of an item to compare
+
+        Returns:
+            list: One list of items per cluster, clusters and items in the
+                order of their first appearance
+        """
+        groups: Dict[Hashable, list] = {}
+        seen = set()
+        for item in items:
+            item_key = key(item)
+            if item_key in seen:
+                continue
+            seen.add(item_key)
+            groups.setdefault(self.add(item_key, text(item)), []).append(item)
+        return list(groups.values())
@@ -0,0 +1,89 @@
+"""
+Fragment cache for Jinja templates.
+Adds a ``{% cache %}`` tag that stores the rendered output of a template
+section (the shared partials: sidebars, navbar, footer) in the main cache, so
+fragments share its eviction budget and show up in its stats:
+
+    {% cache "sidebar_unified", category, data_versions() %}
+      ...
+    {% endcache %}
+
+The first argument names the fragment, the rest form its key. Keys should
+identify everything the fragment renders from; ``data_versions()`` stands in
+for the datasets loaded in the current request (see utils/loader.py).
+"""
+
+import hashlib
+import os
+
+from flask import Flask, g
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from . import metrics
+from .cache import get_cache, set_cache
+from .streaming import resolve_pending
+
+# Fragments are keyed on data versions, so the TTL only bounds memory use
+FRAGMENT_CACHE_TTL = int(os.getenv("FRAGMENT_CACHE_TTL", "900"))
+
+# Key part that disables caching for one render (see data_versions)
+UNCACHEABLE = object()
+
+
+def data_versions():
+    """
+    Versions of the datasets loaded so far in this request, for fragment keys.
+
+    Waits for page data that is still loading (streaming render), so the key
+    covers every dataset of the page. Returns UNCACHEABLE when a dataset
+    changed while it was being loaded, or missed the request deadline: the
+    data used by this request can't be told apart by version then.
+    """
+    resolve_pending()
+    loader = g.get("_request_loader")
+    if loader is None:
+        return ()
+    if loader.changed or loader.timed_out:
+        return UNCACHEABLE
+    return tuple(sorted(loader.versions.items()))
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension implementing ``{% cache name, key... %}...{% endcache %}``."""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_render", [nodes.List(args)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, args, caller):
+        name, keys = args[0], args[1:]
+        if any(key is UNCACHEABLE for key in keys):
+            metrics.inc("trendwatcher_fragment_cache_total", (("fragment", name), ("result", "bypass")))
+            return caller()
+
+        digest = hashlib.blake2b(repr(keys).encode("utf-8"), digest_size=12).hexdigest()
+        key = f"fragment_{name}_{digest}"
+        html = get_cache(key)
+        if html is not None:
+            metrics.inc("trendwatcher_fragment_cache_total", (("fragment", name), ("result", "hit")))
+            return Markup(html)
+
+        metrics.inc("trendwatcher_fragment_cache_total", (("fragment", name), ("result", "miss")))
+        html = caller()
+        set_cache(key, str(html), ttl=FRAGMENT_CACHE_TTL, stale_ttl=0)
+        return html
+
+
+def init_fragment_cache(app: Flask) -> None:
+    """Enable the {% cache %} tag and the data_versions() helper in app's templates."""
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.globals["data_versions"] = data_versions
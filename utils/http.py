@@ -0,0 +1,299 @@
+"""
+Shared HTTP client for all upstream providers.
+One ``requests.Session`` per process with keep-alive connection pools per
+host, so repeated calls to the same API (every refresh, every league in the
+sports fan-out) reuse an open TCP+TLS connection instead of handshaking again.
+
+Pool sizes and timeouts come from the environment; a provider that needs a
+bigger pool for one host (parallel requests) calls ``configure_host``. New
+connections and requests are counted per host, so the reuse ratio shows up
+on /metrics.
+
+Coroutines (the provider engine in apis/base.py) use ``get_json``: through
+aiohttp when it is installed, otherwise through the same pooled session in a
+worker thread of the event loop. ``get_json_if_changed`` is the conditional
+variant: it sends the validators of the previous response (ETag,
+Last-Modified) and also compares a hash of the body, so an unchanged upstream
+costs no JSON parsing (and with a 304, no body transfer either).
+"""
+
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlencode, urlsplit
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+# aiohttp is optioneel (pip install aiohttp); zonder draait requests in een thread
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# Connections kept open per host (and the limit of concurrent requests per host)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+# Number of hosts whose pools are kept
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "16"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+# Retries on connection errors only (e.g. a keep-alive connection the server closed)
+HTTP_CONNECT_RETRIES = int(os.getenv("HTTP_CONNECT_RETRIES", "1"))
+
+USER_AGENT = "TrendWatcher/1.0"
+
+# get_json_if_changed result: the response equals the one the validator came from
+NOT_MODIFIED = object()
+
+# Query parameters left out of a resource's identity (credentials)
+_SECRET_PARAMS = frozenset({"apikey", "api_key", "key", "token"})
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        metrics.inc("trendwatcher_http_connections_total", (("host", self.host),))
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        metrics.inc("trendwatcher_http_connections_total", (("host", self.host),))
+        return super()._new_conn()
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count the connections they open."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def _adapter(pool_maxsize: int) -> HTTPAdapter:
+    retries = Retry(total=HTTP_CONNECT_RETRIES, connect=HTTP_CONNECT_RETRIES,
+                    read=0, status=0, redirect=5, raise_on_status=False)
+    return _PooledAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=pool_maxsize,
+                          max_retries=retries)
+
+
+# Per-host pool sizes requested via configure_host ("https://host/" -> size)
+_HOST_POOLS: Dict[str, int] = {}
+_session: Optional[requests.Session] = None
+_session_pid = None
+_lock = threading.Lock()
+
+
+def _base(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+def configure_host(url: str, pool_maxsize: int) -> None:
+    """
+    Give the host of url its own pool size (e.g. for parallel requests).
+
+    Args:
+        url: Any URL on the host
+        pool_maxsize: Connections kept open for that host
+    """
+    with _lock:
+        _HOST_POOLS[_base(url)] = pool_maxsize
+        if _session is not None and _session_pid == os.getpid():
+            _session.mount(_base(url), _adapter(pool_maxsize))
+
+
+def get_session() -> requests.Session:
+    """
+    Return this process's shared session.
+
+    Created lazily per process, so workers forked from a preloaded app
+    never share sockets with their parent.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+    with _lock:
+        if _session is None or _session_pid != pid:
+            session = requests.Session()
+            session.headers["User-Agent"] = USER_AGENT
+            default = _adapter(HTTP_POOL_MAXSIZE)
+            session.mount("http://", default)
+            session.mount("https://", default)
+            for base, size in _HOST_POOLS.items():
+                session.mount(base, _adapter(size))
+            _session, _session_pid = session, pid
+    return _session
+
+
+def _timeouts(timeout: Union[None, float, Tuple[float, float]]) -> Tuple[float, float]:
+    if timeout is None:
+        return HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+    if not isinstance(timeout, tuple):
+        return min(HTTP_CONNECT_TIMEOUT, timeout), timeout
+    return timeout
+
+
+def get(url: str, params: Optional[dict] = None,
+        timeout: Union[None, float, Tuple[float, float]] = None, **kwargs) -> requests.Response:
+    """
+    GET url through the shared session.
+
+    Args:
+        url: Request URL
+        params: Query parameters
+        timeout: Read timeout in seconds, or a (connect, read) tuple
+            (default: HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT)
+        **kwargs: Passed on to requests (headers, ...)
+
+    Returns:
+        requests.Response (raises requests.exceptions.RequestException on errors)
+    """
+    metrics.inc("trendwatcher_http_requests_total", (("host", urlsplit(url).hostname or ""),))
+    return get_session().get(url, params=params, timeout=_timeouts(timeout), **kwargs)
+
+
+def _get_json(url: str, params: Optional[dict], timeout, kwargs: dict) -> Any:
+    response = get(url, params=params, timeout=timeout, **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+
+def _fetch(url: str, params: Optional[dict], timeout, kwargs: dict) -> Tuple[int, Any, bytes]:
+    response = get(url, params=params, timeout=timeout, **kwargs)
+    response.raise_for_status()
+    return response.status_code, response.headers, response.content
+
+
+# aiohttp session per event loop (it can't be shared between loops)
+_aio_sessions: Dict[asyncio.AbstractEventLoop, "aiohttp.ClientSession"] = {}
+
+
+async def _remember_host(session, context, params) -> None:
+    context.host = params.url.host or ""
+
+
+async def _on_connection(session, context, params) -> None:
+    metrics.inc("trendwatcher_http_connections_total", (("host", context.host),))
+
+
+def _aio_session() -> "aiohttp.ClientSession":
+    loop = asyncio.get_running_loop()
+    session = _aio_sessions.get(loop)
+    if session is None or session.closed:
+        trace = aiohttp.TraceConfig()
+        # Remember the request's host, then count the connections it opens
+        trace.on_request_start.append(_remember_host)
+        trace.on_connection_create_end.append(_on_connection)
+        connector = aiohttp.TCPConnector(limit_per_host=HTTP_POOL_MAXSIZE)
+        session = _aio_sessions[loop] = aiohttp.ClientSession(
+            connector=connector, headers={"User-Agent": USER_AGENT}, trace_configs=[trace])
+    return session
+
+
+async def get_json(url: str, params: Optional[dict] = None,
+                   timeout: Union[None, float, Tuple[float, float]] = None, **kwargs) -> Any:
+    """
+    GET url from a coroutine and return the decoded JSON body.
+
+    Args:
+        url: Request URL
+        params: Query parameters
+        timeout: Read timeout in seconds, or a (connect, read) tuple
+        **kwargs: Passed on to the client (headers, ...)
+
+    Returns:
+        Parsed JSON (raises on connection errors and non-2xx responses)
+    """
+    if not AIOHTTP_AVAILABLE:
+        # Request and JSON parsing both off the loop
+        return await asyncio.to_thread(_get_json, url, params, timeout, kwargs)
+
+    connect, read = _timeouts(timeout)
+    metrics.inc("trendwatcher_http_requests_total", (("host", urlsplit(url).hostname or ""),))
+    client_timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+    async with _aio_session().get(url, params=params, timeout=client_timeout, **kwargs) as response:
+        response.raise_for_status()
+        # content_type=None: some APIs send JSON as text/html
+        return await response.json(content_type=None)
+
+
+async def _aio_fetch(url: str, params: Optional[dict], timeout, kwargs: dict) -> Tuple[int, Any, bytes]:
+    connect, read = _timeouts(timeout)
+    metrics.inc("trendwatcher_http_requests_total", (("host", urlsplit(url).hostname or ""),))
+    client_timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+    async with _aio_session().get(url, params=params, timeout=client_timeout, **kwargs) as response:
+        response.raise_for_status()
+        return response.status, response.headers, await response.read()
+
+
+def validator_key(url: str, params: Optional[dict] = None) -> str:
+    """Identity of an upstream resource for its validators: url and params, without credentials."""
+    query = sorted((k, str(v)) for k, v in (params or {}).items() if k.lower() not in _SECRET_PARAMS)
+    return f"{url}?{urlencode(query)}" if query else url
+
+
+async def get_json_if_changed(url: str, params: Optional[dict] = None,
+                              timeout: Union[None, float, Tuple[float, float]] = None,
+                              validator: Optional[dict] = None, **kwargs) -> Tuple[Any, dict]:
+    """
+    Conditional GET from a coroutine.
+
+    Sends If-None-Match / If-Modified-Since from validator. A 304, or a body
+    whose hash equals the validator's (servers without validators), means
+    the resource didn't change: the body isn't parsed and NOT_MODIFIED is
+    returned instead.
+
+    Args:
+        url: Request URL
+        params: Query parameters
+        timeout: Read timeout in seconds, or a (connect, read) tuple
+        validator: Validator of the previous response (None = plain GET)
+        **kwargs: Passed on to the client (headers, ...)
+
+    Returns:
+        (parsed JSON or NOT_MODIFIED, validator of this response)
+    """
+    headers = dict(kwargs.pop("headers", None) or {})
+    if validator:
+        if validator.get("etag"):
+            headers["If-None-Match"] = validator["etag"]
+        if validator.get("last_modified"):
+            headers["If-Modified-Since"] = validator["last_modified"]
+    if AIOHTTP_AVAILABLE:
+        status, response_headers, body = await _aio_fetch(url, params, timeout, dict(kwargs, headers=headers))
+    else:
+        status, response_headers, body = await asyncio.to_thread(
+            _fetch, url, params, timeout, dict(kwargs, headers=headers))
+
+    host = urlsplit(url).hostname or ""
+    if status == 304 and validator:
+        metrics.inc("trendwatcher_http_conditional_total", (("host", host), ("result", "not_modified")))
+        metrics.inc("trendwatcher_http_bytes_saved_total", (("host", host),), validator.get("size", 0))
+        return NOT_MODIFIED, validator
+
+    new_validator = {
+        "etag": response_headers.get("ETag"),
+        "last_modified": response_headers.get("Last-Modified"),
+        "hash": hashlib.blake2b(body, digest_size=16).hexdigest(),
+        "size": len(body),
+    }
+    if validator and validator.get("hash") == new_validator["hash"]:
+        metrics.inc("trendwatcher_http_conditional_total", (("host", host), ("result", "same_body")))
+        return NOT_MODIFIED, new_validator
+    if validator:
+        metrics.inc("trendwatcher_http_conditional_total", (("host", host), ("result", "modified")))
+    # Off the loop for big bodies, like get_json without aiohttp
+    data = await asyncio.to_thread(json.loads, body) if len(body) > 65536 else json.loads(body)
+    return data, new_validator
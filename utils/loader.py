@@ -0,0 +1,133 @@
+"""
+Request-scoped dataset loader.
+Memoizes dataset lookups for the lifetime of one request, so a page that
+needs the same dataset in several places (e.g. stocks for both gainers and
+losers) costs one lookup. Every load is traced: its duration goes into the
+metrics and into a ``Server-Timing`` response header.
+
+Loads can also report a version of their dataset (e.g. the cache entry
+version); utils/page_cache.py uses those to tell whether a rendered page is
+still current.
+"""
+
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import threading
+import time
+
+from flask import Flask, g, has_request_context, request
+
+from . import metrics
+
+# Version function per dataset name, as last passed to RequestLoader.load
+_VERSIONS: Dict[str, Callable[[], Hashable]] = {}
+
+
+def dataset_version(name: str) -> Optional[Hashable]:
+    """Current version of a dataset, or None if it has no version function."""
+    version = _VERSIONS.get(name)
+    return version() if version is not None else None
+
+
+class RequestLoader:
+    """
+    Per-request memo of datasets by name.
+
+    Names follow the cache keys where there is one (``stocks_trending``,
+    ``news_crypto``) and ``mock_<category>`` for mockdata. Safe to share
+    between threads working for the same request (streaming render): a
+    dataset requested while another thread loads it waits for that load.
+    """
+
+    __slots__ = ("_results", "_loading", "_lock", "trace", "versions", "changed", "timed_out")
+
+    def __init__(self):
+        self._results: Dict[str, Any] = {}
+        self._loading: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        # (name, seconds) per dataset, in load order
+        self.trace: List[Tuple[str, float]] = []
+        # Dataset version seen before each load
+        self.versions: Dict[str, Optional[Hashable]] = {}
+        # Datasets whose version changed during their load (e.g. loaded on a miss)
+        self.changed = set()
+        # Page data that missed the request deadline and was served from its fallback
+        self.timed_out = set()
+
+    def load(self, name: str, fetch: Callable[[], Any],
+             version: Optional[Callable[[], Hashable]] = None) -> Any:
+        """
+        Return dataset name, calling fetch only the first time in this request.
+
+        Args:
+            name: Dataset name
+            fetch: Zero-argument callable producing the dataset
+            version: Optional zero-argument callable returning a cheap marker
+                that changes whenever the dataset does. It's read *before*
+                fetch, so a dataset refreshed by this very load shows up as
+                changed on the next request rather than being missed, and
+                again after it; if the two differ, name goes into ``changed``.
+
+        Returns:
+            Whatever fetch returned (also None, which is memoized as well)
+        """
+        with self._lock:
+            loading = self._loading.get(name)
+            if loading is None:
+                self._loading[name] = threading.Event()
+        if loading is not None:
+            loading.wait()
+            if name in self._results:
+                metrics.inc("trendwatcher_dataset_memo_hits_total", (("dataset", name),))
+                return self._results[name]
+            # The other load raised; try it ourselves
+            return fetch()
+
+        if version is not None:
+            _VERSIONS[name] = version
+        self.versions[name] = version() if version is not None else None
+
+        start = time.perf_counter()
+        try:
+            result = self._results[name] = fetch()
+        finally:
+            self._loading[name].set()
+        elapsed = time.perf_counter() - start
+        if version is not None and version() != self.versions[name]:
+            self.changed.add(name)
+        self.trace.append((name, elapsed))
+        metrics.observe("trendwatcher_dataset_load_seconds", (("dataset", name),), elapsed)
+        return result
+
+    def server_timing(self) -> str:
+        """Server-Timing header value for the traced loads."""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.trace)
+
+
+def request_loader() -> RequestLoader:
+    """
+    Return the loader of the current request.
+
+    Outside a request (scheduler, tools) every call gets a fresh loader, so
+    nothing is memoized across callers.
+    """
+    if not has_request_context():
+        return RequestLoader()
+    loader = g.get("_request_loader")
+    if loader is None:
+        loader = g._request_loader = RequestLoader()
+    return loader
+
+
+def init_request_loader(app: Flask) -> None:
+    """Add Server-Timing headers and per-route dataset counters to app's responses."""
+
+    @app.after_request
+    def _trace_datasets(response):
+        loader = g.get("_request_loader")
+        if loader is not None and loader.trace:
+            route = request.endpoint or "unknown"
+            for name, _ in loader.trace:
+                metrics.inc("trendwatcher_route_datasets_total",
+                            (("route", route), ("dataset", name)))
+            response.headers["Server-Timing"] = loader.server_timing()
+        return response
@@ -0,0 +1,408 @@
+"""
+Lightweight metrics for cache and upstream fetch monitoring.
+Counters and latency histograms exposed in Prometheus text format on /metrics.
+
+Recording a metric is a dict update under an uncontended lock, cheap enough
+for the cache hot path. Every gunicorn worker periodically writes a snapshot
+of its own metrics to ``METRICS_DIR/<pid>-<start>.json``; ``render_prometheus``
+sums the snapshots of all workers so /metrics reports the whole host no matter
+which worker answers the scrape. Gauges only count workers that are alive.
+
+Snapshots are keyed by pid and process start time, so a new process that gets
+a recycled pid doesn't overwrite the totals of the old one. Snapshots of
+exited workers are folded into one tombstone file at scrape time and deleted.
+Only processes that call ``enable_flush`` (the web app and the refresh worker)
+write snapshots; tools and scripts that merely import the code don't.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import functools
+import json
+import math
+import operator
+import os
+import threading
+import time
+
+# fcntl is Unix-only; without it exited snapshots are kept instead of merged
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Shared directory for per-worker snapshots
+METRICS_DIR = os.getenv("METRICS_DIR", "data/metrics")
+# Seconds between snapshot writes per worker (0 = never write)
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Help text per metric family (also fixes the exposition order)
+_HELP = {
+    "trendwatcher_cache_requests_total": ("counter", "Cache lookups by key prefix and result (hit, stale, miss)"),
+    "trendwatcher_cache_sets_total": ("counter", "Cache writes by key prefix"),
+    "trendwatcher_cache_evictions_total": ("counter", "Entries evicted to stay within the cache budget, by key prefix"),
+    "trendwatcher_cache_refreshes_total": ("counter", "Upstream loads of cache keys by key prefix and outcome"),
+    "trendwatcher_upstream_fetch_total": ("counter", "Upstream API fetches by provider and outcome"),
+    "trendwatcher_upstream_fetch_seconds": ("histogram", "Upstream API fetch latency by provider"),
+    "trendwatcher_http_requests_total": ("counter", "Upstream HTTP requests by host"),
+    "trendwatcher_http_connections_total": ("counter", "New upstream connections opened by host (requests minus connections = reused)"),
+    "trendwatcher_http_conditional_total": ("counter", "Conditional upstream requests by host and result (not_modified, same_body, modified)"),
+    "trendwatcher_http_bytes_saved_total": ("counter", "Response bytes not transferred thanks to 304 Not Modified, by host"),
+    "trendwatcher_dataset_load_seconds": ("histogram", "Dataset lookup latency within a request, by dataset"),
+    "trendwatcher_dataset_memo_hits_total": ("counter", "Repeated dataset lookups answered by the request memo, by dataset"),
+    "trendwatcher_route_datasets_total": ("counter", "Datasets loaded per request, by route and dataset"),
+    "trendwatcher_render_seconds": ("histogram", "Page time to first byte and total render time by route, phase and mode (stream, buffered)"),
+    "trendwatcher_page_data_timeouts_total": ("counter", "Page data that missed the request deadline and was served from its fallback, by route and data"),
+    "trendwatcher_page_cache_total": ("counter", "Page requests by route and page cache result (hit, not_modified, miss)"),
+    "trendwatcher_fragment_cache_total": ("counter", "Template fragment renders by fragment and result (hit, miss, bypass)"),
+    "trendwatcher_compression_total": ("counter", "Compressed responses by encoding and result (hit, miss, static)"),
+    "trendwatcher_quota_total": ("counter", "Upstream load requests by provider, priority and quota result (granted, queued, dropped)"),
+    "trendwatcher_cache_entries": ("gauge", "Entries currently held by the cache backend"),
+    "trendwatcher_cache_bytes": ("gauge", "Approximate bytes held by the cache backend"),
+    "trendwatcher_circuit_state": ("gauge", "Circuit breaker state per provider, worst worker (0 closed, 1 half-open, 2 open)"),
+    "trendwatcher_quota_remaining": ("gauge", "Units left of the provider's budget, by provider and window"),
+}
+
+# How live workers' values of a gauge combine (default: summed). Per-worker
+# state such as circuit breakers reports the worst worker instead, state
+# shared by all workers would be counted once per worker when summed.
+_GAUGE_MERGE = {
+    "trendwatcher_circuit_state": max,
+    "trendwatcher_quota_remaining": min,
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Labels], float] = {}
+_histograms: Dict[Tuple[str, Labels], list] = {}
+_gauge_providers = []
+_flush_enabled = False
+_flusher_pid = None
+
+# Counters and histograms of exited workers
+TOMBSTONE_NAME = "exited.json"
+
+
+def key_prefix(key: str) -> str:
+    """Metric label for a cache key: the part before the first '_' (news_crypto -> news)."""
+    return key.split("_", 1)[0]
+
+
+def inc(name: str, labels: Labels = (), value: float = 1) -> None:
+    """Increment a counter."""
+    with _lock:
+        _counters[(name, labels)] = _counters.get((name, labels), 0) + value
+    _ensure_flusher()
+
+
+def observe(name: str, labels: Labels, seconds: float) -> None:
+    """Record one observation in a latency histogram."""
+    with _lock:
+        hist = _histograms.get((name, labels))
+        if hist is None:
+            # One count per bucket, then +Inf, sum
+            hist = _histograms[(name, labels)] = [0] * (len(LATENCY_BUCKETS) + 2)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(LATENCY_BUCKETS)] += 1
+        hist[-1] += seconds
+    _ensure_flusher()
+
+
+def record_cache(result: str, key: str) -> None:
+    """Count a cache lookup result ("hit", "stale" or "miss") for key."""
+    inc("trendwatcher_cache_requests_total", (("prefix", key_prefix(key)), ("result", result)))
+
+
+def cache_lookup_totals() -> Dict[str, float]:
+    """This process's cache lookups summed over all prefixes, by result."""
+    totals = {}
+    with _lock:
+        for (name, labels), value in _counters.items():
+            if name == "trendwatcher_cache_requests_total":
+                result = dict(labels)["result"]
+                totals[result] = totals.get(result, 0) + value
+    return totals
+
+
+def register_gauges(provider) -> None:
+    """
+    Register a callable returning {(name, labels): value} for point-in-time values.
+
+    Called at snapshot time, so gauges cost nothing on the hot path.
+    """
+    _gauge_providers.append(provider)
+
+
+def record_fetch(provider: str, seconds: float, ok: bool) -> None:
+    """Record latency and outcome of one upstream fetch."""
+    labels = (("provider", provider),)
+    observe("trendwatcher_upstream_fetch_seconds", labels, seconds)
+    inc("trendwatcher_upstream_fetch_total", labels + (("outcome", "ok" if ok else "error"),))
+
+
+def timed_fetch(provider: str):
+    """
+    Decorator that records latency and outcome of an upstream fetch function.
+
+    A fetch counts as an error when it raises or returns None (the convention
+    of the ``_fetch_*`` helpers in apis/).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = result is not None
+                return result
+            finally:
+                record_fetch(provider, time.perf_counter() - start, ok)
+        return wrapper
+    return decorator
+
+
+def snapshot() -> dict:
+    """Return this process's metrics in a JSON-serializable form."""
+    with _lock:
+        counters = [[name, list(labels), value] for (name, labels), value in _counters.items()]
+        histograms = [[name, list(labels), list(h)] for (name, labels), h in _histograms.items()]
+    gauges = []
+    for provider in _gauge_providers:
+        try:
+            for (name, labels), value in provider().items():
+                gauges.append([name, list(labels), value])
+        except Exception as e:
+            print(f"[METRICS ERROR] gauge provider failed: {e}")
+    return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+
+def _process_start(pid: int) -> str:
+    """Start time of pid in clock ticks since boot ("0" when unknown)."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return "0"
+    # The command name (field 2) may contain spaces; starttime is field 22
+    fields = stat.rsplit(b")", 1)[-1].split()
+    return fields[19].decode() if len(fields) > 19 else "0"
+
+
+def _snapshot_name(pid: int) -> str:
+    return f"{pid}-{_process_start(pid)}.json"
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def flush() -> None:
+    """Write this worker's snapshot to METRICS_DIR (atomic)."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    _write_json(os.path.join(METRICS_DIR, _snapshot_name(os.getpid())), snapshot())
+
+
+def enable_flush() -> None:
+    """
+    Write snapshots to METRICS_DIR from this process and its forks.
+
+    Called by the web app and the refresh worker; the flag survives gunicorn's
+    fork, and each worker starts its own flush thread on its first metric.
+    """
+    global _flush_enabled
+    _flush_enabled = METRICS_FLUSH_INTERVAL > 0
+    _ensure_flusher()
+
+
+def _ensure_flusher() -> None:
+    # Started lazily per process, so it survives gunicorn's fork after --preload
+    global _flusher_pid
+    if not _flush_enabled or _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError as e:
+            print(f"[METRICS ERROR] flush failed: {e}")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _accumulate(snap: dict, counters: dict, histograms: dict) -> None:
+    """Add the counters and histograms of one snapshot to the running totals."""
+    for name, labels, value in snap.get("counters", []):
+        key = (name, tuple(tuple(p) for p in labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, hist in snap.get("histograms", []):
+        key = (name, tuple(tuple(p) for p in labels))
+        total = histograms.setdefault(key, [0] * len(hist))
+        for i, v in enumerate(hist):
+            total[i] += v
+
+
+def _merge_exited(paths: List[str]) -> None:
+    """Fold the snapshots of exited workers into the tombstone file and delete them."""
+    if not paths or not FCNTL_AVAILABLE:
+        return
+    tombstone_path = os.path.join(METRICS_DIR, TOMBSTONE_NAME)
+    try:
+        with open(os.path.join(METRICS_DIR, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            counters, histograms = {}, {}
+            _accumulate(_read_json(tombstone_path) or {}, counters, histograms)
+            merged = []
+            for path in paths:
+                # Another scrape may have merged it while we waited for the lock
+                snap = _read_json(path)
+                if snap is not None:
+                    _accumulate(snap, counters, histograms)
+                    merged.append(path)
+            if not merged:
+                return
+            _write_json(tombstone_path, {
+                "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+                "histograms": [[name, list(labels), h] for (name, labels), h in histograms.items()],
+            })
+            for path in merged:
+                os.remove(path)
+    except OSError as e:
+        print(f"[METRICS ERROR] merging exited snapshots failed: {e}")
+
+
+def _load_snapshots() -> Iterable[Tuple[bool, dict]]:
+    """Yield (alive, snapshot) for every worker snapshot, with this process's live."""
+    own_name = _snapshot_name(os.getpid())
+    yield True, snapshot()
+    if not os.path.isdir(METRICS_DIR):
+        return
+    exited = []
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json") or name in (own_name, TOMBSTONE_NAME):
+            continue
+        pid, _, start = name[:-5].partition("-")
+        try:
+            pid = int(pid)
+        except ValueError:
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        if _pid_alive(pid) and _process_start(pid) == start:
+            snap = _read_json(path)
+            if snap is not None:
+                yield True, snap
+        else:
+            exited.append(path)
+
+    _merge_exited(exited)
+    for path in [os.path.join(METRICS_DIR, TOMBSTONE_NAME)] + exited:
+        snap = _read_json(path)
+        if snap is not None:
+            yield False, snap
+
+
+def _format_value(value: float) -> str:
+    """Sample value without losing precision (integral values without a fraction)."""
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(labels: Iterable, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [tuple(p) for p in labels]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _escape_label(value: Any) -> str:
+    # Exposition format: backslash, double quote and newline are escaped in label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus() -> str:
+    """
+    Render metrics of all workers in Prometheus text exposition format.
+
+    Counters and histograms are summed over every snapshot (including the
+    tombstone of exited workers, so totals don't drop when a worker is
+    recycled); gauges are combined over live workers only, summed unless
+    _GAUGE_MERGE says otherwise.
+    """
+    counters, histograms, gauges = {}, {}, {}
+    for alive, snap in _load_snapshots():
+        _accumulate(snap, counters, histograms)
+        if alive:
+            for name, labels, value in snap.get("gauges", []):
+                key = (name, tuple(tuple(p) for p in labels))
+                if key in gauges:
+                    value = _GAUGE_MERGE.get(name, operator.add)(gauges[key], value)
+                gauges[key] = value
+
+    lines = []
+    families = sorted({name for name, _ in counters} | {name for name, _ in histograms}
+                      | {name for name, _ in gauges},
+                      key=lambda n: (list(_HELP).index(n) if n in _HELP else len(_HELP), n))
+    for family in families:
+        kind, help_text = _HELP.get(family, ("untyped", family))
+        lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {kind}")
+        source = gauges if kind == "gauge" else counters
+        for (name, labels), value in sorted(source.items()):
+            if name == family:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), hist in sorted(histograms.items()):
+            if name != family:
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, hist):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+            cumulative += hist[len(LATENCY_BUCKETS)]
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(hist[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
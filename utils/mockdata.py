@@ -0,0 +1,161 @@
+"""
+In-memory store for the fallback mockdata in static/mockdata/.
+Each JSON file is parsed once and handed out as an immutable view; it is only
+re-read when the file's mtime changes (or a filesystem watcher reports a
+change, when the optional ``watchdog`` package is installed).
+"""
+
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Tuple
+import json
+import os
+import threading
+import time
+
+# Probeer watchdog te importeren (optioneel, voor inotify events)
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+MOCKDATA_DIR = "static/mockdata"
+# Minimum seconds between mtime checks of the same file
+MOCKDATA_CHECK_INTERVAL = float(os.getenv("MOCKDATA_CHECK_INTERVAL", "2"))
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively turn dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class _File:
+    """Parsed contents of one mockdata file plus values derived from it."""
+
+    __slots__ = ("records", "mtime", "checked_at", "derived")
+
+    def __init__(self, records: tuple, mtime: int):
+        self.records = records
+        self.mtime = mtime
+        self.checked_at = time.monotonic()
+        self.derived = {}
+
+
+class MockDataStore:
+    """
+    Parse-once cache of the mockdata JSON files.
+
+    Args:
+        base: Directory with the <category>.json files
+        check_interval: Minimum seconds between mtime checks per file
+    """
+
+    def __init__(self, base: str = MOCKDATA_DIR,
+                 check_interval: float = MOCKDATA_CHECK_INTERVAL):
+        self.base = base
+        self.check_interval = check_interval
+        self._files: Dict[str, _File] = {}
+        self._lock = threading.Lock()
+        self._observer = None
+
+    def _path(self, category: str) -> str:
+        return os.path.join(self.base, f"{category}.json")
+
+    def _load(self, category: str) -> _File:
+        cached = self._files.get(category)
+        if cached is not None and (self._observer is not None or
+                                   time.monotonic() - cached.checked_at < self.check_interval):
+            return cached
+
+        path = self._path(category)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = 0
+        if cached is not None and cached.mtime == mtime:
+            cached.checked_at = time.monotonic()
+            return cached
+
+        with self._lock:
+            cached = self._files.get(category)
+            if cached is not None and cached.mtime == mtime:
+                return cached
+            records = ()
+            if mtime:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        records = _freeze(json.load(f))
+                except Exception as e:
+                    print(f"Error loading mock data for {category}: {e}")
+            loaded = self._files[category] = _File(records, mtime)
+            return loaded
+
+    def get(self, category: str) -> Tuple[MappingProxyType, ...]:
+        """
+        Return the records of static/mockdata/<category>.json.
+
+        Returns:
+            tuple: Read-only records, or an empty tuple if the file is missing
+        """
+        return self._load(category).records
+
+    def version(self, category: str) -> int:
+        """Change marker of the file (its mtime in ns, 0 if missing)."""
+        return self._load(category).mtime
+
+    def derived(self, category: str, name: str, build: Callable[[tuple], Any]) -> Any:
+        """
+        Return build(records), computed once per version of the file.
+
+        Use this for transformations of mockdata (e.g. into news articles)
+        so they aren't redone on every request.
+        """
+        loaded = self._load(category)
+        value = loaded.derived.get(name)
+        if value is None:
+            value = loaded.derived[name] = build(loaded.records)
+        return value
+
+    def invalidate(self, category: str = None) -> None:
+        """Forget parsed data so the next read reloads from disk."""
+        with self._lock:
+            if category is None:
+                self._files.clear()
+            else:
+                self._files.pop(category, None)
+
+    def watch(self) -> bool:
+        """
+        Invalidate files as soon as they change on disk (needs watchdog).
+
+        While watching, reads no longer stat the files at all.
+
+        Returns:
+            bool: True if a watcher was started
+        """
+        if not WATCHDOG_AVAILABLE or self._observer is not None:
+            return False
+
+        store = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                name = os.path.basename(getattr(event, "dest_path", "") or event.src_path)
+                if name.endswith(".json"):
+                    store.invalidate(name[:-5])
+
+        observer = Observer()
+        observer.schedule(Handler(), self.base, recursive=False)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+        return True
+
+
+# Shared store used by app.py and apis/
+MOCKDATA = MockDataStore()
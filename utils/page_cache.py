@@ -0,0 +1,180 @@
+"""
+Full-page cache for rendered HTML.
+A page is stored together with the versions of the datasets it was rendered
+from (as traced by the request loader). It is served again, without running
+the view or its templates, for as long as all those versions are unchanged.
+
+Every cached page carries a strong ETag, so browsers and proxies revalidating
+with ``If-None-Match`` get a 304 without a body, also when what they hold is
+the compressed variant (see utils/compression.py). The view's response
+headers are stored with the page and sent again on every hit. A refresh of a cached
+dataset drops exactly the pages that used it; changes made by another worker
+(shared cache backend) or to mockdata files are caught by the version check.
+"""
+
+from typing import Dict, Set
+import functools
+import hashlib
+import os
+import threading
+
+from flask import Response, current_app, make_response, request
+
+from . import metrics
+from .cache import add_refresh_listener
+from .cache_backends import TTLCache
+from .compression import coded_etag
+from .loader import dataset_version, request_loader
+
+# Set PAGE_CACHE_ENABLED=false to always render
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+# Upper bound on how long a page is reused, even if its datasets don't change
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "300"))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "512"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Pages live in their own memory cache so they never push datasets out
+_PAGES = TTLCache(max_entries=PAGE_CACHE_MAX_ENTRIES, max_bytes=PAGE_CACHE_MAX_BYTES,
+                  shards=4)
+
+# Set per response (or by the page cache itself), so not stored with the page
+_UNSTORED_HEADERS = {"content-length", "etag", "date"}
+
+# Dataset name -> keys of the cached pages rendered from it
+_DEPENDENTS: Dict[str, Set[str]] = {}
+_DEPENDENTS_LOCK = threading.Lock()
+
+
+def _page_key() -> str:
+    # request.url: templates render it (og:url), so host and query matter too
+    return f"page_{request.endpoint}|{request.url}"
+
+
+def _etag(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _is_current(page: dict) -> bool:
+    return all(dataset_version(name) == version for name, version in page["versions"].items())
+
+
+def _track(key: str, names) -> None:
+    with _DEPENDENTS_LOCK:
+        for name in names:
+            pages = _DEPENDENTS.get(name)
+            if pages is None:
+                pages = _DEPENDENTS[name] = set()
+                # Not every dataset name is a cache key (mockdata); then it never fires
+                add_refresh_listener(name, lambda data, name=name: invalidate_dataset(name))
+            pages.add(key)
+
+
+def invalidate_dataset(name: str) -> int:
+    """
+    Drop every cached page rendered from dataset name.
+
+    Returns:
+        int: Number of pages removed
+    """
+    with _DEPENDENTS_LOCK:
+        keys = _DEPENDENTS.get(name, set())
+        _DEPENDENTS[name] = set()
+    return sum(_PAGES.delete(key) for key in keys)
+
+
+def clear_pages() -> None:
+    """Drop all cached pages."""
+    with _DEPENDENTS_LOCK:
+        for pages in _DEPENDENTS.values():
+            pages.clear()
+    _PAGES.clear()
+
+
+def _client_etag(etag: str):
+    """The ETag of this page (plain or compressed) the client revalidates with, if any."""
+    for tag in (etag, coded_etag(etag)):
+        if tag and request.if_none_match.contains(tag):
+            return tag
+    return None
+
+
+def _conditional(page: dict) -> Response:
+    tag = _client_etag(page["etag"])
+    if tag is not None:
+        response = Response(status=304, headers=page["headers"])
+        response.set_etag(tag)
+        if tag != page["etag"]:
+            response.vary.add("Accept-Encoding")
+        return response
+    response = Response(page["body"], headers=page["headers"])
+    response.set_etag(page["etag"])
+    return response.make_conditional(request)
+
+
+def cached_page(view):
+    """
+    Decorator for page routes: serve the rendered page from cache while the
+    datasets it was rendered from are unchanged.
+
+    Only successful GET responses are stored, and not those that set a
+    cookie. The cache is bypassed in debug mode, where templates reload on
+    change.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not PAGE_CACHE_ENABLED or request.method != "GET" or current_app.debug:
+            return view(*args, **kwargs)
+
+        route = request.endpoint or "unknown"
+        key = _page_key()
+        entry = _PAGES.get(key)
+        if entry is not None and entry.is_fresh() and _is_current(entry.data):
+            response = _conditional(entry.data)
+            result = "not_modified" if response.status_code == 304 else "hit"
+            metrics.inc("trendwatcher_page_cache_total", (("route", route), ("result", result)))
+            return response
+
+        metrics.inc("trendwatcher_page_cache_total", (("route", route), ("result", "miss")))
+        loader = request_loader()
+        response = make_response(view(*args, **kwargs))
+        if (response.status_code != 200 or response.direct_passthrough
+                or "Set-Cookie" in response.headers):
+            return response
+
+        headers = [(name, value) for name, value in response.headers
+                   if name.lower() not in _UNSTORED_HEADERS]
+        if response.is_streamed:
+            # Headers are already on their way: store the page once it has been sent
+            response.response = _store_when_sent(response.response, key, loader, headers)
+            return response
+
+        body = response.get_data()
+        etag = _store(key, body, loader, headers)
+        response.set_etag(etag)
+        return response.make_conditional(request)
+    return wrapper
+
+
+def _store(key: str, body: bytes, loader, headers: list) -> str:
+    """
+    Cache a rendered page with the dataset versions it was built from. Returns its ETag.
+
+    A page rendered with fallback data (a load missed the deadline) isn't
+    stored, so the next request renders it with the real data.
+    """
+    versions = dict(loader.versions)
+    etag = _etag(body)
+    if loader.timed_out:
+        return etag
+    _PAGES.set(key, {"body": body, "etag": etag, "versions": versions,
+                     "headers": headers}, ttl=PAGE_CACHE_TTL)
+    _track(key, versions)
+    return etag
+
+
+def _store_when_sent(chunks, key: str, loader, headers: list):
+    sent = []
+    for chunk in chunks:
+        sent.append(chunk)
+        yield chunk
+    _store(key, "".join(sent).encode("utf-8"), loader, headers)
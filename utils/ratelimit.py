@@ -0,0 +1,363 @@
+"""
+Quota-aware rate limiting for upstream API providers.
+Every provider with a known budget gets token buckets for its per-minute
+and per-day limits (Alpha Vantage: 25 calls a day, YouTube: 10,000 quota
+units a day, NewsData.io: 200 credits a day, ...), checked before each
+upstream load next to the circuit breaker.
+
+Loads have a priority:
+- high: a request is waiting and there is no data at all; may queue up to
+  RATELIMIT_MAX_WAIT seconds (in the request thread, so kept short) for a
+  per-minute token and may use the whole daily budget
+- normal: scheduled refreshes; dropped when no token is available
+- low: background refreshes of data that is still served stale; dropped
+  first, and only allowed while most of the daily budget is left
+
+The daily budget is also paced: normal and low loads draw from a bucket
+that refills at per_day / 24h, so refreshes are spread across the day
+instead of burning the quota in the morning. Per-day counters and the pacing
+bucket live in ``QUOTA_PATH`` (shared by all processes on the host, kept
+across restarts); per-minute buckets are per process.
+"""
+
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+import json
+import os
+import threading
+import time
+
+from . import metrics
+
+# fcntl is Unix-only; without it the quota file isn't locked between processes
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "true").lower() not in ("0", "false", "no")
+# Per-day counters and pacing bucket (empty = in memory only)
+QUOTA_PATH = os.getenv("QUOTA_PATH", "data/quota.json")
+# Max seconds a high-priority load waits for a per-minute token (blocks the request)
+RATELIMIT_MAX_WAIT = float(os.getenv("RATELIMIT_MAX_WAIT", "0.5"))
+# Share of the daily budget that may be spent in one burst (pacing bucket size)
+QUOTA_BURST_SHARE = float(os.getenv("QUOTA_BURST_SHARE", "0.1"))
+
+HIGH = "high"
+NORMAL = "normal"
+LOW = "low"
+
+# Share of the daily budget a priority may use; the rest is kept for higher ones
+_DAY_SHARE = {HIGH: 1.0, NORMAL: 0.9, LOW: 0.75}
+
+# Known budgets per provider: (per minute, per day, units per load, minute bucket size);
+# None = no limit, bucket size None = one minute's worth.
+# Override with QUOTA_<PROVIDER>="<per minute>/<per day>", e.g. QUOTA_ALPHAVANTAGE="5/25"
+DEFAULT_QUOTAS = {
+    "alphavantage": (5, 25, 1, None),
+    "youtube": (None, 10000, 1, None),  # videos.list kost 1 unit
+    "newsdata": (2, 200, 1, 30),  # 30 credits per 15 minuten
+    "coingecko": (10, None, 1, None),
+    "thesportsdb": (30, None, 1, None),
+}
+
+_SECONDS_PER_DAY = 86400
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _seconds_to_midnight() -> float:
+    return _SECONDS_PER_DAY - time.time() % _SECONDS_PER_DAY
+
+
+class _QuotaStore:
+    """
+    Per-day state of every provider, read and written as one JSON file.
+
+    Each update locks the file, re-reads it and writes it back atomically,
+    so processes sharing the file don't lose each other's counts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._memory: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._warned = False
+
+    def update(self, name: str, fn: Callable[[dict], bool]) -> bool:
+        """Apply fn to name's state; the state is written back when fn returns True."""
+        with self._lock:
+            lock_file = self._lock_file()
+            try:
+                state = self._read()
+                entry = state.setdefault(name, {})
+                changed = fn(entry)
+                if changed:
+                    self._write(state)
+                return changed
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+
+    def read(self, name: str) -> dict:
+        with self._lock:
+            return dict(self._read().get(name, {}))
+
+    def _lock_file(self):
+        if not self.path or not FCNTL_AVAILABLE:
+            return None
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            lock_file = open(self.path + ".lock", "a")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            return lock_file
+        except OSError:
+            return None
+
+    def _read(self) -> Dict[str, dict]:
+        if not self.path:
+            return self._memory
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._memory = json.load(f)
+        except (OSError, ValueError):
+            pass
+        return self._memory
+
+    def _write(self, state: Dict[str, dict]) -> None:
+        self._memory = state
+        if not self.path:
+            return
+        tmp_file = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_file, self.path)
+        except OSError as e:
+            if not self._warned:
+                print(f"[QUOTA] Can't write {self.path}, keeping counters in memory: {e}")
+                self._warned = True
+
+
+_STORE = _QuotaStore(QUOTA_PATH)
+
+
+class Quota:
+    """
+    Token buckets for one provider.
+
+    Args:
+        name: Provider name (e.g., "alphavantage")
+        per_minute: Calls allowed per minute (None = no limit)
+        per_day: Units allowed per UTC day (None = no limit)
+        cost: Units one load uses (e.g. one call per league), taken from
+            both buckets
+        minute_burst: Size of the per-minute bucket, for limits over a longer
+            window (NewsData.io: 30 credits per 15 minutes = 2 a minute, 30 at
+            once); default per_minute
+    """
+
+    def __init__(self, name: str, per_minute: Optional[float] = None,
+                 per_day: Optional[float] = None, cost: float = 1,
+                 minute_burst: Optional[float] = None):
+        self.name = name
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.cost = cost
+        self.minute_burst = max(minute_burst or 0, per_minute or 0)
+        self._tokens = float(self.minute_burst)
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def burst(self) -> float:
+        """Size of the pacing bucket: the most units normal loads may spend at once."""
+        return max(self.cost, self.per_day * QUOTA_BURST_SHARE) if self.per_day else 0
+
+    def acquire(self, priority: str = NORMAL, wait: Optional[float] = None) -> bool:
+        """
+        Take the units for one load, if the budgets allow it at this priority.
+
+        Args:
+            priority: HIGH, NORMAL or LOW
+            wait: Max seconds to queue for a per-minute token
+                (default: RATELIMIT_MAX_WAIT for HIGH, 0 otherwise)
+
+        Returns:
+            True if the load may run
+        """
+        if wait is None:
+            wait = RATELIMIT_MAX_WAIT if priority == HIGH else 0
+        deadline = time.monotonic() + wait
+        queued = False
+        while not self._take_minute():
+            delay = self._minute_delay()
+            if time.monotonic() + delay > deadline:
+                return self._result(priority, "dropped")
+            queued = True
+            time.sleep(delay)
+
+        if self.per_day and not _STORE.update(self.name, lambda state: self._take_day(state, priority)):
+            self._return_minute()
+            return self._result(priority, "dropped")
+        return self._result(priority, "queued" if queued else "granted")
+
+    def delay(self, priority: str = NORMAL) -> float:
+        """Seconds until a load at priority could get its units (0 = now)."""
+        delay = self._minute_delay()
+        if self.per_day:
+            state = self._current(_STORE.read(self.name))
+            if state["used"] + self.cost > self.per_day * _DAY_SHARE[priority]:
+                return _seconds_to_midnight()
+            if priority != HIGH and state["pace"] < self.cost:
+                delay = max(delay, (self.cost - state["pace"]) * _SECONDS_PER_DAY / self.per_day)
+        return delay
+
+    def stats(self) -> dict:
+        stats = {"per_minute": self.per_minute, "per_day": self.per_day}
+        if self.per_minute:
+            with self._lock:
+                self._refill()
+                stats["minute_remaining"] = int(self._tokens)
+        if self.per_day:
+            state = self._current(_STORE.read(self.name))
+            stats["day_used"] = state["used"]
+            stats["day_remaining"] = max(0, int(self.per_day - state["used"]))
+            stats["next_normal_in"] = round(self.delay(NORMAL))
+        return stats
+
+    def _result(self, priority: str, result: str) -> bool:
+        metrics.inc("trendwatcher_quota_total",
+                    (("provider", self.name), ("priority", priority), ("result", result)))
+        return result != "dropped"
+
+    # Per minute (in memory)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.minute_burst, self._tokens + (now - self._refilled) * self.per_minute / 60)
+        self._refilled = now
+
+    def _minute_cost(self) -> float:
+        # A load costing more than the bucket holds waits for a full bucket
+        return min(self.cost, self.minute_burst)
+
+    def _take_minute(self) -> bool:
+        if not self.per_minute:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens >= self._minute_cost():
+                self._tokens -= self._minute_cost()
+                return True
+            return False
+
+    def _return_minute(self) -> None:
+        if self.per_minute:
+            with self._lock:
+                self._tokens = min(self.minute_burst, self._tokens + self._minute_cost())
+
+    def _minute_delay(self) -> float:
+        if not self.per_minute:
+            return 0.0
+        with self._lock:
+            self._refill()
+            return max(0.0, (self._minute_cost() - self._tokens) * 60 / self.per_minute)
+
+    # Per day (shared file)
+
+    def _current(self, state: dict) -> dict:
+        """Roll the state over to today and refill the pacing bucket."""
+        now = time.time()
+        if state.get("day") != _today():
+            state["day"] = _today()
+            state["used"] = 0
+        state.setdefault("used", 0)
+        pace = state.get("pace", self.burst)
+        elapsed = max(0.0, now - state.get("pace_at", now))
+        state["pace"] = min(self.burst, pace + elapsed * self.per_day / _SECONDS_PER_DAY)
+        state["pace_at"] = now
+        return state
+
+    def _take_day(self, state: dict, priority: str) -> bool:
+        self._current(state)
+        if state["used"] + self.cost > self.per_day * _DAY_SHARE[priority]:
+            return False
+        if priority != HIGH and state["pace"] < self.cost:
+            return False
+        state["used"] += self.cost
+        # High priority loads count against the pace too (never below one burst of debt)
+        state["pace"] = max(-self.burst, state["pace"] - self.cost)
+        return True
+
+
+_QUOTAS: Dict[str, Quota] = {}
+_QUOTAS_LOCK = threading.Lock()
+
+
+def _configured(provider: str) -> Optional[tuple]:
+    """Budget for provider from QUOTA_<PROVIDER> or DEFAULT_QUOTAS, or None."""
+    default = DEFAULT_QUOTAS.get(provider)
+    override = os.getenv(f"QUOTA_{provider.upper()}")
+    if override is None:
+        return default
+    per_minute, _, per_day = override.partition("/")
+    cost, minute_burst = default[2:] if default else (1, None)
+    return (float(per_minute) if per_minute.strip() else None,
+            float(per_day) if per_day.strip() else None, cost, minute_burst)
+
+
+def quota_for(provider: Optional[str]) -> Optional[Quota]:
+    """Return the process-wide quota of provider, or None if it has no known budget."""
+    if not provider or not RATELIMIT_ENABLED:
+        return None
+    quota = _QUOTAS.get(provider)
+    if quota is None:
+        budget = _configured(provider)
+        if budget is None:
+            return None
+        with _QUOTAS_LOCK:
+            quota = _QUOTAS.setdefault(provider, Quota(provider, *budget))
+    return quota
+
+
+def configure_quota(provider: str, cost: float) -> None:
+    """
+    Set how many units one load of provider uses (e.g. one call per league).
+
+    Args:
+        provider: Provider name
+        cost: Units per load
+    """
+    quota = quota_for(provider)
+    if quota is not None:
+        quota.cost = cost
+
+
+def quota_delay(provider: Optional[str], priority: str = NORMAL) -> float:
+    """Seconds until provider's budget allows a load at priority (0 without a quota)."""
+    quota = quota_for(provider)
+    return quota.delay(priority) if quota is not None else 0.0
+
+
+def get_quota_stats() -> dict:
+    """Budgets and usage of every provider with a quota."""
+    return {name: quota.stats() for name, quota in list(_QUOTAS.items())}
+
+
+def _quota_gauges() -> dict:
+    gauges = {}
+    for name, quota in list(_QUOTAS.items()):
+        if quota.per_day:
+            state = quota._current(_STORE.read(name))
+            gauges[("trendwatcher_quota_remaining", (("provider", name), ("window", "day")))] = \
+                max(0, quota.per_day - state["used"])
+    return gauges
+
+
+# The day counters are shared by all workers; /metrics reports the lowest reading
+metrics.register_gauges(_quota_gauges)
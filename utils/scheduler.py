@@ -0,0 +1,236 @@
+"""
+Background refresh scheduler for cached datasets.
+Keeps every registered dataset warm by reloading it shortly before its TTL
+runs out, so request handlers only ever read from the cache.
+
+API modules register their datasets at import time with ``register_dataset``.
+The scheduler runs either in-process (``SCHEDULER_MODE=inprocess``, handy for
+development) or as a standalone worker (``python tools/refresh_worker.py``)
+next to the web workers in production. The standalone worker needs a shared
+cache backend (``CACHE_BACKEND=sqlite`` or ``redis``) to be useful.
+
+Datasets with an async loader (the providers in apis/) are refreshed as
+coroutines on the shared event loop (utils/aio.py), up to
+``SCHEDULER_ASYNC_CONCURRENCY`` at a time, without a thread each; sync
+loaders keep running on the thread pool.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import heapq
+import os
+import random
+import threading
+import time
+
+from . import aio
+from .cache import get_cache_entry, refresh_cache, refresh_cache_async, serve_from_cache_only
+from .ratelimit import quota_delay
+
+# off (lazy loading in handlers), inprocess or external
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "off")
+# Refresh this many seconds before expiry, minus up to SCHEDULER_JITTER seconds
+SCHEDULER_LEAD = int(os.getenv("SCHEDULER_LEAD", "60"))
+SCHEDULER_JITTER = int(os.getenv("SCHEDULER_JITTER", "30"))
+# Maximum number of upstream refreshes running at the same time
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "4"))
+# Same for datasets with an async loader (they don't take a thread while waiting)
+SCHEDULER_ASYNC_CONCURRENCY = int(os.getenv("SCHEDULER_ASYNC_CONCURRENCY", "200"))
+# Wait before retrying a dataset whose refresh failed
+SCHEDULER_RETRY = int(os.getenv("SCHEDULER_RETRY", "60"))
+
+
+class Dataset:
+    """A cache key together with the loader, TTL and provider that produce it."""
+
+    __slots__ = ("key", "loader", "ttl", "provider", "aloader")
+
+    def __init__(self, key: str, loader: Callable[[], Any], ttl: int,
+                 provider: Optional[str] = None,
+                 aloader: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.key = key
+        self.loader = loader
+        self.ttl = ttl
+        self.provider = provider
+        self.aloader = aloader
+
+    def refresh(self) -> Optional[Any]:
+        return refresh_cache(self.key, self.loader, ttl=self.ttl, provider=self.provider)
+
+    async def arefresh(self) -> Optional[Any]:
+        return await refresh_cache_async(self.key, self.aloader, ttl=self.ttl,
+                                         provider=self.provider)
+
+
+# All known datasets by cache key
+DATASETS: Dict[str, Dataset] = {}
+
+
+def register_dataset(key: str, loader: Callable[[], Any], ttl: int = 900,
+                     provider: Optional[str] = None,
+                     aloader: Optional[Callable[[], Awaitable[Any]]] = None) -> Dataset:
+    """
+    Register a dataset so the scheduler keeps it warm.
+
+    Args:
+        key: Cache key the dataset is stored under (e.g., "crypto_trending")
+        loader: Zero-argument callable that fetches fresh data
+        ttl: Time-to-live in seconds of the cached data
+        provider: Upstream provider name (for its circuit breaker)
+        aloader: Optional coroutine function doing the same as loader; the
+            scheduler prefers it
+
+    Returns:
+        The registered Dataset
+    """
+    dataset = DATASETS[key] = Dataset(key, loader, ttl, provider, aloader)
+    return dataset
+
+
+class RefreshScheduler:
+    """
+    Refreshes datasets shortly before they expire.
+
+    Every dataset is refreshed once at start (warm-up), then again at
+    ``expires - lead - random(0, jitter)``; a refresh refused by the
+    provider's quota is retried once the quota allows it. The jitter spreads refreshes of
+    datasets with the same TTL apart so they don't hit upstream APIs in one
+    burst. If another process refreshed a dataset in the meantime (shared
+    backend), the scheduler notices the later expiry and just reschedules.
+
+    Args:
+        datasets: Datasets to keep warm (default: all registered datasets)
+        lead: Seconds before expiry to refresh
+        jitter: Maximum random extra lead in seconds
+        max_concurrency: Maximum refreshes running at once
+        retry: Seconds to wait before retrying a failed refresh
+    """
+
+    def __init__(self, datasets: Optional[Dict[str, Dataset]] = None,
+                 lead: int = SCHEDULER_LEAD, jitter: int = SCHEDULER_JITTER,
+                 max_concurrency: int = SCHEDULER_CONCURRENCY,
+                 retry: int = SCHEDULER_RETRY):
+        self.datasets = datasets if datasets is not None else DATASETS
+        self.lead = lead
+        self.jitter = jitter
+        self.retry = retry
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency),
+                                            thread_name_prefix="refresh")
+        self._async_limit = None
+        self._queue = []
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self) -> "RefreshScheduler":
+        """Start the scheduler loop in a daemon thread."""
+        serve_from_cache_only(self.datasets)
+        now = time.time()
+        with self._lock:
+            for key in self.datasets:
+                heapq.heappush(self._queue, (now, key))
+        self._thread = threading.Thread(target=self.run, name="refresh-scheduler",
+                                        daemon=True)
+        self._thread.start()
+        print(f"[SCHEDULER] Started for {len(self.datasets)} datasets")
+        return self
+
+    def stop(self) -> None:
+        """Stop the loop and wait for running refreshes to finish."""
+        self._stopped.set()
+        self._wakeup.set()
+        self._executor.shutdown(wait=True)
+
+    def run(self) -> None:
+        """Scheduler loop: dispatch due datasets until stopped."""
+        while not self._stopped.is_set():
+            with self._lock:
+                delay = self._queue[0][0] - time.time() if self._queue else 60
+                due = []
+                while self._queue and self._queue[0][0] <= time.time():
+                    _, key = heapq.heappop(self._queue)
+                    if key not in self._pending:
+                        self._pending.add(key)
+                        due.append(key)
+
+            try:
+                for key in due:
+                    if self.datasets[key].aloader is not None:
+                        aio.submit(self._refresh_async(key))
+                    else:
+                        self._executor.submit(self._refresh, key)
+            except RuntimeError:
+                # Executor shut down by stop()
+                break
+
+            if not due:
+                self._wakeup.wait(max(0.05, min(delay, 60)))
+                self._wakeup.clear()
+
+    def _refresh(self, key: str) -> None:
+        dataset = self.datasets[key]
+        try:
+            next_run = self._refreshed_elsewhere(key)
+            if next_run is None:
+                next_run = self._after_refresh(key, dataset.refresh())
+        except Exception as e:
+            print(f"[SCHEDULER ERROR] {key}: {e}")
+            next_run = time.time() + self.retry
+        self._reschedule(key, next_run)
+
+    async def _refresh_async(self, key: str) -> None:
+        dataset = self.datasets[key]
+        if self._async_limit is None:
+            # Created on the loop that uses it
+            self._async_limit = asyncio.Semaphore(max(1, SCHEDULER_ASYNC_CONCURRENCY))
+        try:
+            async with self._async_limit:
+                next_run = self._refreshed_elsewhere(key)
+                if next_run is None:
+                    next_run = self._after_refresh(key, await dataset.arefresh())
+        except Exception as e:
+            print(f"[SCHEDULER ERROR] {key}: {e}")
+            next_run = time.time() + self.retry
+        self._reschedule(key, next_run)
+
+    def _refreshed_elsewhere(self, key: str) -> Optional[float]:
+        """Next run for a key another worker refreshed meanwhile (shared backend), else None."""
+        entry = get_cache_entry(key)
+        if entry is not None and entry.expires - time.time() > self.lead + self.jitter:
+            return self._due(entry.expires)
+        return None
+
+    def _after_refresh(self, key: str, result: Optional[Any]) -> float:
+        dataset = self.datasets[key]
+        if result:
+            return self._due(time.time() + dataset.ttl)
+        # Out of quota: wait until the provider's budget allows the next refresh
+        delay = quota_delay(dataset.provider)
+        if delay > self.retry:
+            print(f"[SCHEDULER] Quota of {dataset.provider} used up, refreshing {key} in {delay:.0f}s")
+            return time.time() + delay
+        print(f"[SCHEDULER] Refresh failed for {key}, retrying in {self.retry}s")
+        return time.time() + self.retry
+
+    def _reschedule(self, key: str, next_run: float) -> None:
+        with self._lock:
+            self._pending.discard(key)
+            heapq.heappush(self._queue, (next_run, key))
+        self._wakeup.set()
+
+    def _due(self, expires: float) -> float:
+        return max(time.time() + 1, expires - self.lead - random.uniform(0, self.jitter))
+
+
+_SCHEDULER = None
+
+
+def start_scheduler() -> RefreshScheduler:
+    """Start the process-wide scheduler (idempotent)."""
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        _SCHEDULER = RefreshScheduler().start()
+    return _SCHEDULER
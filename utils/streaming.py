@@ -0,0 +1,230 @@
+"""
+Streaming page rendering.
+With ``STREAMING_RENDER`` on, a page is sent while it renders: the document
+head and theme CSS go out right away, and the main feed and sidebar follow
+as soon as the data they need has loaded. Routes pass their data as
+``Deferred`` values; their loads start in parallel on a shared thread pool
+when the response starts, and the template blocks on a value only where it
+first uses it.
+
+Without streaming, ``render_page`` starts the same parallel loads, waits for
+them and renders like ``render_template`` did. Either way a cold page costs
+the slowest of its loads rather than their sum. Loads that have a fallback
+get ``PAGE_DATA_DEADLINE`` seconds from the start of the request; a load that
+misses it is left to finish in the background (filling the cache for the
+next request) and the page renders with the fallback instead. Both modes
+record time-to-first-byte and total render time per route.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Iterator, Optional
+import contextvars
+import os
+import threading
+import time
+
+from flask import Flask, Response, g, render_template, request, stream_template
+
+from . import metrics
+from .loader import request_loader
+
+# Opt-in: stream category pages instead of rendering them in one go
+STREAMING_RENDER = os.getenv("STREAMING_RENDER", "false").lower() in ("1", "true", "yes")
+# Threads shared by all requests for loading deferred page data
+STREAM_WORKERS = int(os.getenv("STREAM_WORKERS", "8"))
+# Seconds after the request started that page data with a fallback may take (0 = no limit)
+PAGE_DATA_DEADLINE = float(os.getenv("PAGE_DATA_DEADLINE", "5"))
+# Once all data is in, output is sent in chunks of at least this many bytes
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "16384"))
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, STREAM_WORKERS), thread_name_prefix="render")
+
+
+class Deferred:
+    """
+    Lazily computed template value.
+
+    Behaves like the value it resolves to (iteration, len, truthiness, item
+    and attribute access), so templates use it unchanged. Resolving blocks
+    until the value is there; a value whose load hasn't started yet on the
+    pool is computed in the calling thread instead of waiting for a worker.
+
+    Args:
+        fn: Callable producing the value
+        *args: Arguments for fn
+        fallback: Optional zero-argument callable used instead when the load
+            misses its deadline
+    """
+
+    __slots__ = ("_name", "_fn", "_args", "_fallback", "_deadline", "_future", "_value",
+                 "_done", "_lock")
+
+    def __init__(self, fn: Callable[..., Any], *args, fallback: Optional[Callable[[], Any]] = None):
+        self._name = ":".join([getattr(fn, "__name__", "data"), *map(str, args)])
+        self._fn = fn
+        self._args = args
+        self._fallback = fallback
+        self._deadline = None
+        self._future = None
+        self._done = False
+        self._value = None
+        self._lock = threading.Lock()
+
+    def start(self, deadline: Optional[float] = None) -> None:
+        """
+        Begin computing the value on the shared pool (in this request's context).
+
+        Args:
+            deadline: time.perf_counter() value after which the fallback is used
+        """
+        if self._future is None and not self._done:
+            self._deadline = deadline
+            context = contextvars.copy_context()
+            self._future = _EXECUTOR.submit(context.run, self._fn, *self._args)
+
+    @property
+    def done(self) -> bool:
+        return self._done or (self._future is not None and self._future.done())
+
+    @property
+    def value(self) -> Any:
+        if not self._done:
+            with self._lock:
+                if not self._done:
+                    self._value = self._wait()
+                    self._done = True
+        return self._value
+
+    def _wait(self) -> Any:
+        future = self._future
+        if future is None or future.cancel():
+            return self._fn(*self._args)
+        if self._fallback is None or self._deadline is None:
+            return future.result()
+        try:
+            return future.result(timeout=max(0.0, self._deadline - time.perf_counter()))
+        except FutureTimeout:
+            # Keeps loading in the background; this page gets the fallback
+            request_loader().timed_out.add(self._name)
+            metrics.inc("trendwatcher_page_data_timeouts_total",
+                        (("route", request.endpoint or "unknown"), ("data", self._name)))
+            return self._fallback()
+
+    def then(self, fn: Callable[[Any], Any]) -> "Deferred":
+        """Deferred fn(value), computed on first use."""
+        return Deferred(lambda: fn(self.value))
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __getitem__(self, key):
+        return self.value[key]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.value, name)
+
+    def __str__(self):
+        return str(self.value)
+
+
+def resolve(value: Any) -> Any:
+    """Return the underlying value of a Deferred (other values unchanged)."""
+    return value.value if isinstance(value, Deferred) else value
+
+
+def defer(fn: Callable[..., Any], *args, fallback: Optional[Callable[[], Any]] = None) -> Deferred:
+    """
+    Create a Deferred for fn(*args) that is part of the current page's data.
+
+    The next render_page starts it in parallel with the page's other data.
+    With a fallback, the page waits for it until PAGE_DATA_DEADLINE at most.
+    """
+    deferred = Deferred(fn, *args, fallback=fallback)
+    g.setdefault("_deferreds", []).append(deferred)
+    return deferred
+
+
+def resolve_pending() -> None:
+    """Wait for all page data of the current request (e.g. to read its versions)."""
+    for deferred in g.get("_deferreds", ()):
+        deferred.value
+
+
+def _start_pending() -> list:
+    """Start all page data of the current request on the pool, with the request's deadline."""
+    # Create the request loader here, so the pool threads share it
+    request_loader()
+    deadline = None
+    if PAGE_DATA_DEADLINE > 0:
+        deadline = g.get("_request_start", time.perf_counter()) + PAGE_DATA_DEADLINE
+    deferreds = g.get("_deferreds", [])
+    for deferred in deferreds:
+        deferred.start(deadline)
+    return deferreds
+
+
+def _observe(route: str, start: float, phase: str, mode: str) -> None:
+    metrics.observe("trendwatcher_render_seconds",
+                    (("route", route), ("phase", phase), ("mode", mode)),
+                    time.perf_counter() - start)
+
+
+def _stream_chunks(chunks: Iterator[str], deferreds: list, route: str,
+                   start: float) -> Iterator[str]:
+    """
+    Flush every chunk while page data is still loading (the next chunk may
+    block on it), then coalesce output into STREAM_BUFFER_SIZE chunks.
+    """
+    buffer, size, first = [], 0, True
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= STREAM_BUFFER_SIZE or not all(d.done for d in deferreds):
+            if first:
+                _observe(route, start, "ttfb", "stream")
+                first = False
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        if first:
+            _observe(route, start, "ttfb", "stream")
+        yield "".join(buffer)
+    _observe(route, start, "total", "stream")
+
+
+def render_page(template: str, **context) -> Any:
+    """
+    Render a page whose context may contain Deferred values.
+
+    Streams the page when STREAMING_RENDER is on, otherwise resolves all
+    values and returns the rendered HTML like render_template. Deferred
+    values load in parallel in both modes.
+    """
+    route = request.endpoint or "unknown"
+    start = g.get("_request_start", time.perf_counter())
+    deferreds = _start_pending()
+    if not STREAMING_RENDER:
+        html = render_template(template, **{k: resolve(v) for k, v in context.items()})
+        # Nothing is sent before rendering is done: first byte == total
+        _observe(route, start, "ttfb", "buffered")
+        _observe(route, start, "total", "buffered")
+        return html
+
+    return Response(_stream_chunks(stream_template(template, **context), deferreds, route, start),
+                    mimetype="text/html")
+
+
+def init_streaming(app: Flask) -> None:
+    """Record request start times, the reference point for the render metrics."""
+
+    @app.before_request
+    def _mark_request_start():
+        g._request_start = time.perf_counter()
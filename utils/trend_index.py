@@ -0,0 +1,113 @@
+"""
+Precomputed ranked views (top gainers, losers, most popular...) per category.
+A TrendIndex is built once per version of a dataset, so page routes and the
+JSON API read ready-made top-K slices instead of re-sorting on every request.
+"""
+
+from typing import Any, Callable, Dict, Sequence, Tuple
+import heapq
+import os
+import threading
+
+from .cache import add_refresh_listener
+
+# Number of items kept per view (pages show 5)
+TREND_INDEX_K = int(os.getenv("TREND_INDEX_K", "10"))
+
+
+def _growth(item) -> int:
+    """'+234%' -> 234 (e-commerce growth strings)"""
+    return int(item.get('growth', '0%').replace('%', '').replace('+', ''))
+
+
+# View name -> (sort key, largest first) per category
+TREND_VIEWS: Dict[str, Dict[str, Tuple[Callable[[Any], Any], bool]]] = {
+    "crypto": {
+        "gainers": (lambda x: x.get('change', 0), True),
+        "losers": (lambda x: x.get('change', 0), False),
+    },
+    "stocks": {
+        "gainers": (lambda x: float(x.get('change', 0)), True),
+        "losers": (lambda x: float(x.get('change', 0)), False),
+    },
+    "ecommerce": {
+        "gainers": (_growth, True),
+    },
+    "entertainment": {
+        "popular": (lambda x: x.get('popularity', 0), True),
+        "top_rated": (lambda x: x.get('rating', 0), True),
+    },
+    "sports": {
+        "popular": (lambda x: x.get('popularity', 0), True),
+    },
+}
+
+
+class TrendIndex:
+    """
+    Top-K views of one dataset version.
+
+    Each view is built with heapq.nlargest / nsmallest in O(n log k), which
+    gives exactly the same order as ``sorted(...)[:k]`` (ties keep their
+    original order).
+
+    Args:
+        category: Category name (key of TREND_VIEWS)
+        items: Dataset records
+        k: Number of items kept per view
+    """
+
+    __slots__ = ("category", "source", "views")
+
+    def __init__(self, category: str, items: Sequence, k: int = TREND_INDEX_K):
+        self.category = category
+        self.source = items
+        self.views = {}
+        for name, (key, largest) in TREND_VIEWS.get(category, {}).items():
+            pick = heapq.nlargest if largest else heapq.nsmallest
+            self.views[name] = tuple(pick(k, items, key=key))
+
+    def top(self, view: str, k: int = 5) -> list:
+        """Return the first k items of a view (empty list for unknown views)."""
+        return list(self.views.get(view, ())[:k])
+
+
+_INDEXES: Dict[str, TrendIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def build_trend_index(category: str, items: Sequence) -> TrendIndex:
+    """Build the index for a freshly loaded dataset and make it current."""
+    index = TrendIndex(category, items or ())
+    with _INDEXES_LOCK:
+        _INDEXES[category] = index
+    return index
+
+
+def get_trend_index(category: str, items: Sequence) -> TrendIndex:
+    """
+    Return the index for items, building it only if items is a new version.
+
+    Cache backends and the mockdata store hand out the same object until the
+    data is refreshed, so an identity check is enough to detect a new version.
+    The index keeps a reference to its source, so the identity can't be reused.
+
+    Args:
+        category: Category name (crypto, stocks, ecommerce, entertainment, sports)
+        items: Current dataset records
+
+    Returns:
+        TrendIndex for these items
+    """
+    index = _INDEXES.get(category)
+    if index is not None and index.source is items:
+        return index
+    return build_trend_index(category, items)
+
+
+# Build the index at ingest time, as soon as a live dataset is (re)loaded
+for _key, _category in (("crypto_trending", "crypto"), ("stocks_trending", "stocks"),
+                        ("ecommerce_trending", "ecommerce"),
+                        ("entertainment_trending", "entertainment"),
+                        ("sports_trending", "sports")):
+    add_refresh_listener(_key, lambda data, category=_category: build_trend_index(category, data))